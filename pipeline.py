@@ -4,6 +4,7 @@ Pipeline de Reconhecimento Facial - Sistema de Controle de Frequência
 
 Este script centraliza todas as operações do sistema:
 - Processamento de imagens (detecção + normalização)
+- Indexação da galeria (embeddings VGG-Face)
 - Testes de acurácia
 - Identificação em cenário real
 """
@@ -15,13 +16,26 @@ from pathlib import Path
 # Adiciona o diretório src ao path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.processador import ProcessadorImagens
-from src.testes import executar_testes_acuracia, gerar_relatorio_markdown
-from src.identificacao import processar_cenario_real, processar_imagem_individual
+# Os módulos de src/ (e com eles TensorFlow, MTCNN e DeepFace) são importados
+# dentro de cada comando, para que --help e erros de argumento sejam imediatos.
+
+
+def inteiro_positivo(valor):
+    """Tipo argparse para inteiros maiores ou iguais a 1."""
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor inteiro inválido: {valor!r}")
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1: {numero}")
+    return numero
 
 
 def comando_processar(args):
     """Processa imagens do dataset aplicando normalização."""
+    from src.processador import ProcessadorImagens
+    from src.galeria import GaleriaEmbeddings, atualizar_indice
+    
     print("=" * 60)
     print("PROCESSAMENTO DE DATASET")
     print("=" * 60)
@@ -31,24 +45,219 @@ def comando_processar(args):
     
     stats = processador.processar_todas(
         metodos=metodos,
-        skip_existing=not args.force
+        skip_existing=not args.force,
+        workers=args.workers,
+        tamanho_lote=args.batch_deteccao,
+        max_lado=args.max_lado_deteccao or None,
+        clip_limit=args.clahe_clip,
+        grade=args.clahe_grade
     )
     
+    # Mantém os índices já existentes em sincronia com as galerias
+    for metodo in metodos:
+        db_path = Path(args.output) / metodo
+        if GaleriaEmbeddings.caminho_indice(db_path).exists():
+            _, alteracoes = atualizar_indice(db_path)
+            print(f"Índice {metodo}: {alteracoes['adicionados']} adicionados, "
+                  f"{alteracoes['alterados']} alterados, {alteracoes['removidos']} removidos")
+    
     print(f"\n✓ Processamento concluído!")
     return stats
 
 
+def comando_matricular(args):
+    """Cadastra a foto de um aluno e indexa apenas os novos rostos."""
+    from src.processador import ProcessadorImagens
+    from src.galeria import atualizar_indice
+    
+    print("=" * 60)
+    print("MATRÍCULA DE ALUNO")
+    print("=" * 60)
+    
+    if '-' in args.id:
+        print("Erro: o ID do aluno não pode conter '-'")
+        return None
+    
+    processador = ProcessadorImagens(args.input, args.output)
+    metodos = args.metodos.split(',') if args.metodos else ['clahe', 'histogram']
+    
+    salvos = processador.matricular(args.imagem, args.id, metodos, args.clahe_clip, args.clahe_grade)
+    if not salvos:
+        print(f"Erro: nenhum rosto detectado em {args.imagem}")
+        return None
+    
+    for metodo, caminho in salvos.items():
+        galeria, _ = atualizar_indice(Path(args.output) / metodo, args.batch_size, adicionar=[caminho])
+        print(f"✓ {metodo}: {caminho.name} adicionado ({len(galeria)} rostos no índice)")
+    return salvos
+
+
+def comando_desmatricular(args):
+    """Remove as fotos de um aluno e suas linhas nos índices."""
+    from src.processador import ProcessadorImagens
+    from src.galeria import atualizar_indice
+    
+    print("=" * 60)
+    print("REMOÇÃO DE ALUNO")
+    print("=" * 60)
+    
+    processador = ProcessadorImagens(args.input, args.output)
+    metodos = args.metodos.split(',') if args.metodos else ['clahe', 'histogram']
+    
+    removidos = processador.desmatricular(args.id, metodos)
+    for metodo, nomes in removidos.items():
+        galeria, _ = atualizar_indice(Path(args.output) / metodo, remover=nomes)
+        print(f"✓ {metodo}: {len(nomes)} fotos removidas ({len(galeria)} rostos no índice)")
+    return removidos
+
+
+def comando_indexar(args):
+    """Constrói ou atualiza o índice de embeddings de cada galeria processada."""
+    from src.galeria import GaleriaEmbeddings, atualizar_indice
+    
+    print("=" * 60)
+    print("INDEXAÇÃO DA GALERIA")
+    print("=" * 60)
+    
+    metodos = args.metodos.split(',') if args.metodos else ['clahe', 'histogram']
+    
+    for metodo in metodos:
+        db_path = Path(args.dir) / metodo
+        if args.force:
+            galeria = GaleriaEmbeddings.carregar_ou_construir(db_path, reconstruir=True, batch_size=args.batch_size)
+        else:
+            galeria, alteracoes = atualizar_indice(db_path, args.batch_size)
+            print(f"  {alteracoes['adicionados']} adicionados, {alteracoes['alterados']} alterados, "
+                  f"{alteracoes['removidos']} removidos, {alteracoes['inalterados']} inalterados")
+        print(f"✓ {metodo}: {len(galeria)} rostos indexados em {GaleriaEmbeddings.caminho_indice(db_path)}")
+        
+        if args.ann and len(galeria):
+            from src.ann import IndiceIVF
+            
+            indice = IndiceIVF.construir(galeria, args.listas or None)
+            indice.salvar(IndiceIVF.caminho(db_path))
+            print(f"✓ {metodo}: índice ANN com {indice.n_listas} listas em {IndiceIVF.caminho(db_path)}")
+        
+        if args.benchmark_ann and len(galeria):
+            _benchmark_ann(galeria, args.listas or None)
+        
+        if (args.pca or args.quantizacao != 'float32') and len(galeria):
+            from src.compressao import GaleriaCompactada, carregar_ou_construir_compactada
+            
+            compacta = carregar_ou_construir_compactada(db_path, args.pca or None, args.quantizacao)
+            print(f"✓ {metodo}: galeria compactada ({compacta.dimensao} dimensões, {compacta.bytes_por_vetor} bytes por foto) "
+                  f"em {GaleriaCompactada.caminho(db_path, args.pca or None, args.quantizacao)}")
+
+
+def _benchmark_ann(galeria, n_listas=None, k=10, n_consultas=200):
+    """Compara recall@k e tempo do IVF com a busca exata, usando fotos da própria galeria como consultas."""
+    import numpy as np
+    from src.ann import comparar_com_busca_exata
+    
+    linhas = galeria.linhas_ativas()
+    amostra = np.random.default_rng(0).choice(linhas, min(n_consultas, len(linhas)), replace=False)
+    consultas = np.asarray(galeria.embeddings[np.sort(amostra)])
+    
+    print(f"\n  Busca aproximada vs exata ({len(consultas)} consultas, recall@{k}):")
+    print(f"  {'nprobe':>8} {'recall':>8} {'ms/consulta':>12}")
+    for r in comparar_com_busca_exata(galeria, consultas, k, n_listas=n_listas):
+        nome = 'exata' if r['nprobe'] is None else str(r['nprobe'])
+        print(f"  {nome:>8} {r['recall']:>8.3f} {r['ms_por_consulta']:>12.3f}")
+
+
+def _configurar_galeria(args):
+    """Aplica --templates, --pca/--quantizacao (galeria compactada) ou --ann à galeria de --database."""
+    if args.templates:
+        from src.templates import ativar_templates
+        
+        if args.ann or args.pca or args.quantizacao != 'float32':
+            print("Aviso: --ann, --pca e --quantizacao são ignorados com --templates")
+        ativar_templates(args.database, args.templates)
+        return
+    if args.pca or args.quantizacao != 'float32':
+        from src.compressao import ativar_compactacao
+        
+        if args.ann:
+            print("Aviso: --ann é ignorado com --pca/--quantizacao; usando busca exata na galeria compactada")
+        ativar_compactacao(args.database, args.pca or None, args.quantizacao)
+        return
+    if not args.ann:
+        return
+    from src.galeria import get_galeria
+    from src.ann import ativar_ann
+    
+    if ativar_ann(get_galeria(args.database), args.database, args.nprobe):
+        print(f"Busca aproximada (IVF) ativa, nprobe={args.nprobe}")
+
+
 def comando_testar(args):
     """Executa testes de acurácia."""
+    from src.testes import executar_testes_acuracia, gerar_relatorio_markdown
+    
     print("=" * 60)
     print("TESTES DE ACURÁCIA")
     print("=" * 60)
     
+    if args.modo == 'matriz':
+        from src.avaliacao import avaliar_matriz, gerar_relatorio_matriz, imprimir_resumo_matriz
+        
+        metricas = avaliar_matriz(
+            data_dir=args.data_dir,
+            bases={'clahe': args.db_clahe, 'histogram': args.db_histogram},
+            arquivo_cache=args.cache_matriz,
+            recalcular=args.recalcular_matriz,
+            tamanho_lote=args.batch_deteccao,
+            max_lado=args.max_lado_deteccao or None,
+            batch_size=args.batch_size
+        )
+        imprimir_resumo_matriz(metricas, args.threshold)
+        if args.output:
+            gerar_relatorio_matriz(metricas, args.output)
+            print(f"\n✓ Relatório salvo em: {args.output}")
+        return metricas
+    
+    if args.modo in ('compressao', 'templates'):
+        from src.avaliacao import (avaliar_variantes, gerar_relatorio_comparacao, imprimir_comparacao,
+                                   variantes_compressao, variantes_templates)
+        
+        if args.modo == 'compressao':
+            configuracoes = []
+            for item in args.configuracoes.split(','):
+                dimensao, formato = item.split(':')
+                configuracoes.append((int(dimensao), formato))
+            variantes = variantes_compressao(configuracoes)
+            titulo = "Avaliação de Galerias Compactadas"
+            descricao = ("Cada variante projeta os embeddings da galeria por PCA (quando indicado) e os "
+                         "armazena em float32, float16 ou int8.")
+        else:
+            variantes = variantes_templates([int(n) for n in args.centroides.split(',')])
+            titulo = "Fotos Individuais vs Templates por Aluno"
+            descricao = ("A variante `fotos` compara cada consulta com todas as fotos cadastradas; "
+                         "`templates xN` compara com até N centróides normalizados por aluno.")
+        
+        resultados = avaliar_variantes(
+            data_dir=args.data_dir,
+            bases={'clahe': args.db_clahe, 'histogram': args.db_histogram},
+            variantes=variantes,
+            threshold=args.threshold,
+            tamanho_lote=args.batch_deteccao,
+            max_lado=args.max_lado_deteccao or None,
+            batch_size=args.batch_size
+        )
+        imprimir_comparacao(resultados, args.threshold)
+        if args.output:
+            gerar_relatorio_comparacao(resultados, args.output, titulo, descricao, args.threshold)
+            print(f"\n✓ Relatório salvo em: {args.output}")
+        return resultados
+    
     res_clahe, res_hist = executar_testes_acuracia(
         data_dir=args.data_dir,
         db_clahe=args.db_clahe,
         db_histogram=args.db_histogram,
-        threshold=args.threshold
+        threshold=args.threshold,
+        tamanho_lote=args.batch_deteccao,
+        max_lado=args.max_lado_deteccao or None,
+        batch_size=args.batch_size
     )
     
     if args.output:
@@ -60,21 +269,34 @@ def comando_testar(args):
 
 def comando_identificar(args):
     """Identifica rostos em imagens de cenário real."""
+    from src.gravacao import get_gravador
+    from src.identificacao import processar_cenario_real, processar_imagem_individual
+    
     print("=" * 60)
     print("IDENTIFICAÇÃO - CENÁRIO REAL")
     print("=" * 60)
     
+    _configurar_galeria(args)
+    
     if args.imagem:
         # Processa uma única imagem
         resultado = processar_imagem_individual(
             img_path=args.imagem,
             db_path=args.database,
-            output_path=args.output,
-            threshold=args.threshold
+            output_path=None if args.sem_anotacao else args.output,
+            threshold=args.threshold,
+            batch_size=args.batch_size,
+            max_lado=args.max_lado_deteccao or None,
+            qualidade_jpeg=args.qualidade_jpeg,
+            max_lado_saida=args.max_lado_saida or None
         )
+        get_gravador().aguardar()
         
         if resultado:
-            print(f"\n✓ Imagem anotada salva em: {args.output}")
+            if args.sem_anotacao:
+                print("\n✓ Imagem processada")
+            else:
+                print(f"\n✓ Imagem anotada salva em: {args.output}")
             print(f"  - Faces detectadas: {resultado['total_faces']}")
             print(f"  - Identificadas: {resultado['identificados']}")
     
@@ -84,18 +306,98 @@ def comando_identificar(args):
         resultados = processar_cenario_real(
             imagens_alvo=imagens,
             db_path=args.database,
-            output_dir=args.output_dir,
-            threshold=args.threshold
+            output_dir=None if args.sem_anotacao else args.output_dir,
+            threshold=args.threshold,
+            batch_size=args.batch_size,
+            max_lado=args.max_lado_deteccao or None,
+            qualidade_jpeg=args.qualidade_jpeg,
+            max_lado_saida=args.max_lado_saida or None
         )
         
         print(f"\n✓ Processadas {len(resultados)} imagens")
-        print(f"  Resultados salvos em: {args.output_dir}")
+        if not args.sem_anotacao:
+            print(f"  Resultados salvos em: {args.output_dir}")
+    
+    elif args.video:
+        # Chamada contínua a partir de câmera ou arquivo de vídeo
+        from src.video import processar_video
+        
+        presencas = processar_video(
+            fonte=args.video,
+            db_path=args.database,
+            threshold=args.threshold,
+            detectar_a_cada=args.detectar_a_cada,
+            batch_size=args.batch_size,
+            max_lado=args.max_lado_deteccao or None,
+            arquivo_eventos=args.eventos
+        )
+        
+        if presencas is not None:
+            print(f"\n✓ Alunos presentes: {', '.join(sorted(presencas)) or 'nenhum'}")
     
     else:
-        print("Erro: especifique --imagem ou --batch")
+        print("Erro: especifique --imagem, --batch ou --video")
         return None
 
 
+def comando_servir(args):
+    """Sobe o serviço HTTP de identificação com os modelos carregados uma única vez."""
+    from src.servidor import servir
+    
+    print("=" * 60)
+    print("SERVIÇO DE IDENTIFICAÇÃO")
+    print("=" * 60)
+    
+    _configurar_galeria(args)
+    
+    servir(
+        db_path=args.database,
+        host=args.host,
+        porta=args.porta,
+        threshold=args.threshold,
+        batch_size=args.batch_size,
+        max_lado=args.max_lado_deteccao or None,
+        max_concorrentes=args.max_concorrentes
+    )
+
+
+def comando_benchmark(args):
+    """Mede o desempenho das etapas com imagens e galerias sintéticas e grava o resultado em JSON."""
+    import json
+    from src.benchmark import ETAPAS, comparar_resultados, executar_benchmark, imprimir_comparacao, salvar_benchmark
+    
+    etapas = [etapa.strip() for etapa in args.etapas.split(',') if etapa.strip()]
+    desconhecidas = [etapa for etapa in etapas if etapa not in ETAPAS]
+    if desconhecidas:
+        print(f"Erro: etapas desconhecidas: {', '.join(desconhecidas)} (use {', '.join(ETAPAS)})")
+        sys.exit(2)
+    
+    print("=" * 60)
+    print("BENCHMARK DE DESEMPENHO")
+    print("=" * 60)
+    
+    inteiros = lambda texto: [int(v) for v in texto.split(',')]
+    dados = executar_benchmark(
+        etapas=etapas,
+        lados=inteiros(args.lados),
+        rostos=inteiros(args.rostos),
+        galerias=inteiros(args.galerias),
+        lotes=inteiros(args.lotes),
+        repeticoes=args.repeticoes
+    )
+    salvar_benchmark(dados, args.output)
+    print(f"\n✓ Resultados salvos em: {args.output}")
+    
+    if args.referencia:
+        with open(args.referencia) as f:
+            referencia = json.load(f)
+        comparacoes = comparar_resultados(dados, referencia, args.tolerancia)
+        imprimir_comparacao(comparacoes, args.tolerancia)
+        if any(c['regressao'] for c in comparacoes):
+            sys.exit(1)
+    return dados
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Pipeline de Reconhecimento Facial para Controle de Frequência",
@@ -109,17 +411,74 @@ Exemplos de uso:
   # Processar apenas com CLAHE
   python pipeline.py processar --metodos clahe
 
+  # Construir o índice de embeddings das galerias processadas
+  python pipeline.py indexar
+
+  # Índice de busca aproximada (IVF) para galerias grandes, com comparação à busca exata
+  python pipeline.py indexar --ann --benchmark-ann
+  python pipeline.py identificar --imagem foto_turma.jpg --ann --nprobe 8
+
+  # Galeria compactada (PCA para 256 dimensões, vetores em int8) e comparação das configurações
+  python pipeline.py identificar --imagem foto_turma.jpg --pca 256 --quantizacao int8
+  python pipeline.py testar --modo compressao --output RELATORIO_COMPRESSAO.md
+
+  # Comparar com um template (centróide) por aluno em vez de cada foto
+  python pipeline.py testar --modo templates --centroides 1,2
+  python pipeline.py identificar --imagem foto_turma.jpg --templates 1
+
+  # Cadastrar / remover um aluno (indexa apenas as fotos alteradas)
+  python pipeline.py matricular --imagem nova_foto.jpg --id Habo1
+  python pipeline.py desmatricular --id Habo1
+
   # Executar testes de acurácia
   python pipeline.py testar --output RELATORIO_TESTES.md
 
+  # Rank-1/5, FAR/FRR e melhor limiar a partir da matriz de distâncias (em cache)
+  python pipeline.py testar --modo matriz --output RELATORIO_MATRIZ.md
+
   # Identificar rostos em uma imagem
   python pipeline.py identificar --imagem foto_turma.jpg --output resultado.jpg
 
+  # Gravar as imagens anotadas menores e mais leves
+  python pipeline.py identificar --batch "im1.jpg,im2.jpg" --qualidade-jpeg 85 --max-lado-saida 1600
+
+  # Serviço HTTP para quiosques de chamada (modelos ficam carregados)
+  python pipeline.py servir --porta 8000
+
+  # Tempo por etapa (decodificação, detecção, embeddings, busca...) em JSON
+  python pipeline.py --metrics metricas.json identificar --imagem foto_turma.jpg
+
+  # Fotos de celular (ex.: 4032x3024) decodificadas pela metade
+  python pipeline.py --max-lado-leitura 1600 processar --metodos clahe
+
+  # Benchmark com imagens sintéticas; falha (código 1) se algo ficou 20% mais lento que a referência
+  python pipeline.py benchmark --output benchmark.json
+  python pipeline.py benchmark --etapas deteccao,busca --referencia benchmark_main.json
+
+  # Medir o tempo de importação de cada módulo
+  python pipeline.py --profile-startup identificar --imagem foto_turma.jpg
+
+  # Chamada contínua pela câmera 0, gravando os eventos de presença
+  python pipeline.py identificar --video 0 --eventos presencas.jsonl
+
   # Processar múltiplas imagens de teste
   python pipeline.py identificar --batch "im1.jpg,im2.jpg,im3.jpg" --output-dir resultados/
         """
     )
     
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Exibir o tempo de importação de cada módulo ao final do comando')
+    parser.add_argument('--metrics', metavar='ARQUIVO.json',
+                        help='Gravar tempo por etapa (p50/p95/máx) e contadores do comando em JSON')
+    parser.add_argument('--cache-deteccao', default='data/cache_deteccoes',
+                        help='Diretório do cache de detecções do MTCNN (compartilhado por todos os comandos)')
+    parser.add_argument('--cache-deteccao-max-mb', type=int, default=64,
+                        help='Tamanho máximo do cache de detecções; as entradas mais antigas são removidas')
+    parser.add_argument('--sem-cache-deteccao', action='store_true',
+                        help='Sempre executar o MTCNN, sem ler nem gravar o cache de detecções')
+    parser.add_argument('--max-lado-leitura', type=int, default=0,
+                        help='Decodificar as imagens em 1/2, 1/4 ou 1/8 da resolução, mantendo o maior lado >= N (0 = original)')
+    
     subparsers = parser.add_subparsers(dest='comando', help='Comandos disponíveis')
     
     # Comando: processar
@@ -128,8 +487,47 @@ Exemplos de uso:
     parser_processar.add_argument('--output', default='data/imagens_processadas', help='Diretório de saída')
     parser_processar.add_argument('--metodos', help='Métodos separados por vírgula (ex: clahe,histogram)')
     parser_processar.add_argument('--force', action='store_true', help='Reprocessar imagens já processadas')
+    parser_processar.add_argument('--workers', type=int, default=1, help='Número de processos paralelos')
+    parser_processar.add_argument('--batch-deteccao', type=int, default=8, help='Imagens por chamada ao detector MTCNN')
+    parser_processar.add_argument('--max-lado-deteccao', type=int, default=1024, help='Maior lado da cópia usada na detecção (0 = original)')
+    parser_processar.add_argument('--clahe-clip', type=float, default=2.0, help='Limite de contraste do CLAHE')
+    parser_processar.add_argument('--clahe-grade', type=int, default=8, help='Regiões por lado da grade do CLAHE (8 = 8x8)')
     parser_processar.set_defaults(func=comando_processar)
     
+    # Comando: indexar
+    parser_indexar = subparsers.add_parser('indexar', help='Construir índice de embeddings da galeria')
+    parser_indexar.add_argument('--dir', default='data/imagens_processadas', help='Diretório das imagens processadas')
+    parser_indexar.add_argument('--metodos', help='Métodos separados por vírgula (ex: clahe,histogram)')
+    parser_indexar.add_argument('--batch-size', type=int, default=32, help='Rostos por chamada ao modelo de embeddings')
+    parser_indexar.add_argument('--force', action='store_true', help='Reconstruir o índice do zero')
+    parser_indexar.add_argument('--ann', action='store_true', help='Construir também o índice de busca aproximada (IVF)')
+    parser_indexar.add_argument('--listas', type=int, default=0, help='Listas do índice IVF (0 = 4*sqrt(n))')
+    parser_indexar.add_argument('--benchmark-ann', action='store_true', help='Comparar a busca aproximada com a exata')
+    parser_indexar.add_argument('--pca', type=int, default=0, help='Gerar também a galeria projetada em N dimensões (0 = sem PCA)')
+    parser_indexar.add_argument('--quantizacao', choices=['float32', 'float16', 'int8'], default='float32',
+                                help='Formato dos vetores da galeria compactada')
+    parser_indexar.set_defaults(func=comando_indexar)
+    
+    # Comando: matricular
+    parser_matricular = subparsers.add_parser('matricular', help='Cadastrar foto de um aluno')
+    parser_matricular.add_argument('--imagem', required=True, help='Foto do aluno')
+    parser_matricular.add_argument('--id', required=True, help='ID do aluno (sem hífen)')
+    parser_matricular.add_argument('--input', default='data/images', help='Diretório do dataset original')
+    parser_matricular.add_argument('--output', default='data/imagens_processadas', help='Diretório das galerias')
+    parser_matricular.add_argument('--metodos', help='Métodos separados por vírgula (ex: clahe,histogram)')
+    parser_matricular.add_argument('--batch-size', type=int, default=32, help='Rostos por chamada ao modelo de embeddings')
+    parser_matricular.add_argument('--clahe-clip', type=float, default=2.0, help='Limite de contraste do CLAHE')
+    parser_matricular.add_argument('--clahe-grade', type=int, default=8, help='Regiões por lado da grade do CLAHE (8 = 8x8)')
+    parser_matricular.set_defaults(func=comando_matricular)
+    
+    # Comando: desmatricular
+    parser_desmatricular = subparsers.add_parser('desmatricular', help='Remover todas as fotos de um aluno')
+    parser_desmatricular.add_argument('--id', required=True, help='ID do aluno')
+    parser_desmatricular.add_argument('--input', default='data/images', help='Diretório do dataset original')
+    parser_desmatricular.add_argument('--output', default='data/imagens_processadas', help='Diretório das galerias')
+    parser_desmatricular.add_argument('--metodos', help='Métodos separados por vírgula (ex: clahe,histogram)')
+    parser_desmatricular.set_defaults(func=comando_desmatricular)
+    
     # Comando: testar
     parser_testar = subparsers.add_parser('testar', help='Executar testes de acurácia')
     parser_testar.add_argument('--data-dir', default='data/images', help='Diretório com imagens de teste')
@@ -137,26 +535,114 @@ Exemplos de uso:
     parser_testar.add_argument('--db-histogram', default='data/imagens_processadas/histogram', help='Base Histogram')
     parser_testar.add_argument('--threshold', type=float, default=0.6, help='Limiar de distância')
     parser_testar.add_argument('--output', help='Arquivo de saída (Markdown)')
+    parser_testar.add_argument('--batch-deteccao', type=int, default=8, help='Imagens por chamada ao detector MTCNN')
+    parser_testar.add_argument('--batch-size', type=int, default=32, help='Rostos por chamada ao modelo de embeddings')
+    parser_testar.add_argument('--modo', choices=['top1', 'matriz', 'compressao', 'templates'], default='top1',
+                               help='top1: acerto no limiar fixo; matriz: rank-k, FAR/FRR e varredura de limiares; '
+                                    'compressao: acurácia, tempo e tamanho de cada galeria compactada; '
+                                    'templates: fotos individuais vs centróides por aluno')
+    parser_testar.add_argument('--configuracoes', default='0:float32,0:float16,0:int8,256:float32,256:int8,128:int8',
+                               help='Configurações dimensão:formato do modo compressao (dimensão 0 = sem PCA)')
+    parser_testar.add_argument('--centroides', default='1,2,3',
+                               help='Centróides por aluno comparados no modo templates')
+    parser_testar.add_argument('--cache-matriz', default='data/matriz_distancias.npz',
+                               help='Arquivo onde a matriz de distâncias é guardada (modo matriz)')
+    parser_testar.add_argument('--recalcular-matriz', action='store_true',
+                               help='Ignorar a matriz de distâncias em cache')
+    parser_testar.add_argument('--max-lado-deteccao', type=int, default=1024, help='Maior lado da cópia usada na detecção (0 = original)')
     parser_testar.set_defaults(func=comando_testar)
     
     # Comando: identificar
     parser_identificar = subparsers.add_parser('identificar', help='Identificar rostos em imagens')
     parser_identificar.add_argument('--imagem', help='Imagem individual para processar')
     parser_identificar.add_argument('--batch', help='Múltiplas imagens separadas por vírgula')
+    parser_identificar.add_argument('--video', help='Arquivo de vídeo, índice da câmera (ex: 0) ou URL de stream')
     parser_identificar.add_argument('--database', default='data/imagens_processadas/clahe', help='Base de dados')
     parser_identificar.add_argument('--output', default='resultado_anotado.jpg', help='Arquivo de saída (imagem única)')
     parser_identificar.add_argument('--output-dir', default='data/resultados_cenario_real', help='Diretório de saída (batch)')
     parser_identificar.add_argument('--threshold', type=float, default=0.6, help='Limiar de distância')
+    parser_identificar.add_argument('--batch-size', type=int, default=32, help='Rostos por chamada ao modelo de embeddings')
+    parser_identificar.add_argument('--max-lado-deteccao', type=int, default=1024, help='Maior lado da cópia usada na detecção (0 = original)')
+    parser_identificar.add_argument('--sem-anotacao', action='store_true',
+                                    help='Não anotar nem gravar imagens (apenas os resultados no terminal)')
+    parser_identificar.add_argument('--qualidade-jpeg', type=int, default=95, help='Qualidade JPEG das imagens anotadas (0-100)')
+    parser_identificar.add_argument('--max-lado-saida', type=int, default=0, help='Maior lado das imagens anotadas gravadas (0 = original)')
+    parser_identificar.add_argument('--detectar-a-cada', type=inteiro_positivo, default=5, help='Detectar rostos a cada N quadros (vídeo)')
+    parser_identificar.add_argument('--eventos', help='Arquivo JSON Lines com os eventos de presença (vídeo)')
+    parser_identificar.add_argument('--ann', action='store_true', help='Usar o índice de busca aproximada (indexar --ann)')
+    parser_identificar.add_argument('--nprobe', type=int, default=8, help='Listas visitadas por consulta na busca aproximada')
+    parser_identificar.add_argument('--pca', type=int, default=0, help='Usar a galeria projetada em N dimensões (0 = sem PCA)')
+    parser_identificar.add_argument('--quantizacao', choices=['float32', 'float16', 'int8'], default='float32',
+                                    help='Formato dos vetores da galeria compactada')
+    parser_identificar.add_argument('--templates', type=int, default=0,
+                                    help='Comparar com até N centróides por aluno em vez de cada foto (0 = fotos)')
     parser_identificar.set_defaults(func=comando_identificar)
     
+    # Comando: servir
+    parser_servir = subparsers.add_parser('servir', help='Serviço HTTP local de identificação')
+    parser_servir.add_argument('--database', default='data/imagens_processadas/clahe', help='Base de dados')
+    parser_servir.add_argument('--host', default='127.0.0.1', help='Endereço de escuta')
+    parser_servir.add_argument('--porta', type=int, default=8000, help='Porta de escuta')
+    parser_servir.add_argument('--threshold', type=float, default=0.6, help='Limiar de distância')
+    parser_servir.add_argument('--batch-size', type=int, default=32, help='Rostos por chamada ao modelo de embeddings')
+    parser_servir.add_argument('--max-lado-deteccao', type=int, default=1024, help='Maior lado da cópia usada na detecção (0 = original)')
+    parser_servir.add_argument('--max-concorrentes', type=int, default=2, help='Imagens processadas simultaneamente')
+    parser_servir.add_argument('--ann', action='store_true', help='Usar o índice de busca aproximada (indexar --ann)')
+    parser_servir.add_argument('--nprobe', type=int, default=8, help='Listas visitadas por consulta na busca aproximada')
+    parser_servir.add_argument('--pca', type=int, default=0, help='Usar a galeria projetada em N dimensões (0 = sem PCA)')
+    parser_servir.add_argument('--quantizacao', choices=['float32', 'float16', 'int8'], default='float32',
+                               help='Formato dos vetores da galeria compactada')
+    parser_servir.add_argument('--templates', type=int, default=0,
+                               help='Comparar com até N centróides por aluno em vez de cada foto (0 = fotos)')
+    parser_servir.set_defaults(func=comando_servir)
+    
+    # Comando: benchmark
+    parser_benchmark = subparsers.add_parser('benchmark', help='Medir o desempenho das etapas com dados sintéticos')
+    parser_benchmark.add_argument('--etapas', default='deteccao,normalizacao,embeddings,busca',
+                                  help='Etapas medidas, separadas por vírgula')
+    parser_benchmark.add_argument('--lados', default='640,1280,1920', help='Maior lado das imagens de detecção')
+    parser_benchmark.add_argument('--rostos', default='1,4,16', help='Rostos por imagem de detecção')
+    parser_benchmark.add_argument('--galerias', default='1000,5000,20000',
+                                  help='Tamanhos das galerias da busca (50000 vetores ocupam ~0,8 GB)')
+    parser_benchmark.add_argument('--lotes', default='1,8,32', help='Rostos por chamada ao modelo de embeddings')
+    parser_benchmark.add_argument('--repeticoes', type=int, default=5, help='Repetições de cada medição')
+    parser_benchmark.add_argument('--output', default='benchmark.json', help='Arquivo JSON de saída')
+    parser_benchmark.add_argument('--referencia', help='JSON de uma execução anterior para comparação')
+    parser_benchmark.add_argument('--tolerancia', type=float, default=0.2,
+                                  help='Aumento relativo do p50 considerado regressão (0.2 = 20%%)')
+    parser_benchmark.set_defaults(func=comando_benchmark)
+    
     args = parser.parse_args()
     
+    if args.profile_startup:
+        from src.perfil_inicializacao import executar_com_perfil
+        argumentos = [a for a in sys.argv[1:] if a != '--profile-startup']
+        sys.exit(executar_com_perfil(__file__, argumentos))
+    
     if not args.comando:
         parser.print_help()
         return
     
+    from src.cache_deteccao import configurar_cache_deteccoes
+    configurar_cache_deteccoes(
+        args.cache_deteccao,
+        args.cache_deteccao_max_mb * 1024 * 1024,
+        ativo=not args.sem_cache_deteccao
+    )
+    
+    from src.preprocessamento import configurar_leitura
+    configurar_leitura(args.max_lado_leitura)
+    
     # Executa o comando
-    args.func(args)
+    try:
+        args.func(args)
+    finally:
+        if args.metrics:
+            from src.metricas import imprimir_resumo, salvar_metricas
+            
+            dados = salvar_metricas(args.metrics, comando=args.comando)
+            imprimir_resumo(dados)
+            print(f"\n✓ Métricas por etapa salvas em: {args.metrics}")
 
 
 if __name__ == "__main__":
@@ -2,7 +2,6 @@ import os
 import cv2
 from deepface import DeepFace
 from src.preprocessamento import get_detector
-import time
 from pathlib import Path
 
 # Configurações
@@ -50,17 +49,14 @@ def processar_imagem_cenario_real(img_path, db_path, output_dir):
         
         face_img = img[y1:y2, x1:x2]
         
-        # Busca no DB
-        temp_path = f"temp_face_{time.time()}_{i}.jpg"
-        cv2.imwrite(temp_path, face_img)
-        
         nome_identificado = "Desconhecido"
         distancia = 0.0
         cor = (0, 0, 255) # Vermelho
         
+        # Busca no DB com o recorte em memória
         try:
             result = DeepFace.find(
-                img_path=temp_path,
+                img_path=face_img,
                 db_path=db_path,
                 enforce_detection=False,
                 silent=True,
@@ -81,9 +77,6 @@ def processar_imagem_cenario_real(img_path, db_path, output_dir):
                         identificados += 1
         except Exception as e:
             print(f"Erro na identificação: {e}")
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
         
         # Anotar imagem
         # Aumentando espessura da borda e tamanho do texto
@@ -0,0 +1,209 @@
+"""
+Busca aproximada de vizinhos (IVF) para galerias grandes.
+
+Os vetores da galeria são agrupados por k-means esférico em `n_listas`
+listas invertidas; cada consulta compara-se apenas com os centróides e com
+os vetores das `nprobe` listas mais próximas. Com n_listas ~ 4·sqrt(n), o
+custo por consulta cresce com a raiz do tamanho da galeria em vez de linearmente.
+"""
+
+import time
+import numpy as np
+from pathlib import Path
+
+from src.galeria import NOME_INDICE, TAMANHO_BLOCO_BUSCA, assinatura_linhas, normalizar_l2
+
+NOME_INDICE_ANN = NOME_INDICE.replace('.npz', '.ivf.npz')
+NPROBE_PADRAO = 8
+ITERACOES_KMEANS = 10
+# Amostra usada no treino do k-means, por lista
+AMOSTRA_POR_LISTA = 64
+
+
+def n_listas_padrao(n):
+    """Número de listas sugerido para uma galeria com n vetores."""
+    return max(1, int(4 * np.sqrt(n)))
+
+
+def _atribuir(vetores, centroides):
+    """Lista (centróide mais similar) de cada vetor, percorrendo em fatias."""
+    atribuicao = np.empty(len(vetores), dtype=np.int32)
+    for inicio in range(0, len(vetores), TAMANHO_BLOCO_BUSCA):
+        fatia = np.asarray(vetores[inicio:inicio + TAMANHO_BLOCO_BUSCA], dtype=np.float32)
+        atribuicao[inicio:inicio + len(fatia)] = (fatia @ centroides.T).argmax(axis=1)
+    return atribuicao
+
+
+def kmeans_esferico(vetores, n_listas, iteracoes=ITERACOES_KMEANS, semente=0):
+    """
+    K-means com similaridade de cosseno (centróides de norma unitária).
+
+    Returns:
+        np.ndarray: Centróides (n_listas, d)
+    """
+    aleatorio = np.random.default_rng(semente)
+    n = len(vetores)
+    n_listas = min(n_listas, n)
+    amostra = np.sort(aleatorio.choice(n, min(n, n_listas * AMOSTRA_POR_LISTA), replace=False))
+    dados = np.asarray(vetores[amostra], dtype=np.float32)
+
+    centroides = dados[aleatorio.choice(len(dados), n_listas, replace=False)].copy()
+    for _ in range(iteracoes):
+        atribuicao = _atribuir(dados, centroides)
+        ordem = np.argsort(atribuicao, kind='stable')
+        listas, inicios = np.unique(atribuicao[ordem], return_index=True)
+        somas = np.add.reduceat(dados[ordem], inicios, axis=0)
+        novos = centroides.copy()
+        novos[listas] = normalizar_l2(somas)
+        # Listas vazias recebem vetores aleatórios da amostra
+        vazias = np.setdiff1d(np.arange(n_listas), listas)
+        if len(vazias):
+            novos[vazias] = dados[aleatorio.choice(len(dados), len(vazias), replace=False)]
+        centroides = novos
+    return centroides
+
+
+class IndiceIVF:
+    """
+    Índice de listas invertidas sobre as linhas de uma GaleriaEmbeddings.
+
+    Linhas anexadas à galeria depois do treino são comparadas por força bruta
+    até o índice ser reconstruído; linhas removidas são ignoradas.
+    """
+
+    def __init__(self, centroides, linhas, inicios, n_treinadas, assinatura, nprobe=NPROBE_PADRAO):
+        self.centroides = np.ascontiguousarray(centroides, dtype=np.float32)
+        self.linhas = np.asarray(linhas, dtype=np.int64)
+        self.inicios = np.asarray(inicios, dtype=np.int64)
+        self.n_treinadas = int(n_treinadas)
+        self.assinatura = str(assinatura)
+        self.nprobe = nprobe
+
+    @property
+    def n_listas(self):
+        return len(self.centroides)
+
+    @staticmethod
+    def caminho(db_path):
+        """Arquivo do índice IVF dentro do diretório da galeria."""
+        return Path(db_path) / NOME_INDICE_ANN
+
+    @classmethod
+    def construir(cls, galeria, n_listas=None, nprobe=NPROBE_PADRAO):
+        """Treina os centróides e distribui as linhas ativas da galeria entre as listas."""
+        ativas = galeria.linhas_ativas()
+        n_listas = n_listas or n_listas_padrao(len(ativas))
+        vetores = galeria.embeddings
+        centroides = kmeans_esferico(vetores[ativas], n_listas)
+
+        atribuicao = _atribuir(vetores[ativas], centroides)
+        ordem = np.argsort(atribuicao, kind='stable')
+        inicios = np.searchsorted(atribuicao[ordem], np.arange(len(centroides) + 1))
+        return cls(centroides, ativas[ordem], inicios, galeria.n_linhas, assinatura_linhas(galeria.arquivos), nprobe)
+
+    def compativel(self, galeria):
+        """Verifica se as linhas treinadas ainda são as mesmas da galeria (sem compactação no meio)."""
+        return (galeria.n_linhas >= self.n_treinadas
+                and assinatura_linhas(galeria.arquivos[:self.n_treinadas]) == self.assinatura)
+
+    def salvar(self, caminho):
+        np.savez(caminho, centroides=self.centroides, linhas=self.linhas, inicios=self.inicios,
+                 n_treinadas=np.array(self.n_treinadas), assinatura=np.array(self.assinatura))
+
+    @classmethod
+    def carregar(cls, caminho, nprobe=NPROBE_PADRAO):
+        with np.load(caminho) as dados:
+            return cls(dados['centroides'], dados['linhas'], dados['inicios'], int(dados['n_treinadas']),
+                       str(dados['assinatura']), nprobe)
+
+    def candidatos(self, consulta, nprobe=None):
+        """Linhas da galeria nas `nprobe` listas mais próximas da consulta."""
+        nprobe = min(nprobe or self.nprobe, self.n_listas)
+        similaridades = self.centroides @ consulta
+        listas = np.argpartition(-similaridades, nprobe - 1)[:nprobe] if nprobe < self.n_listas else np.arange(self.n_listas)
+        return np.concatenate([self.linhas[self.inicios[l]:self.inicios[l + 1]] for l in listas])
+
+    def buscar(self, galeria, consultas, k=1, nprobe=None):
+        """
+        Mesma interface de GaleriaEmbeddings.buscar, visitando apenas as listas mais próximas.
+
+        Returns:
+            tuple: (indices, distancias), ambos (m, k) em ordem crescente de distância
+        """
+        consultas = np.atleast_2d(np.asarray(consultas, dtype=np.float32))
+        vetores = galeria.embeddings
+        # Linhas anexadas depois do treino entram sempre como candidatas
+        recentes = np.arange(self.n_treinadas, galeria.n_linhas)
+
+        indices = []
+        distancias = []
+        for consulta in consultas:
+            candidatos = np.concatenate([self.candidatos(consulta, nprobe), recentes])
+            candidatos = np.sort(candidatos[galeria.ativos[candidatos]])
+            similaridades = vetores[candidatos] @ consulta
+            kk = min(k, len(candidatos))
+            melhores = np.argpartition(-similaridades, kk - 1)[:kk] if 0 < kk < len(candidatos) else np.arange(kk)
+            melhores = melhores[np.argsort(-similaridades[melhores])]
+            indices.append(candidatos[melhores])
+            distancias.append(1.0 - similaridades[melhores])
+
+        # Consultas com menos candidatos que k são completadas com -1 / infinito
+        k = max((len(i) for i in indices), default=0)
+        saida_idx = np.full((len(consultas), k), -1, dtype=np.int64)
+        saida_dist = np.full((len(consultas), k), np.inf, dtype=np.float32)
+        for linha, (idx, dist) in enumerate(zip(indices, distancias)):
+            saida_idx[linha, :len(idx)] = idx
+            saida_dist[linha, :len(dist)] = dist
+        return saida_idx, saida_dist
+
+
+def ativar_ann(galeria, db_path, nprobe=NPROBE_PADRAO):
+    """
+    Passa a busca da galeria para o índice IVF salvo em db_path, se existir.
+
+    Returns:
+        bool: True se o índice foi carregado
+    """
+    caminho = IndiceIVF.caminho(db_path)
+    if not caminho.exists():
+        print(f"Aviso: índice ANN não encontrado em {caminho}; usando busca exata")
+        return False
+    indice = IndiceIVF.carregar(caminho, nprobe)
+    if not indice.compativel(galeria):
+        print(f"Aviso: índice ANN desatualizado em {caminho} (execute indexar --ann); usando busca exata")
+        return False
+    galeria.ann = indice
+    return True
+
+
+def comparar_com_busca_exata(galeria, consultas, k=1, nprobes=(1, 2, 4, 8, 16, 32), n_listas=None):
+    """
+    Mede recall@k e tempo por consulta do IVF em relação à busca exata.
+
+    Returns:
+        list: Um dicionário {'nprobe', 'recall', 'ms_por_consulta'} por configuração,
+        começando pela busca exata (nprobe = None)
+    """
+    ann, galeria.ann = galeria.ann, None
+    try:
+        inicio = time.perf_counter()
+        exatos, _ = galeria.buscar(consultas, k)
+        tempo_exato = (time.perf_counter() - inicio) / len(consultas)
+
+        indice = IndiceIVF.construir(galeria, n_listas)
+        resultados = [{'nprobe': None, 'recall': 1.0, 'ms_por_consulta': tempo_exato * 1000}]
+        for nprobe in nprobes:
+            if nprobe > indice.n_listas:
+                break
+            inicio = time.perf_counter()
+            aproximados, _ = indice.buscar(galeria, consultas, k, nprobe)
+            tempo = (time.perf_counter() - inicio) / len(consultas)
+            acertos = sum(len(np.intersect1d(a, e)) for a, e in zip(aproximados, exatos))
+            resultados.append({
+                'nprobe': nprobe,
+                'recall': acertos / max(exatos.size, 1),
+                'ms_por_consulta': tempo * 1000
+            })
+        return resultados
+    finally:
+        galeria.ann = ann
@@ -0,0 +1,348 @@
+"""
+Avaliação completa pela matriz de distâncias consulta × galeria.
+
+A matriz é calculada uma vez e guardada em disco; rank-k, curvas FAR/FRR e
+a escolha do limiar saem dela sem repetir detecção nem embeddings.
+"""
+
+import os
+import json
+import hashlib
+import time
+import numpy as np
+
+from src.preprocessamento import MAX_LADO_DETECCAO, TAMANHO_LOTE_DETECCAO, max_lado_leitura
+from src.galeria import MODELO, TAMANHO_LOTE_PADRAO, extrair_id, gerar_embeddings, get_galeria
+from src.compressao import GaleriaCompactada
+from src.templates import GaleriaTemplates
+from src.testes import extrair_rostos_teste, listar_imagens_teste
+
+ARQUIVO_MATRIZ_PADRAO = 'data/matriz_distancias.npz'
+PASSO_LIMIAR = 0.01
+# (dimensao PCA, formato) comparados por `testar --modo compressao`; 0 = sem projeção
+CONFIGURACOES_COMPRESSAO = ((0, 'float32'), (0, 'float16'), (0, 'int8'), (256, 'float32'), (256, 'int8'), (128, 'int8'))
+# Centróides por aluno comparados por `testar --modo templates`
+QUANTIDADES_TEMPLATES = (1, 2, 3)
+
+
+def _chave_matriz(imagens, bases, galerias, max_lado):
+    """Identifica o conjunto de consultas, galerias e configurações que gerou a matriz."""
+    conteudo = {
+        'modelo': MODELO,
+        'max_lado': max_lado,
+        'consultas': [(os.path.basename(c), os.path.getmtime(c), os.path.getsize(c)) for c in imagens],
+        'galerias': {
+            nome: [bases[nome], galeria.arquivos[galeria.ativos].tolist(), galeria.mtimes[galeria.ativos].tolist()]
+            for nome, galeria in galerias.items()
+        }
+    }
+    # Os recortes saem da imagem decodificada em resolução reduzida
+    if max_lado_leitura():
+        conteudo['max_lado_leitura'] = max_lado_leitura()
+    return hashlib.sha1(json.dumps(conteudo, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def calcular_matrizes(data_dir, bases, arquivo_cache=ARQUIVO_MATRIZ_PADRAO, recalcular=False,
+                      tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                      batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Calcula (ou lê do cache) a matriz de distâncias de cada galeria.
+
+    O cache é reaproveitado enquanto as imagens de teste, as galerias e os
+    tamanhos de leitura e de detecção forem os mesmos.
+
+    Args:
+        data_dir: Diretório com imagens de teste
+        bases: Dicionário {nome: caminho da galeria}
+        arquivo_cache: Arquivo .npz onde as matrizes são guardadas
+        recalcular: Ignora o cache existente
+
+    Returns:
+        dict: {'arquivos', 'ids_consulta', 'matrizes': {nome: (distancias, ids_galeria)}}
+    """
+    galerias = {nome: get_galeria(db_path) for nome, db_path in bases.items()}
+    chave = _chave_matriz(listar_imagens_teste(data_dir), bases, galerias, max_lado)
+
+    if not recalcular and arquivo_cache and os.path.exists(arquivo_cache):
+        with np.load(arquivo_cache) as dados:
+            if str(dados['chave']) == chave:
+                print(f"✓ Matriz de distâncias lida de {arquivo_cache}")
+                return {
+                    'arquivos': dados['arquivos'],
+                    'ids_consulta': dados['ids_consulta'],
+                    'matrizes': {
+                        nome: (dados[f'distancias_{nome}'], dados[f'ids_galeria_{nome}'])
+                        for nome in bases
+                    }
+                }
+
+    rostos = extrair_rostos_teste(data_dir, tamanho_lote, max_lado)
+    arquivos = np.array([os.path.basename(caminho) for caminho, _ in rostos], dtype=str)
+    ids_consulta = np.array([extrair_id(caminho) for caminho, _ in rostos], dtype=str)
+
+    print(f"\nGerando embeddings de {len(rostos)} rostos...")
+    embeddings = gerar_embeddings([rosto for _, rosto in rostos], batch_size)
+
+    matrizes = {}
+    for nome, galeria in galerias.items():
+        linhas = galeria.linhas_ativas()
+        if len(rostos) and len(linhas):
+            distancias = 1.0 - embeddings @ galeria.embeddings[linhas].T
+        else:
+            distancias = np.empty((len(rostos), len(linhas)), dtype=np.float32)
+        matrizes[nome] = (distancias.astype(np.float32), galeria.identidades[linhas])
+
+    if arquivo_cache:
+        os.makedirs(os.path.dirname(arquivo_cache) or '.', exist_ok=True)
+        campos = {}
+        for nome, (distancias, ids_galeria) in matrizes.items():
+            campos[f'distancias_{nome}'] = distancias
+            campos[f'ids_galeria_{nome}'] = ids_galeria
+        np.savez(arquivo_cache, chave=np.array(chave), arquivos=arquivos, ids_consulta=ids_consulta, **campos)
+        print(f"✓ Matriz de distâncias salva em {arquivo_cache}")
+
+    return {'arquivos': arquivos, 'ids_consulta': ids_consulta, 'matrizes': matrizes}
+
+
+def distancias_por_identidade(distancias, ids_galeria):
+    """
+    Reduz a matriz consulta × foto a consulta × identidade (menor distância de cada aluno).
+
+    Returns:
+        tuple: (ids_unicos, matriz m × identidades)
+    """
+    ids_unicos, coluna = np.unique(ids_galeria, return_inverse=True)
+    por_identidade = np.full((len(ids_unicos), distancias.shape[0]), np.inf, dtype=np.float32)
+    np.minimum.at(por_identidade, coluna, distancias.T)
+    return ids_unicos, por_identidade.T
+
+
+def calcular_metricas(distancias, ids_consulta, ids_galeria, limiares=None, ranks=(1, 5)):
+    """
+    Deriva rank-k, FAR/FRR e acurácia top-1 para todos os limiares de uma vez.
+
+    Uma consulta conta como acerto top-1 no limiar t quando a identidade mais
+    próxima é a correta e sua distância é menor que t (mesmo critério de `testar`).
+
+    Returns:
+        dict: Métricas escalares e curvas indexadas por `limiares`
+    """
+    if limiares is None:
+        limiares = np.round(np.arange(0.0, 1.0 + PASSO_LIMIAR / 2, PASSO_LIMIAR), 4)
+    total = len(ids_consulta)
+    ids_unicos, por_identidade = distancias_por_identidade(distancias, ids_galeria)
+
+    # Consultas cuja identidade existe na galeria (as demais só geram impostores)
+    indice_real = np.searchsorted(ids_unicos, ids_consulta)
+    indice_real = np.minimum(indice_real, max(len(ids_unicos) - 1, 0))
+    presentes = (ids_unicos[indice_real] == ids_consulta) if len(ids_unicos) else np.zeros(total, dtype=bool)
+
+    linhas = np.flatnonzero(presentes)
+    genuinas = por_identidade[linhas, indice_real[linhas]]
+    posicao = (por_identidade[linhas] < genuinas[:, None]).sum(axis=1) + 1
+    rank_k = {k: float((posicao <= k).mean()) if len(linhas) else 0.0 for k in ranks}
+
+    mascara_impostor = np.ones(por_identidade.shape, dtype=bool)
+    mascara_impostor[linhas, indice_real[linhas]] = False
+    impostoras = np.sort(por_identidade[mascara_impostor])
+    genuinas = np.sort(genuinas)
+
+    # Aceita-se quando a distância é menor que o limiar
+    far = np.searchsorted(impostoras, limiares, side='left') / max(len(impostoras), 1)
+    frr = 1.0 - np.searchsorted(genuinas, limiares, side='left') / max(len(genuinas), 1)
+
+    if por_identidade.shape[1]:
+        mais_proxima = por_identidade.argmin(axis=1)
+        top1_correto = np.sort(por_identidade[linhas, indice_real[linhas]][mais_proxima[linhas] == indice_real[linhas]])
+    else:
+        top1_correto = np.empty(0, dtype=np.float32)
+    acuracia = np.searchsorted(top1_correto, limiares, side='left') / max(total, 1)
+
+    melhor = int(np.argmax(acuracia))
+    eer = int(np.argmin(np.abs(far - frr)))
+    return {
+        'total': total,
+        'presentes': len(linhas),
+        'rank': rank_k,
+        'limiares': limiares,
+        'far': far,
+        'frr': frr,
+        'acuracia': acuracia,
+        'melhor_limiar': float(limiares[melhor]),
+        'melhor_acuracia': float(acuracia[melhor]),
+        'limiar_eer': float(limiares[eer]),
+        'eer': float((far[eer] + frr[eer]) / 2)
+    }
+
+
+def avaliar_matriz(data_dir, bases, arquivo_cache=ARQUIVO_MATRIZ_PADRAO, recalcular=False,
+                   tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                   batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Avalia as galerias pela matriz completa de distâncias.
+
+    Returns:
+        dict: {nome: métricas de calcular_metricas}
+    """
+    dados = calcular_matrizes(data_dir, bases, arquivo_cache, recalcular, tamanho_lote, max_lado, batch_size)
+    return {
+        nome: calcular_metricas(distancias, dados['ids_consulta'], ids_galeria)
+        for nome, (distancias, ids_galeria) in dados['matrizes'].items()
+    }
+
+
+def imprimir_resumo_matriz(metricas, threshold=0.6):
+    """Imprime rank-k, EER e o melhor limiar de cada galeria."""
+    for nome, m in metricas.items():
+        acuracia_atual = m['acuracia'][np.abs(m['limiares'] - threshold).argmin()]
+        print(f"\n{nome.upper()} ({m['total']} consultas, {m['presentes']} com identidade na galeria)")
+        for k, valor in m['rank'].items():
+            print(f"  Rank-{k}: {valor:.2%}")
+        print(f"  EER: {m['eer']:.2%} (limiar {m['limiar_eer']:.2f})")
+        print(f"  Melhor limiar: {m['melhor_limiar']:.2f} -> acurácia {m['melhor_acuracia']:.2%}")
+        print(f"  Limiar atual {threshold:.2f} -> acurácia {acuracia_atual:.2%}")
+
+
+def gerar_relatorio_matriz(metricas, output_file="RELATORIO_MATRIZ.md", passo_tabela=0.05):
+    """Gera relatório Markdown com rank-k, EER e a varredura de limiares de cada galeria."""
+    relatorio = f"""# Avaliação por Matriz de Distâncias
+
+**Data:** {time.strftime("%d/%m/%Y")}
+
+Cada rosto de teste foi comparado com todas as fotos das galerias (distância de cosseno).
+A partir dessa matriz foram calculados o rank-k (posição da identidade correta entre os
+alunos mais próximos), as taxas de falsa aceitação (FAR) e falsa rejeição (FRR) e a
+acurácia top-1 para cada limiar.
+
+## Resumo
+
+| Método | Rank-1 | Rank-5 | EER | Limiar EER | Melhor Limiar | Acurácia no Melhor Limiar |
+|--------|--------|--------|-----|------------|---------------|---------------------------|
+"""
+    for nome, m in metricas.items():
+        relatorio += (
+            f"| {nome} | {m['rank'].get(1, 0):.2%} | {m['rank'].get(5, 0):.2%} | {m['eer']:.2%} | "
+            f"{m['limiar_eer']:.2f} | {m['melhor_limiar']:.2f} | {m['melhor_acuracia']:.2%} |\n"
+        )
+
+    for nome, m in metricas.items():
+        relatorio += f"\n## Varredura de Limiares - {nome}\n\n"
+        relatorio += "| Limiar | FAR | FRR | Acurácia Top-1 |\n"
+        relatorio += "|--------|-----|-----|----------------|\n"
+        passo = max(int(round(passo_tabela / PASSO_LIMIAR)), 1)
+        for i in range(0, len(m['limiares']), passo):
+            relatorio += f"| {m['limiares'][i]:.2f} | {m['far'][i]:.2%} | {m['frr'][i]:.2%} | {m['acuracia'][i]:.2%} |\n"
+
+    with open(output_file, "w") as f:
+        f.write(relatorio)
+
+    print(f"\nRelatório gerado em {output_file}")
+
+
+def variantes_compressao(configuracoes=CONFIGURACOES_COMPRESSAO):
+    """Variantes de `avaliar_variantes` para cada (dimensao PCA, formato); dimensao 0 = sem projeção."""
+    return {
+        (f"pca{dimensao} " if dimensao else "") + formato:
+            lambda galeria, dimensao=dimensao, formato=formato: GaleriaCompactada.construir(galeria, dimensao or None, formato)
+        for dimensao, formato in configuracoes
+    }
+
+
+def variantes_templates(quantidades=QUANTIDADES_TEMPLATES):
+    """Variantes de `avaliar_variantes`: fotos individuais e templates com n centróides por aluno."""
+    variantes = {'fotos': lambda galeria: galeria}
+    for n in quantidades:
+        variantes[f"templates x{n}"] = lambda galeria, n=n: GaleriaTemplates.construir(galeria, n)
+    return variantes
+
+
+def _medir_galeria(galeria, embeddings, ids_consulta, threshold):
+    """Tempo da busca top-1 e métricas da matriz completa, ambos pelo caminho de busca da própria galeria."""
+    inicio = time.perf_counter()
+    galeria.buscar(embeddings, k=1)
+    tempo = (time.perf_counter() - inicio) / len(embeddings)
+
+    # Todos os vizinhos de cada consulta remontam a matriz consulta × linha
+    indices, distancias_k = galeria.buscar(embeddings, k=len(galeria))
+    distancias = np.full((len(embeddings), galeria.n_linhas), np.inf, dtype=np.float32)
+    np.put_along_axis(distancias, indices, distancias_k, axis=1)
+    linhas = galeria.linhas_ativas()
+    m = calcular_metricas(distancias[:, linhas], ids_consulta, galeria.identidades[linhas])
+    return {
+        'vetores': len(galeria),
+        'dimensao': galeria.dimensao,
+        'bytes_por_vetor': getattr(galeria, 'bytes_por_vetor', galeria.dimensao * 4),
+        'ms_por_consulta': tempo * 1000,
+        'rank1': m['rank'][1],
+        'acuracia': float(m['acuracia'][np.abs(m['limiares'] - threshold).argmin()]),
+        'melhor_limiar': m['melhor_limiar'],
+        'melhor_acuracia': m['melhor_acuracia']
+    }
+
+
+def avaliar_variantes(data_dir, bases, variantes, threshold=0.6,
+                      tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                      batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Compara acurácia, tempo de busca e tamanho de variantes de cada galeria.
+
+    Os rostos de teste são detectados e convertidos em embeddings uma única vez;
+    cada variante só refaz a galeria a partir do índice de fotos.
+
+    Args:
+        variantes: Dicionário {rótulo: função(galeria) -> galeria com o mesmo `buscar`}
+
+    Returns:
+        dict: {nome: {rótulo: resultado}}
+    """
+    rostos = extrair_rostos_teste(data_dir, tamanho_lote, max_lado)
+    ids_consulta = np.array([extrair_id(caminho) for caminho, _ in rostos], dtype=str)
+
+    print(f"\nGerando embeddings de {len(rostos)} rostos...")
+    embeddings = gerar_embeddings([rosto for _, rosto in rostos], batch_size)
+
+    resultados = {}
+    for nome, db_path in bases.items():
+        galeria = get_galeria(db_path)
+        resultados[nome] = {}
+        if not len(rostos) or not len(galeria):
+            continue
+        for rotulo, construir in variantes.items():
+            resultados[nome][rotulo] = _medir_galeria(construir(galeria), embeddings, ids_consulta, threshold)
+    return resultados
+
+
+def imprimir_comparacao(resultados, threshold=0.6):
+    """Imprime uma tabela por galeria com as variantes avaliadas."""
+    for nome, variantes in resultados.items():
+        print(f"\n{nome.upper()}")
+        print(f"  {'Variante':<16} {'Vetores':>8} {'Bytes/vetor':>11} {'ms/consulta':>12} {'Rank-1':>8} "
+              f"{f'Acur. {threshold:.2f}':>12} {'Melhor':>16}")
+        for rotulo, r in variantes.items():
+            melhor = f"{r['melhor_acuracia']:.2%} ({r['melhor_limiar']:.2f})"
+            print(f"  {rotulo:<16} {r['vetores']:>8} {r['bytes_por_vetor']:>11} {r['ms_por_consulta']:>12.3f} "
+                  f"{r['rank1']:>8.2%} {r['acuracia']:>12.2%} {melhor:>16}")
+
+
+def gerar_relatorio_comparacao(resultados, output_file, titulo, descricao, threshold=0.6):
+    """Gera relatório Markdown com as variantes avaliadas de cada galeria."""
+    relatorio = f"""# {titulo}
+
+**Data:** {time.strftime("%d/%m/%Y")}
+
+{descricao}
+"""
+    for nome, variantes in resultados.items():
+        relatorio += f"\n## {nome}\n\n"
+        relatorio += f"| Variante | Vetores | Bytes por Vetor | ms por Consulta | Rank-1 | Acurácia ({threshold:.2f}) | Melhor Limiar | Acurácia no Melhor Limiar |\n"
+        relatorio += "|----------|---------|-----------------|-----------------|--------|-----------------|---------------|---------------------------|\n"
+        for rotulo, r in variantes.items():
+            relatorio += (
+                f"| {rotulo} | {r['vetores']} | {r['bytes_por_vetor']} | {r['ms_por_consulta']:.3f} | "
+                f"{r['rank1']:.2%} | {r['acuracia']:.2%} | {r['melhor_limiar']:.2f} | {r['melhor_acuracia']:.2%} |\n"
+            )
+
+    with open(output_file, "w") as f:
+        f.write(relatorio)
+
+    print(f"\nRelatório gerado em {output_file}")
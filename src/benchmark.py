@@ -0,0 +1,277 @@
+"""
+Benchmark reprodutível das etapas de detecção, normalização, embeddings e busca.
+
+As imagens são sintéticas (rostos esquemáticos sobre fundo com ruído, gerados
+com semente fixa) e as galerias são vetores aleatórios, então os números de
+duas execuções na mesma máquina podem ser comparados entre commits.
+"""
+
+import os
+import json
+import math
+import time
+import platform
+import subprocess
+
+import cv2
+import numpy as np
+
+from src.metricas import estatisticas
+
+ETAPAS = ('deteccao', 'normalizacao', 'embeddings', 'busca')
+LADOS_PADRAO = (640, 1280, 1920)
+ROSTOS_PADRAO = (1, 4, 16)
+# A maior galeria padrão ocupa ~330 MB em float32 com DIMENSAO_EMBEDDING;
+# tamanhos maiores ficam a cargo de --galerias
+GALERIAS_PADRAO = (1000, 5000, 20000)
+# Linhas geradas e normalizadas por vez ao montar as galerias sintéticas
+BLOCO_GERACAO_GALERIA = 4096
+LOTES_EMBEDDING_PADRAO = (1, 8, 32)
+TAMANHOS_ROSTO_NORMALIZACAO = (112, 224, 448)
+REPETICOES_PADRAO = 5
+# Etapas de poucos milissegundos são repetidas mais vezes
+FATOR_REPETICOES_RAPIDAS = 20
+CONSULTAS_BUSCA = 16
+DIMENSAO_EMBEDDING = 4096
+TOLERANCIA_PADRAO = 0.2
+SEMENTE = 0
+
+# Campos de cada resultado que são medições (os demais identificam a configuração)
+CAMPOS_MEDIDOS = {'contagem', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms', 'ms_por_rosto', 'ms_por_consulta',
+                  'rostos_detectados', 'erro'}
+
+
+def desenhar_rosto(img, centro, tamanho, aleatorio):
+    """Desenha um rosto esquemático (pele, olhos, sobrancelhas, nariz e boca) de altura ~tamanho."""
+    cx, cy = centro
+    pele = tuple(int(c) for c in aleatorio.integers([90, 120, 170], [140, 170, 230]))
+    cv2.ellipse(img, (cx, cy), (int(tamanho * 0.38), int(tamanho * 0.5)), 0, 0, 360, pele, -1)
+
+    dx, dy = int(tamanho * 0.15), int(tamanho * 0.1)
+    for lado in (-1, 1):
+        olho = (cx + lado * dx, cy - dy)
+        cv2.ellipse(img, olho, (int(tamanho * 0.07), int(tamanho * 0.035)), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(img, olho, max(1, int(tamanho * 0.025)), (40, 30, 20), -1)
+        cv2.line(img, (olho[0] - int(tamanho * 0.08), olho[1] - int(tamanho * 0.08)),
+                 (olho[0] + int(tamanho * 0.08), olho[1] - int(tamanho * 0.09)), (30, 30, 40), max(1, tamanho // 40))
+    cv2.line(img, (cx, cy - int(tamanho * 0.02)), (cx, cy + int(tamanho * 0.12)),
+             tuple(int(c * 0.7) for c in pele), max(1, tamanho // 50))
+    cv2.ellipse(img, (cx, cy + int(tamanho * 0.25)), (int(tamanho * 0.12), int(tamanho * 0.05)), 0, 0, 180,
+                (60, 60, 150), max(1, tamanho // 30))
+
+
+def gerar_imagem_sintetica(lado, n_rostos, semente=SEMENTE):
+    """
+    Gera uma imagem BGR 4:3 com `n_rostos` rostos dispostos em grade.
+
+    Args:
+        lado: Maior lado da imagem em pixels
+        n_rostos: Quantidade de rostos desenhados
+
+    Returns:
+        np.ndarray: Imagem BGR (lado * 3/4, lado, 3)
+    """
+    aleatorio = np.random.default_rng(semente)
+    altura = lado * 3 // 4
+    ruido = aleatorio.integers(0, 256, (altura // 16 + 1, lado // 16 + 1, 3), dtype=np.uint8)
+    img = cv2.resize(ruido, (lado, altura), interpolation=cv2.INTER_CUBIC)
+
+    colunas = max(1, math.ceil(math.sqrt(n_rostos * lado / altura)))
+    linhas = math.ceil(n_rostos / colunas)
+    largura_celula, altura_celula = lado // colunas, altura // linhas
+    tamanho = int(min(largura_celula, altura_celula) * 0.75)
+    for i in range(n_rostos):
+        linha, coluna = divmod(i, colunas)
+        centro = (coluna * largura_celula + largura_celula // 2, linha * altura_celula + altura_celula // 2)
+        desenhar_rosto(img, centro, tamanho, aleatorio)
+    return cv2.GaussianBlur(img, (3, 3), 0)
+
+
+def rosto_sintetico(tamanho=224, semente=SEMENTE):
+    """Recorte quadrado BGR com um único rosto sintético."""
+    img = gerar_imagem_sintetica(tamanho * 4 // 3, 1, semente)
+    deslocamento = (img.shape[1] - img.shape[0]) // 2
+    return np.ascontiguousarray(cv2.resize(img[:, deslocamento:deslocamento + img.shape[0]], (tamanho, tamanho)))
+
+
+def _cronometrar(funcao, repeticoes, aquecimento=1):
+    """Executa `funcao` (após o aquecimento) e retorna as estatísticas de tempo das repetições."""
+    for _ in range(aquecimento):
+        funcao()
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracoes.append(time.perf_counter() - inicio)
+    return estatisticas(duracoes)
+
+
+def medir_deteccao(lados=LADOS_PADRAO, rostos=ROSTOS_PADRAO, repeticoes=REPETICOES_PADRAO):
+    """Tempo de get_detector().detect_faces na resolução da imagem, por tamanho e número de rostos."""
+    from src.preprocessamento import get_detector
+
+    detector = get_detector()
+    resultados = []
+    for lado in lados:
+        for n_rostos in rostos:
+            img_rgb = cv2.cvtColor(gerar_imagem_sintetica(lado, n_rostos), cv2.COLOR_BGR2RGB)
+            detectados = len(detector.detect_faces(img_rgb))
+            tempos = _cronometrar(lambda: detector.detect_faces(img_rgb), repeticoes, aquecimento=0)
+            resultados.append({'etapa': 'deteccao', 'lado': lado, 'rostos': n_rostos,
+                               'rostos_detectados': detectados, **tempos})
+    return resultados
+
+
+def medir_normalizacao(tamanhos=TAMANHOS_ROSTO_NORMALIZACAO, repeticoes=REPETICOES_PADRAO):
+    """Tempo de normalizar_iluminacao (CLAHE e Histogram) por tamanho do recorte."""
+    from src.preprocessamento import normalizar_iluminacao
+
+    resultados = []
+    for tamanho in tamanhos:
+        rosto = rosto_sintetico(tamanho)
+        for metodo in ('clahe', 'histogram'):
+            tempos = _cronometrar(lambda: normalizar_iluminacao(rosto, metodo), repeticoes * FATOR_REPETICOES_RAPIDAS)
+            resultados.append({'etapa': 'normalizacao', 'metodo': metodo, 'tamanho_rosto': tamanho, **tempos})
+    return resultados
+
+
+def medir_embeddings(lotes=LOTES_EMBEDDING_PADRAO, repeticoes=REPETICOES_PADRAO):
+    """Tempo de gerar_embeddings por tamanho de lote (requer DeepFace e os pesos do VGG-Face)."""
+    from src.galeria import DEEPFACE_AVAILABLE, gerar_embeddings
+
+    if not DEEPFACE_AVAILABLE:
+        return [{'etapa': 'embeddings', 'erro': 'DeepFace não está instalado'}]
+    rostos = [rosto_sintetico(224, semente) for semente in range(max(lotes))]
+    resultados = []
+    for lote in lotes:
+        try:
+            tempos = _cronometrar(lambda: gerar_embeddings(rostos[:lote], lote), repeticoes)
+        except Exception as e:
+            resultados.append({'etapa': 'embeddings', 'lote': lote, 'erro': str(e)})
+            continue
+        resultados.append({'etapa': 'embeddings', 'lote': lote, **tempos,
+                           'ms_por_rosto': round(tempos['p50_ms'] / lote, 3)})
+    return resultados
+
+
+def galeria_sintetica(n, dimensao, aleatorio):
+    """Matriz (n, dimensao) float32 de vetores aleatórios de norma unitária, gerada e normalizada em blocos no lugar."""
+    vetores = np.empty((n, dimensao), dtype=np.float32)
+    for inicio in range(0, n, BLOCO_GERACAO_GALERIA):
+        bloco = vetores[inicio:inicio + BLOCO_GERACAO_GALERIA]
+        aleatorio.standard_normal(out=bloco, dtype=np.float32)
+        bloco /= np.linalg.norm(bloco, axis=1, keepdims=True)
+    return vetores
+
+
+def medir_busca(tamanhos=GALERIAS_PADRAO, repeticoes=REPETICOES_PADRAO, consultas=CONSULTAS_BUSCA,
+                dimensao=DIMENSAO_EMBEDDING):
+    """Tempo de GaleriaEmbeddings.identificar para `consultas` rostos, por tamanho da galeria."""
+    from src.galeria import GaleriaEmbeddings, normalizar_l2
+
+    aleatorio = np.random.default_rng(SEMENTE)
+    matriz_consultas = normalizar_l2(aleatorio.standard_normal((consultas, dimensao), dtype=np.float32))
+    resultados = []
+    for n in tamanhos:
+        vetores = galeria_sintetica(n, dimensao, aleatorio)
+        # Cinco fotos por aluno, como no dataset
+        galeria = GaleriaEmbeddings(vetores, [f"aluno{i // 5}" for i in range(n)], [f"aluno{i // 5}-{i % 5}.jpg" for i in range(n)])
+        tempos = _cronometrar(lambda: galeria.identificar(matriz_consultas, 0.6), repeticoes * FATOR_REPETICOES_RAPIDAS // 4)
+        resultados.append({'etapa': 'busca', 'galeria': n, 'consultas': consultas, **tempos,
+                           'ms_por_consulta': round(tempos['p50_ms'] / consultas, 4)})
+        del galeria, vetores
+    return resultados
+
+
+def ambiente():
+    """Commit, versões e máquina em que o benchmark foi executado."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def descrever(resultado):
+    """Texto curto com a configuração de um resultado (ex.: 'deteccao lado=1280 rostos=4')."""
+    config = ' '.join(f"{k}={v}" for k, v in resultado.items() if k != 'etapa' and k not in CAMPOS_MEDIDOS)
+    return f"{resultado['etapa']} {config}".strip()
+
+
+def executar_benchmark(etapas=ETAPAS, lados=LADOS_PADRAO, rostos=ROSTOS_PADRAO, galerias=GALERIAS_PADRAO,
+                       lotes=LOTES_EMBEDDING_PADRAO, repeticoes=REPETICOES_PADRAO):
+    """
+    Executa as etapas pedidas e imprime cada medição.
+
+    Returns:
+        dict: {'ambiente', 'parametros', 'resultados'}; cada resultado traz a configuração e p50/p95/máx em ms
+    """
+    desconhecidas = [etapa for etapa in etapas if etapa not in ETAPAS]
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {', '.join(desconhecidas)} (use {', '.join(ETAPAS)})")
+    medidores = {
+        'deteccao': lambda: medir_deteccao(lados, rostos, repeticoes),
+        'normalizacao': lambda: medir_normalizacao(repeticoes=repeticoes),
+        'embeddings': lambda: medir_embeddings(lotes, repeticoes),
+        'busca': lambda: medir_busca(galerias, repeticoes)
+    }
+    resultados = []
+    for etapa in etapas:
+        print(f"\n{etapa.upper()}")
+        for resultado in medidores[etapa]():
+            if 'erro' in resultado:
+                print(f"  {descrever(resultado):<46} erro: {resultado['erro']}")
+            else:
+                print(f"  {descrever(resultado):<46} p50 {resultado['p50_ms']:>10.2f} ms   p95 {resultado['p95_ms']:>10.2f} ms")
+            resultados.append(resultado)
+
+    return {
+        'ambiente': ambiente(),
+        'parametros': {'etapas': list(etapas), 'lados': list(lados), 'rostos': list(rostos),
+                       'galerias': list(galerias), 'lotes': list(lotes), 'repeticoes': repeticoes,
+                       'semente': SEMENTE},
+        'resultados': resultados
+    }
+
+
+def salvar_benchmark(dados, caminho):
+    with open(caminho, 'w') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+
+
+def comparar_resultados(atual, referencia, tolerancia=TOLERANCIA_PADRAO):
+    """
+    Compara o p50 de cada configuração presente nas duas execuções.
+
+    Returns:
+        list: Dicionários {'configuracao', 'referencia_ms', 'atual_ms', 'variacao', 'regressao'}
+    """
+    anteriores = {descrever(r): r for r in referencia['resultados'] if 'p50_ms' in r}
+    comparacoes = []
+    for resultado in atual['resultados']:
+        chave = descrever(resultado)
+        if 'p50_ms' not in resultado or chave not in anteriores:
+            continue
+        antes, agora = anteriores[chave]['p50_ms'], resultado['p50_ms']
+        variacao = (agora - antes) / antes if antes > 0 else 0.0
+        comparacoes.append({'configuracao': chave, 'referencia_ms': antes, 'atual_ms': agora,
+                            'variacao': variacao, 'regressao': variacao > tolerancia})
+    return comparacoes
+
+
+def imprimir_comparacao(comparacoes, tolerancia=TOLERANCIA_PADRAO):
+    """Imprime a variação do p50 de cada configuração, marcando as regressões."""
+    print(f"\nComparação com a referência (regressão = p50 mais de {tolerancia:.0%} maior)")
+    for c in comparacoes:
+        marca = "  ✗ REGRESSÃO" if c['regressao'] else ""
+        print(f"  {c['configuracao']:<46} {c['referencia_ms']:>10.2f} -> {c['atual_ms']:>10.2f} ms "
+              f"({c['variacao']:+.1%}){marca}")
@@ -0,0 +1,141 @@
+"""
+Cache em disco das detecções do MTCNN, endereçado pelo conteúdo da imagem.
+
+Cada entrada é um JSON com caixas, pontos faciais e confianças, nomeado pelo
+hash do arquivo e pelas configurações do detector. Quando o diretório passa
+do tamanho máximo, as entradas usadas há mais tempo são removidas.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+from src.utils import hash_arquivo
+
+DIRETORIO_CACHE_PADRAO = 'data/cache_deteccoes'
+TAMANHO_MAXIMO_PADRAO = 64 * 1024 * 1024
+# Ao ultrapassar o limite, remove entradas até ficar nesta fração dele
+FRACAO_APOS_LIMPEZA = 0.8
+
+# Configuração lida das variáveis de ambiente para valer também nos
+# processos filhos do processamento paralelo (spawn)
+_VAR_DIRETORIO = 'RF_CACHE_DETECCAO'
+_VAR_TAMANHO = 'RF_CACHE_DETECCAO_MAX'
+
+_cache = None
+
+
+def _serializavel(valor):
+    """Converte tipos do NumPy presentes na saída do MTCNN para tipos do Python."""
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"Tipo não serializável: {type(valor)}")
+
+
+class CacheDeteccoes:
+    """Detecções por (hash do conteúdo, configurações do detector), com remoção por tamanho."""
+
+    def __init__(self, diretorio=DIRETORIO_CACHE_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        self._tamanho_atual = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    @staticmethod
+    def chave(caminho, configuracao):
+        """Hash do arquivo combinado com as configurações que alteram o resultado da detecção."""
+        sufixo = hashlib.sha1(json.dumps(configuracao, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        return f"{hash_arquivo(caminho)}-{sufixo}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def obter(self, chave):
+        """Retorna as detecções guardadas ou None se a entrada não existir."""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho) as f:
+                deteccoes = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Marca a entrada como usada recentemente
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return deteccoes
+
+    def guardar(self, chave, deteccoes):
+        """Grava as detecções de forma atômica e aplica o limite de tamanho."""
+        conteudo = json.dumps(deteccoes, default=_serializavel)
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(conteudo)
+        os.replace(temporario, self._caminho(chave))
+
+        if self._tamanho_atual is None:
+            self._tamanho_atual = sum(tamanho for _, _, tamanho in self._entradas())
+        else:
+            self._tamanho_atual += len(conteudo)
+        if self._tamanho_atual > self.tamanho_maximo:
+            self.limpar(int(self.tamanho_maximo * FRACAO_APOS_LIMPEZA))
+
+    def _entradas(self):
+        """Lista (caminho, mtime, tamanho) de todas as entradas do cache."""
+        entradas = []
+        with os.scandir(self.diretorio) as it:
+            for entrada in it:
+                if entrada.name.endswith('.json'):
+                    try:
+                        info = entrada.stat()
+                    except OSError:
+                        continue
+                    entradas.append((entrada.path, info.st_mtime, info.st_size))
+        return entradas
+
+    def limpar(self, tamanho_alvo=0):
+        """Remove as entradas usadas há mais tempo até o cache caber em tamanho_alvo bytes."""
+        entradas = sorted(self._entradas(), key=lambda e: e[1])
+        total = sum(tamanho for _, _, tamanho in entradas)
+        for caminho, _, tamanho in entradas:
+            if total <= tamanho_alvo:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        self._tamanho_atual = total
+        return total
+
+
+def configurar_cache_deteccoes(diretorio=None, tamanho_maximo=None, ativo=True):
+    """
+    Define diretório e tamanho máximo do cache (ou o desativa) para este processo e seus filhos.
+
+    Args:
+        diretorio: Diretório das entradas (None = padrão)
+        tamanho_maximo: Limite em bytes (None = padrão)
+        ativo: False desativa o cache
+    """
+    global _cache
+    os.environ[_VAR_DIRETORIO] = (diretorio or DIRETORIO_CACHE_PADRAO) if ativo else ''
+    if tamanho_maximo is not None:
+        os.environ[_VAR_TAMANHO] = str(int(tamanho_maximo))
+    _cache = None
+
+
+def get_cache_deteccoes():
+    """Retorna o cache compartilhado de detecções, ou None se estiver desativado."""
+    global _cache
+    diretorio = os.environ.get(_VAR_DIRETORIO, DIRETORIO_CACHE_PADRAO)
+    if not diretorio:
+        return None
+    if _cache is None or _cache.diretorio != diretorio:
+        tamanho = int(os.environ.get(_VAR_TAMANHO, TAMANHO_MAXIMO_PADRAO))
+        try:
+            _cache = CacheDeteccoes(diretorio, tamanho)
+        except OSError:
+            return None
+    return _cache
@@ -0,0 +1,179 @@
+"""
+Galerias compactadas: projeção PCA aprendida da galeria e vetores em float16/int8.
+
+A projeção reduz o custo do produto matricial (ex.: 4096 -> 256 dimensões);
+a quantização reduz o espaço em disco e a memória lida por busca.
+"""
+
+import numpy as np
+from pathlib import Path
+
+from src.galeria import NOME_INDICE, GaleriaEmbeddings, assinatura_linhas, get_galeria, normalizar_l2, registrar_galeria
+
+FORMATOS = ('float32', 'float16', 'int8')
+# Linhas usadas para estimar a projeção
+MAX_AMOSTRA_PCA = 10000
+
+
+class ProjecaoPCA:
+    """Projeção linear nas `dimensao` componentes principais, seguida de normalização L2."""
+
+    def __init__(self, media, componentes):
+        self.media = np.asarray(media, dtype=np.float32)
+        self.componentes = np.ascontiguousarray(componentes, dtype=np.float32)
+
+    @property
+    def dimensao(self):
+        return len(self.componentes)
+
+    @classmethod
+    def ajustar(cls, vetores, dimensao, max_amostra=MAX_AMOSTRA_PCA, semente=0):
+        """Estima média e componentes a partir de (uma amostra de) vetores."""
+        n = len(vetores)
+        if n > max_amostra:
+            amostra = np.sort(np.random.default_rng(semente).choice(n, max_amostra, replace=False))
+            vetores = vetores[amostra]
+        dados = np.asarray(vetores, dtype=np.float32)
+        media = dados.mean(axis=0)
+        centrados = dados - media
+
+        # SVD aleatorizada: evita decompor a matriz d x d (4096 x 4096)
+        aleatorio = np.random.default_rng(semente)
+        base = centrados @ aleatorio.standard_normal((centrados.shape[1], dimensao + 16)).astype(np.float32)
+        for _ in range(2):
+            base, _ = np.linalg.qr(centrados @ (centrados.T @ base))
+        base, _ = np.linalg.qr(base)
+        _, _, vt = np.linalg.svd(base.T @ centrados, full_matrices=False)
+        componentes = vt[:min(dimensao, len(centrados) - 1)]
+
+        if len(componentes) < dimensao:
+            print(f"Aviso: a galeria só permite {len(componentes)} componentes (pedido: {dimensao})")
+        return cls(media, componentes)
+
+    def projetar(self, vetores):
+        """Projeta e normaliza vetores (n, d) -> (n, dimensao)."""
+        vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+        return normalizar_l2((vetores - self.media) @ self.componentes.T)
+
+
+def quantizar(vetores, formato):
+    """
+    Converte vetores float32 para o formato de armazenamento.
+
+    Returns:
+        tuple: (dados, escalas); escalas por linha só existem em int8
+    """
+    if formato == 'float16':
+        return vetores.astype(np.float16), None
+    if formato == 'int8':
+        escalas = np.maximum(np.abs(vetores).max(axis=1), 1e-12) / 127.0
+        dados = np.clip(np.rint(vetores / escalas[:, None]), -127, 127).astype(np.int8)
+        return dados, escalas.astype(np.float32)
+    return np.ascontiguousarray(vetores, dtype=np.float32), None
+
+
+def desquantizar(dados, escalas=None):
+    """Volta ao float32 usado no produto matricial."""
+    vetores = np.asarray(dados, dtype=np.float32)
+    if escalas is not None:
+        vetores = vetores * escalas[:, None]
+    return vetores
+
+
+class GaleriaCompactada(GaleriaEmbeddings):
+    """
+    Galeria com vetores projetados e/ou quantizados, com a mesma interface de busca.
+
+    As consultas são projetadas antes da busca e cada fatia da galeria é
+    convertida para float32 só no momento do produto matricial.
+    """
+
+    def __init__(self, dados, escalas, projecao, formato, identidades, arquivos, ativos, assinatura):
+        super().__init__(np.empty((0, 0), dtype=np.float32), identidades, arquivos, ativos=ativos)
+        self._blocos = [dados]
+        self.escalas = escalas
+        self.projecao = projecao
+        self.formato = formato
+        self.assinatura = assinatura
+
+    @property
+    def bytes_por_vetor(self):
+        return self.dimensao * self._blocos[0].itemsize + (4 if self.escalas is not None else 0)
+
+    @staticmethod
+    def caminho(db_path, dimensao, formato):
+        """Arquivo da galeria compactada (ex.: indice_vgg-face.pca256-int8.npz)."""
+        sufixo = (f"pca{dimensao}-" if dimensao else "") + formato
+        return Path(db_path) / NOME_INDICE.replace('.npz', f'.{sufixo}.npz')
+
+    @classmethod
+    def construir(cls, galeria, dimensao=None, formato='float32'):
+        """Ajusta a projeção na galeria (linhas ativas) e converte todos os vetores."""
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconhecido: {formato} (use {', '.join(FORMATOS)})")
+        projecao = ProjecaoPCA.ajustar(galeria.embeddings[galeria.linhas_ativas()], dimensao) if dimensao else None
+
+        partes = []
+        escalas = []
+        for _, fatia in galeria.blocos():
+            vetores = projecao.projetar(fatia) if projecao else np.asarray(fatia, dtype=np.float32)
+            dados, escala = quantizar(vetores, formato)
+            partes.append(dados)
+            if escala is not None:
+                escalas.append(escala)
+
+        dados = np.concatenate(partes) if partes else np.empty((0, 0), dtype=np.float32)
+        return cls(dados, np.concatenate(escalas) if escalas else None, projecao, formato,
+                   galeria.identidades, galeria.arquivos, galeria.ativos, assinatura_linhas(galeria.arquivos))
+
+    def blocos(self, tamanho=None):
+        for inicio, fatia in super().blocos(*([tamanho] if tamanho else [])):
+            escalas = self.escalas[inicio:inicio + len(fatia)] if self.escalas is not None else None
+            yield inicio, desquantizar(fatia, escalas)
+
+    def buscar(self, consultas, k=1):
+        if self.projecao is not None:
+            consultas = self.projecao.projetar(consultas)
+        return super().buscar(consultas, k)
+
+    def salvar(self, caminho):
+        campos = {}
+        if self.projecao is not None:
+            campos = {'media': self.projecao.media, 'componentes': self.projecao.componentes}
+        if self.escalas is not None:
+            campos['escalas'] = self.escalas
+        np.savez(caminho, dados=self._blocos[0], formato=np.array(self.formato), identidades=self.identidades,
+                 arquivos=self.arquivos, ativos=self.ativos, assinatura=np.array(self.assinatura), **campos)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho) as dados:
+            projecao = ProjecaoPCA(dados['media'], dados['componentes']) if 'componentes' in dados else None
+            return cls(dados['dados'], dados['escalas'] if 'escalas' in dados else None, projecao,
+                       str(dados['formato']), dados['identidades'], dados['arquivos'], dados['ativos'],
+                       str(dados['assinatura']))
+
+
+def carregar_ou_construir_compactada(db_path, dimensao=None, formato='float32'):
+    """Lê a galeria compactada de db_path, reconstruindo-a se a galeria mudou desde a última vez."""
+    galeria = get_galeria(db_path)
+    caminho = GaleriaCompactada.caminho(db_path, dimensao, formato)
+    if caminho.exists():
+        try:
+            compacta = GaleriaCompactada.carregar(caminho)
+            if compacta.assinatura == assinatura_linhas(galeria.arquivos) and np.array_equal(compacta.ativos, galeria.ativos):
+                return compacta
+        except Exception as e:
+            print(f"Galeria compactada inválida em {caminho} ({e}), reconstruindo...")
+
+    compacta = GaleriaCompactada.construir(galeria, dimensao, formato)
+    compacta.salvar(caminho)
+    return compacta
+
+
+def ativar_compactacao(db_path, dimensao=None, formato='float32'):
+    """Faz identificar/servir usarem a galeria compactada de db_path."""
+    compacta = carregar_ou_construir_compactada(db_path, dimensao, formato)
+    registrar_galeria(db_path, compacta)
+    print(f"Galeria compactada: {compacta.dimensao} dimensões em {formato} ({compacta.bytes_por_vetor} bytes por foto)")
+    return compacta
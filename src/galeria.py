@@ -0,0 +1,589 @@
+"""
+Módulo de índice de embeddings da galeria de rostos cadastrados.
+"""
+
+import os
+import hashlib
+import numpy as np
+from importlib.util import find_spec
+from pathlib import Path
+from src.metricas import cronometrado
+from src.utils import hash_arquivo
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# O DeepFace (e o TensorFlow) só é importado ao gerar o primeiro embedding
+DEEPFACE_AVAILABLE = find_spec('deepface') is not None
+
+
+MODELO = "VGG-Face"
+DETECTOR_BACKEND = "opencv"
+NOME_INDICE = "indice_vgg-face.npz"
+TAMANHO_LOTE_PADRAO = 32
+# Linhas da galeria comparadas por vez na busca (8192 x 4096 float32 = 128 MB)
+TAMANHO_BLOCO_BUSCA = 8192
+# Fração de linhas removidas a partir da qual o arquivo de vetores é reescrito
+FRACAO_MAXIMA_REMOVIDOS = 0.25
+EXTENSOES_VALIDAS = {'.jpg', '.jpeg', '.png', '.heic', '.HEIC'}
+
+
+def extrair_id(nome_arquivo):
+    """Extrai o ID da pessoa a partir do nome do arquivo (ex: Habo1-1.jpg -> Habo1)."""
+    base = os.path.basename(nome_arquivo)
+    return os.path.splitext(base)[0].split('-')[0]
+
+
+def listar_arquivos_galeria(db_path):
+    """Lista as imagens da galeria em ordem alfabética."""
+    db_path = Path(db_path)
+    if not db_path.is_dir():
+        return []
+    return sorted(f for f in db_path.iterdir() if f.is_file() and f.suffix in EXTENSOES_VALIDAS)
+
+
+def normalizar_l2(matriz):
+    """Normaliza as linhas da matriz para norma unitária."""
+    matriz = np.atleast_2d(np.asarray(matriz, dtype=np.float32))
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+
+def assinatura_linhas(arquivos):
+    """Resumo da ordem das linhas da galeria; muda quando o arquivo de vetores é compactado."""
+    return hashlib.sha1('\n'.join(map(str, arquivos)).encode('utf-8')).hexdigest()
+
+
+@cronometrado('embeddings')
+def gerar_embeddings(imagens, batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Gera os embeddings VGG-Face de vários rostos, um forward do modelo por lote.
+
+    Args:
+        imagens: Lista de caminhos de arquivo ou arrays BGR já carregados
+        batch_size: Quantidade máxima de rostos por chamada ao modelo
+
+    Returns:
+        np.ndarray: Matriz float32 (n, d) com linhas de norma unitária
+    """
+    from deepface import DeepFace
+
+    imagens = list(imagens)
+    vetores = []
+    for inicio in range(0, len(imagens), batch_size):
+        lote = imagens[inicio:inicio + batch_size]
+        resultados = DeepFace.represent(
+            img_path=lote,
+            model_name=MODELO,
+            enforce_detection=False,
+            detector_backend=DETECTOR_BACKEND
+        )
+        # Com um único item o DeepFace devolve a lista de rostos diretamente
+        if len(lote) == 1:
+            resultados = [resultados]
+        vetores.extend(rostos[0]['embedding'] for rostos in resultados)
+
+    if not vetores:
+        return np.empty((0, 0), dtype=np.float32)
+    return normalizar_l2(vetores)
+
+
+def carregar_modelo():
+    """Carrega os pesos do VGG-Face antecipadamente (o DeepFace mantém o modelo em cache)."""
+    from deepface import DeepFace
+    return DeepFace.build_model(MODELO)
+
+
+def gerar_embedding(imagem):
+    """Gera o embedding VGG-Face de um único rosto (caminho ou array BGR)."""
+    return gerar_embeddings([imagem])[0]
+
+
+def _embeddings_de_arquivos(caminhos, batch_size=TAMANHO_LOTE_PADRAO):
+    """Gera embeddings de arquivos, descartando os que falharem. Retorna (vetores, caminhos_validos)."""
+    vetores = []
+    validos = []
+    for inicio in range(0, len(caminhos), batch_size):
+        lote = caminhos[inicio:inicio + batch_size]
+        try:
+            vetores.extend(gerar_embeddings([str(c) for c in lote], batch_size))
+            validos.extend(lote)
+            continue
+        except Exception:
+            pass
+
+        # Um arquivo inválido derruba o lote inteiro: refaz item a item
+        for caminho in lote:
+            try:
+                vetores.append(gerar_embedding(str(caminho)))
+                validos.append(caminho)
+            except Exception as e:
+                print(f"  Falha ao indexar {Path(caminho).name}: {e}")
+    return vetores, validos
+
+
+class GaleriaEmbeddings:
+    """
+    Índice de embeddings da galeria com busca vetorizada (distância de cosseno).
+
+    Cada linha guarda o arquivo de origem, seu mtime e o hash do conteúdo,
+    permitindo atualizar o índice apenas com os arquivos alterados.
+
+    Em disco, os vetores ficam em um arquivo binário float32 contíguo
+    (mapeado em memória na leitura, compartilhado entre processos pelo cache
+    de páginas) e os metadados em um .npz ao lado. Linhas removidas viram
+    lápides até a próxima compactação; linhas novas são anexadas ao arquivo.
+    """
+
+    def __init__(self, embeddings, identidades, arquivos, mtimes=None, hashes=None, ativos=None):
+        self._blocos = [np.asarray(embeddings, dtype=np.float32)]
+        self.identidades = np.asarray(identidades, dtype=str)
+        self.arquivos = np.asarray(arquivos, dtype=str)
+        n = len(self.arquivos)
+        self.mtimes = np.zeros(n) if mtimes is None else np.asarray(mtimes, dtype=np.float64)
+        self.hashes = np.full(n, '') if hashes is None else np.asarray(hashes, dtype=str)
+        self.ativos = np.ones(n, dtype=bool) if ativos is None else np.asarray(ativos, dtype=bool).copy()
+        # Arquivo de vetores de onde as primeiras linhas foram mapeadas
+        self._arquivo_vetores = None
+        self._linhas_no_arquivo = 0
+        # Índice de busca aproximada opcional (ver src/ann.py)
+        self.ann = None
+
+    def __len__(self):
+        return int(self.ativos.sum())
+
+    @property
+    def n_linhas(self):
+        """Total de linhas, incluindo as removidas ainda não compactadas."""
+        return len(self.arquivos)
+
+    @property
+    def dimensao(self):
+        for bloco in self._blocos:
+            if bloco.size:
+                return bloco.shape[1]
+        return 0
+
+    @property
+    def embeddings(self):
+        """Matriz (n_linhas, d) com todos os vetores; junta os blocos em memória se houver mais de um."""
+        blocos = [b for b in self._blocos if len(b)]
+        if len(blocos) > 1:
+            self._blocos = [np.concatenate(blocos)]
+        elif blocos:
+            self._blocos = blocos
+        return self._blocos[0]
+
+    def linhas_ativas(self):
+        """Índices das linhas que não foram removidas."""
+        return np.flatnonzero(self.ativos)
+
+    def blocos(self, tamanho=TAMANHO_BLOCO_BUSCA):
+        """Percorre os vetores em fatias de até `tamanho` linhas. Gera (inicio, fatia)."""
+        inicio = 0
+        for bloco in self._blocos:
+            for i in range(0, len(bloco), tamanho):
+                fatia = bloco[i:i + tamanho]
+                yield inicio + i, fatia
+            inicio += len(bloco)
+
+    @staticmethod
+    def caminho_indice(db_path):
+        """Caminho padrão do índice (metadados) dentro do diretório da galeria."""
+        return Path(db_path) / NOME_INDICE
+
+    @staticmethod
+    def caminho_vetores(caminho_indice):
+        """Arquivo binário com os vetores, ao lado dos metadados."""
+        return Path(caminho_indice).with_suffix('.f32')
+
+    @classmethod
+    def vazia(cls):
+        """Cria um índice sem nenhum rosto."""
+        return cls(np.empty((0, 0), dtype=np.float32), [], [])
+
+    @classmethod
+    def construir(cls, db_path, batch_size=TAMANHO_LOTE_PADRAO):
+        """Gera os embeddings de todas as imagens da galeria."""
+        galeria = cls.vazia()
+        galeria.atualizar(db_path, batch_size)
+        return galeria
+
+    def _posicoes_ativas(self):
+        """Mapa nome do arquivo -> linha ativa."""
+        return {str(self.arquivos[i]): int(i) for i in self.linhas_ativas()}
+
+    def remover_arquivos(self, nomes):
+        """Marca como removidas as linhas dos arquivos informados. Retorna quantas foram removidas."""
+        mascara = self.ativos & np.isin(self.arquivos, [Path(n).name for n in nomes])
+        self.ativos[mascara] = False
+        return int(mascara.sum())
+
+    def adicionar_arquivos(self, caminhos, batch_size=TAMANHO_LOTE_PADRAO, hashes=None):
+        """
+        Gera embeddings apenas dos arquivos informados e os insere no índice.
+
+        Arquivos já indexados com o mesmo nome são substituídos.
+
+        Returns:
+            int: Quantidade de arquivos indexados com sucesso
+        """
+        caminhos = [Path(c) for c in caminhos]
+        if hashes is None:
+            hashes = {c.name: hash_arquivo(c) for c in caminhos}
+
+        vetores, validos = _embeddings_de_arquivos(caminhos, batch_size)
+        self.remover_arquivos([c.name for c in caminhos])
+        if not validos:
+            return 0
+
+        self._blocos.append(np.stack(vetores).astype(np.float32))
+        self.identidades = np.concatenate([self.identidades, [extrair_id(c.name) for c in validos]])
+        self.arquivos = np.concatenate([self.arquivos, [c.name for c in validos]])
+        self.mtimes = np.concatenate([self.mtimes, [c.stat().st_mtime for c in validos]])
+        self.hashes = np.concatenate([self.hashes, [hashes[c.name] for c in validos]])
+        self.ativos = np.concatenate([self.ativos, np.ones(len(validos), dtype=bool)])
+        return len(validos)
+
+    def atualizar(self, db_path, batch_size=TAMANHO_LOTE_PADRAO):
+        """
+        Sincroniza o índice com o diretório da galeria.
+
+        Arquivos com mesmo mtime ou mesmo hash são mantidos; somente os novos
+        ou alterados passam pelo modelo, e os que sumiram são removidos.
+
+        Returns:
+            dict: Contagem de arquivos adicionados, alterados, removidos e inalterados
+        """
+        atuais = {c.name: c for c in listar_arquivos_galeria(db_path)}
+        posicao = self._posicoes_ativas()
+
+        estatisticas = {'adicionados': 0, 'alterados': 0, 'removidos': 0, 'inalterados': 0}
+        pendentes = []
+        hashes = {}
+        for nome, caminho in atuais.items():
+            i = posicao.get(nome)
+            mtime = caminho.stat().st_mtime
+            if i is not None and self.mtimes[i] == mtime:
+                estatisticas['inalterados'] += 1
+                continue
+
+            hashes[nome] = hash_arquivo(caminho)
+            if i is not None and self.hashes[i] == hashes[nome]:
+                # Arquivo regravado com o mesmo conteúdo: só atualiza o mtime
+                self.mtimes[i] = mtime
+                estatisticas['inalterados'] += 1
+                continue
+
+            pendentes.append(caminho)
+            estatisticas['alterados' if i is not None else 'adicionados'] += 1
+
+        sumidos = [nome for nome in posicao if nome not in atuais]
+        estatisticas['removidos'] = self.remover_arquivos(sumidos)
+
+        if pendentes:
+            print(f"Indexando {len(pendentes)} imagens de {db_path}")
+            self.adicionar_arquivos(pendentes, batch_size, hashes)
+        return estatisticas
+
+    def _gravar_vetores(self, caminho_vetores, linhas=None):
+        """Reescreve o arquivo de vetores (apenas `linhas`, se informado) em fatias."""
+        temporario = caminho_vetores.with_suffix('.f32.tmp')
+        with open(temporario, 'wb') as f:
+            for inicio, fatia in self.blocos():
+                if linhas is not None:
+                    fatia = fatia[linhas[(linhas >= inicio) & (linhas < inicio + len(fatia))] - inicio]
+                f.write(np.ascontiguousarray(fatia, dtype=np.float32).tobytes())
+            fatia = None  # solta a última visão do arquivo mapeado
+        self._soltar_mapeamento(caminho_vetores)
+        os.replace(temporario, caminho_vetores)
+
+    def _anexar_vetores(self, caminho_vetores):
+        """Acrescenta ao arquivo apenas as linhas que ainda não estão nele."""
+        tamanho_linha = self.dimensao * 4
+        # As linhas novas ficam em blocos em memória, fora do trecho mapeado
+        novas = [fatia[max(self._linhas_no_arquivo - inicio, 0):] for inicio, fatia in self.blocos()
+                 if inicio + len(fatia) > self._linhas_no_arquivo]
+        self._soltar_mapeamento(caminho_vetores)
+        with open(caminho_vetores, 'r+b') as f:
+            # Descarta linhas gravadas por um salvamento interrompido
+            f.truncate(self._linhas_no_arquivo * tamanho_linha)
+            f.seek(0, os.SEEK_END)
+            for fatia in novas:
+                f.write(np.ascontiguousarray(fatia, dtype=np.float32).tobytes())
+
+    def _soltar_mapeamento(self, caminho_vetores):
+        """
+        Descarta os blocos mapeados de caminho_vetores antes de reescrevê-lo.
+
+        No Windows um arquivo mapeado não pode ser truncado nem substituído, e
+        no POSIX truncá-lo com o mapeamento ativo pode gerar SIGBUS numa
+        leitura. Os vetores voltam a ser mapeados por salvar() ao final.
+        """
+        alvo = Path(caminho_vetores).resolve()
+        self._blocos = [b for b in self._blocos
+                        if not (isinstance(b, np.memmap) and b.filename and Path(b.filename).resolve() == alvo)]
+
+    def _mapear(self, caminho_vetores, n, dimensao):
+        """Substitui os vetores em memória pelo arquivo mapeado (somente leitura)."""
+        if n and dimensao:
+            self._blocos = [np.memmap(caminho_vetores, dtype=np.float32, mode='r', shape=(n, dimensao))]
+        else:
+            self._blocos = [np.empty((0, dimensao), dtype=np.float32)]
+        self._arquivo_vetores = Path(caminho_vetores).resolve()
+        self._linhas_no_arquivo = n
+
+    def salvar(self, caminho):
+        """
+        Salva os metadados em `caminho` (.npz) e os vetores no arquivo .f32 ao lado.
+
+        Se o índice veio desse mesmo arquivo, só as linhas novas são anexadas;
+        o arquivo é reescrito sem as lápides quando elas passam de
+        FRACAO_MAXIMA_REMOVIDOS das linhas.
+        """
+        caminho = Path(caminho)
+        caminho_vetores = self.caminho_vetores(caminho)
+        dimensao = self.dimensao
+
+        removidos = self.n_linhas - len(self)
+        compactar = removidos > 0 and removidos > FRACAO_MAXIMA_REMOVIDOS * self.n_linhas
+        mesmo_arquivo = (self._arquivo_vetores is not None and caminho_vetores.exists()
+                         and self._arquivo_vetores == caminho_vetores.resolve())
+
+        if compactar:
+            linhas = self.linhas_ativas()
+            self._gravar_vetores(caminho_vetores, linhas)
+            self.identidades = self.identidades[linhas]
+            self.arquivos = self.arquivos[linhas]
+            self.mtimes = self.mtimes[linhas]
+            self.hashes = self.hashes[linhas]
+            self.ativos = np.ones(len(linhas), dtype=bool)
+        elif mesmo_arquivo:
+            self._anexar_vetores(caminho_vetores)
+        else:
+            self._gravar_vetores(caminho_vetores)
+
+        # Metadados gravados por último: um salvamento interrompido mantém o índice anterior
+        temporario = caminho.with_name(caminho.stem + '.tmp.npz')
+        np.savez(
+            temporario,
+            identidades=self.identidades,
+            arquivos=self.arquivos,
+            mtimes=self.mtimes,
+            hashes=self.hashes,
+            ativos=self.ativos,
+            dimensao=np.array(dimensao),
+            modelo=np.array(MODELO)
+        )
+        os.replace(temporario, caminho)
+        self._mapear(caminho_vetores, self.n_linhas, dimensao)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Carrega um índice salvo com salvar(), mapeando os vetores em memória."""
+        caminho = Path(caminho)
+        with np.load(caminho) as dados:
+            if str(dados['modelo']) != MODELO:
+                raise ValueError(f"Índice gerado com outro modelo: {dados['modelo']}")
+            if 'embeddings' in dados:
+                # Formato antigo, com os vetores dentro do .npz
+                return cls(
+                    dados['embeddings'],
+                    dados['identidades'],
+                    dados['arquivos'],
+                    dados['mtimes'] if 'mtimes' in dados else None,
+                    dados['hashes'] if 'hashes' in dados else None
+                )
+            galeria = cls(
+                np.empty((0, 0), dtype=np.float32),
+                dados['identidades'],
+                dados['arquivos'],
+                dados['mtimes'],
+                dados['hashes'],
+                dados['ativos']
+            )
+            dimensao = int(dados['dimensao'])
+
+        caminho_vetores = cls.caminho_vetores(caminho)
+        if galeria.n_linhas and os.path.getsize(caminho_vetores) < galeria.n_linhas * dimensao * 4:
+            raise ValueError(f"Arquivo de vetores incompleto: {caminho_vetores}")
+        galeria._mapear(caminho_vetores, galeria.n_linhas, dimensao)
+        return galeria
+
+    @classmethod
+    def carregar_ou_construir(cls, db_path, reconstruir=False, batch_size=TAMANHO_LOTE_PADRAO):
+        """Carrega o índice da galeria, construindo-o se ainda não existir."""
+        caminho = cls.caminho_indice(db_path)
+        if caminho.exists() and not reconstruir:
+            try:
+                return cls.carregar(caminho)
+            except Exception as e:
+                print(f"Índice inválido em {caminho} ({e}), reconstruindo...")
+
+        galeria = cls.construir(db_path, batch_size)
+        galeria.salvar(caminho)
+        return galeria
+
+    def buscar(self, consultas, k=1):
+        """
+        Busca os k vizinhos mais próximos de cada embedding de consulta.
+
+        Os vetores são percorridos em fatias de TAMANHO_BLOCO_BUSCA linhas,
+        mantendo os k melhores de cada consulta, então a galeria não precisa
+        caber na memória. Com um índice ANN ativo (self.ann), a busca é aproximada.
+
+        Args:
+            consultas: Matriz (m, d) ou vetor (d,) de embeddings normalizados
+            k: Número de vizinhos por consulta
+
+        Returns:
+            tuple: (indices, distancias), ambos (m, k) em ordem crescente de distância
+        """
+        if self.ann is not None:
+            return self.ann.buscar(self, consultas, k)
+
+        consultas = np.atleast_2d(np.asarray(consultas, dtype=np.float32))
+        m = len(consultas)
+        k = min(k, len(self))
+        if k == 0:
+            vazio = np.empty((m, 0))
+            return vazio.astype(np.int64), vazio.astype(np.float32)
+
+        melhores_idx = np.empty((m, 0), dtype=np.int64)
+        melhores_sim = np.empty((m, 0), dtype=np.float32)
+        for inicio, fatia in self.blocos():
+            similaridades = consultas @ fatia.T
+            similaridades[:, ~self.ativos[inicio:inicio + len(fatia)]] = -np.inf
+
+            candidatos_sim = np.concatenate([melhores_sim, similaridades], axis=1)
+            candidatos_idx = np.concatenate(
+                [melhores_idx, np.broadcast_to(np.arange(inicio, inicio + len(fatia)), similaridades.shape)], axis=1
+            )
+            if candidatos_sim.shape[1] > k:
+                escolhidos = np.argpartition(-candidatos_sim, k - 1, axis=1)[:, :k]
+                candidatos_sim = np.take_along_axis(candidatos_sim, escolhidos, axis=1)
+                candidatos_idx = np.take_along_axis(candidatos_idx, escolhidos, axis=1)
+            melhores_sim, melhores_idx = candidatos_sim, candidatos_idx
+
+        ordem = np.argsort(-melhores_sim, axis=1)
+        indices = np.take_along_axis(melhores_idx, ordem, axis=1)
+        distancias = 1.0 - np.take_along_axis(melhores_sim, ordem, axis=1)
+        return indices, distancias
+
+    @cronometrado('busca')
+    def identificar(self, consultas, threshold=0.6):
+        """
+        Retorna, para cada consulta, a melhor correspondência abaixo do limiar.
+
+        Returns:
+            list: Um dicionário {'file', 'id', 'distance'} ou None por consulta
+        """
+        indices, distancias = self.buscar(consultas, k=1)
+        resultado = []
+        for linha_idx, linha_dist in zip(indices, distancias):
+            if len(linha_idx) and linha_dist[0] < threshold:
+                resultado.append({
+                    'file': str(self.arquivos[linha_idx[0]]),
+                    'id': str(self.identidades[linha_idx[0]]),
+                    'distance': float(linha_dist[0])
+                })
+            else:
+                resultado.append(None)
+        return resultado
+
+    @cronometrado('busca')
+    def correspondencias(self, embedding, threshold=0.6, k=10):
+        """Retorna as correspondências abaixo do limiar, da mais próxima à mais distante."""
+        indices, distancias = self.buscar(embedding, k)
+        matches = []
+        for idx, dist in zip(indices[0], distancias[0]):
+            if dist >= threshold:
+                break
+            matches.append({
+                'file': str(self.arquivos[idx]),
+                'id': str(self.identidades[idx]),
+                'distance': float(dist)
+            })
+        return matches
+
+
+class ConjuntoGalerias:
+    """
+    Várias galerias consultadas com o mesmo lote de embeddings.
+
+    Cada galeria é percorrida em fatias pelo seu próprio `buscar`, então os
+    vetores mapeados em memória nunca são juntados em uma matriz única.
+    """
+
+    def __init__(self, galerias):
+        self.galerias = dict(galerias)
+
+    @cronometrado('busca')
+    def identificar(self, consultas, threshold=0.6):
+        """
+        Retorna, por galeria, a melhor correspondência de cada consulta abaixo do limiar.
+
+        Returns:
+            dict: {nome: lista no formato de GaleriaEmbeddings.identificar}
+        """
+        consultas = np.atleast_2d(np.asarray(consultas, dtype=np.float32))
+        resultados = {}
+        for nome, galeria in self.galerias.items():
+            if len(galeria) == 0:
+                resultados[nome] = [None] * len(consultas)
+                continue
+            indices, distancias = galeria.buscar(consultas, k=1)
+            resultados[nome] = [
+                {
+                    'file': str(galeria.arquivos[idx]),
+                    'id': str(galeria.identidades[idx]),
+                    'distance': float(dist)
+                } if dist < threshold else None
+                for idx, dist in zip(indices[:, 0], distancias[:, 0])
+            ]
+        return resultados
+
+
+_galerias = {}
+
+
+def get_galeria(db_path):
+    """Retorna o índice da galeria, carregado uma única vez por processo."""
+    chave = os.path.abspath(db_path)
+    if chave not in _galerias:
+        _galerias[chave] = GaleriaEmbeddings.carregar_ou_construir(db_path)
+    return _galerias[chave]
+
+
+def registrar_galeria(db_path, galeria):
+    """Substitui o índice em cache de db_path (ex.: por uma versão compactada)."""
+    _galerias[os.path.abspath(db_path)] = galeria
+
+
+def atualizar_indice(db_path, batch_size=TAMANHO_LOTE_PADRAO, adicionar=None, remover=None):
+    """
+    Atualiza incrementalmente o índice salvo da galeria.
+
+    Sem `adicionar`/`remover`, sincroniza com o conteúdo do diretório.
+    Com eles, aplica apenas as mudanças informadas, sem varrer a galeria.
+
+    Returns:
+        tuple: (galeria, estatisticas)
+    """
+    caminho = GaleriaEmbeddings.caminho_indice(db_path)
+    try:
+        galeria = GaleriaEmbeddings.carregar(caminho) if caminho.exists() else GaleriaEmbeddings.vazia()
+    except Exception as e:
+        print(f"Índice inválido em {caminho} ({e}), reconstruindo...")
+        galeria = GaleriaEmbeddings.vazia()
+
+    if adicionar is None and remover is None:
+        estatisticas = galeria.atualizar(db_path, batch_size)
+    else:
+        estatisticas = {
+            'removidos': galeria.remover_arquivos(remover or []),
+            'adicionados': galeria.adicionar_arquivos(adicionar or [], batch_size),
+        }
+
+    galeria.salvar(caminho)
+    _galerias[os.path.abspath(db_path)] = galeria
+    return galeria, estatisticas
@@ -0,0 +1,135 @@
+"""
+Gravação de imagens em segundo plano.
+
+Codificar uma foto de turma em JPEG na resolução original leva dezenas de
+milissegundos. Com o GravadorImagens, a codificação roda em threads (o OpenCV
+libera o GIL enquanto codifica) e se sobrepõe à detecção da próxima imagem.
+A quantidade de gravações pendentes é limitada, então o laço principal espera
+quando o disco não acompanha. `aguardar()` e a saída do processo garantem que
+nenhuma imagem deixe de ser gravada.
+"""
+
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import cv2
+
+from src.metricas import medir
+from src.preprocessamento import reduzir_para_deteccao
+
+# Mesma qualidade padrão do cv2.imwrite
+QUALIDADE_JPEG_PADRAO = 95
+WORKERS_GRAVACAO = 2
+# Gravações aguardando ou em andamento antes de gravar() passar a bloquear
+MAX_PENDENTES_GRAVACAO = 8
+
+_gravador = None
+
+
+def gravar_imagem(caminho, imagem, qualidade=QUALIDADE_JPEG_PADRAO, max_lado=None):
+    """
+    Codifica e grava uma imagem BGR de forma síncrona.
+
+    Args:
+        qualidade: Qualidade JPEG (0-100); ignorada em outros formatos
+        max_lado: Reduz a imagem para que o maior lado não passe deste valor (None = original)
+
+    Returns:
+        Path: Caminho gravado
+    """
+    imagem, _ = reduzir_para_deteccao(imagem, max_lado)
+    caminho = Path(caminho)
+    parametros = [cv2.IMWRITE_JPEG_QUALITY, int(qualidade)] if caminho.suffix.lower() in ('.jpg', '.jpeg') else []
+    with medir('gravacao'):
+        ok = cv2.imwrite(str(caminho), imagem, parametros)
+    if not ok:
+        raise OSError(f"Falha ao gravar {caminho}")
+    return caminho
+
+
+class GravadorImagens:
+    """
+    Grava imagens em um conjunto de threads, com limite de gravações pendentes.
+
+    A imagem entregue a gravar() não deve ser modificada depois, pois é
+    codificada mais tarde por outra thread.
+    """
+
+    def __init__(self, qualidade=QUALIDADE_JPEG_PADRAO, max_lado=None, workers=WORKERS_GRAVACAO,
+                 max_pendentes=MAX_PENDENTES_GRAVACAO):
+        self.qualidade = qualidade
+        self.max_lado = max_lado
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gravacao')
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self._trava = threading.Lock()
+        self._pendentes = set()
+        self._erros = []
+
+    def gravar(self, caminho, imagem, qualidade=None, max_lado=None):
+        """
+        Enfileira a gravação; bloqueia enquanto houver `max_pendentes` gravações em andamento.
+
+        Returns:
+            Future: Resolve para o caminho gravado (ou a exceção da gravação)
+        """
+        self._vagas.acquire()
+        try:
+            futuro = self._executor.submit(
+                gravar_imagem, caminho, imagem,
+                self.qualidade if qualidade is None else qualidade,
+                self.max_lado if max_lado is None else max_lado
+            )
+        except BaseException:
+            # Ex.: executor já encerrado; sem isso a vaga nunca seria devolvida
+            self._vagas.release()
+            raise
+        with self._trava:
+            self._pendentes.add(futuro)
+        futuro.add_done_callback(self._concluida)
+        return futuro
+
+    def _concluida(self, futuro):
+        with self._trava:
+            self._pendentes.discard(futuro)
+            erro = futuro.exception()
+            if erro is not None:
+                self._erros.append(erro)
+        self._vagas.release()
+        if erro is not None:
+            print(f"Erro na gravação: {erro}")
+
+    def aguardar(self):
+        """
+        Espera todas as gravações enfileiradas até agora.
+
+        Returns:
+            list: Exceções das gravações que falharam desde a última chamada
+        """
+        with self._trava:
+            pendentes = list(self._pendentes)
+        wait(pendentes)
+        with self._trava:
+            erros, self._erros = self._erros, []
+        return erros
+
+    def fechar(self):
+        """Conclui as gravações pendentes e encerra as threads."""
+        self.aguardar()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+def get_gravador():
+    """Retorna o gravador compartilhado do processo; as gravações pendentes são concluídas na saída."""
+    global _gravador
+    if _gravador is None:
+        _gravador = GravadorImagens()
+        atexit.register(_gravador.fechar)
+    return _gravador
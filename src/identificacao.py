@@ -5,23 +5,23 @@ Módulo de identificação facial em cenário real.
 import os
 import cv2
 import time
+import queue
+import threading
 from pathlib import Path
-from src.preprocessamento import get_detector
+from src.preprocessamento import BGR, MAX_LADO_DETECCAO, carregar_imagem, detectar_faces, detectar_faces_em_arquivos
+from src.galeria import DEEPFACE_AVAILABLE, TAMANHO_LOTE_PADRAO, gerar_embeddings, get_galeria
+from src.metricas import contar, cronometrado
+from src.gravacao import QUALIDADE_JPEG_PADRAO, get_gravador
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-try:
-    from deepface import DeepFace
-    DEEPFACE_AVAILABLE = True
-except ImportError:
-    DEEPFACE_AVAILABLE = False
+if not DEEPFACE_AVAILABLE:
     print("Aviso: DeepFace não está instalado. Identificação não disponível.")
 
-
-def extrair_id(nome_arquivo):
-    """Extrai o ID da pessoa a partir do nome do arquivo."""
-    base = os.path.basename(nome_arquivo)
-    return os.path.splitext(base)[0].split('-')[0]
+# Imagens que podem aguardar entre duas etapas de processar_cenario_real
+TAMANHO_FILA_PIPELINE = 4
+# Marca o fim de uma fila do pipeline
+_FIM = object()
 
 
 def garantir_diretorio(path):
@@ -30,141 +30,275 @@ def garantir_diretorio(path):
         os.makedirs(path)
 
 
-def processar_imagem_individual(img_path, db_path, output_path="resultado_anotado.jpg", threshold=0.6):
+def identificar_rostos(img, galeria, threshold=0.6, batch_size=TAMANHO_LOTE_PADRAO, max_lado=MAX_LADO_DETECCAO,
+                       caminho=None):
+    """
+    Detecta e identifica todos os rostos de uma imagem BGR já carregada.
+    
+    Args:
+        img: Imagem BGR
+        galeria: Índice da galeria (GaleriaEmbeddings)
+        threshold: Limiar de distância para aceitação
+        batch_size: Máximo de rostos por chamada ao modelo de embeddings
+        max_lado: Maior lado da cópia reduzida usada na detecção (None = original)
+        caminho: Arquivo de origem da imagem; quando informado, usa o cache de detecções
+        
+    Returns:
+        list: Um dicionário {'bbox', 'identificado', 'distancia'} por rosto
+    """
+    # Detecta na cópia reduzida (convertida para RGB só depois de reduzida);
+    # os recortes são visões da imagem original em BGR, como o DeepFace espera
+    if caminho is not None:
+        resultados_deteccao = detectar_faces_em_arquivos([caminho], [img], 1, max_lado, BGR)[0]
+    else:
+        resultados_deteccao = detectar_faces(img, max_lado, BGR)
+
+    caixas = []
+    recortes = []
+    for resultado in resultados_deteccao:
+        x, y, w, h = resultado['box']
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(img.shape[1], x + w), min(img.shape[0], y + h)
+        caixas.append((x1, y1, x2, y2))
+        recortes.append(img[y1:y2, x1:x2])
+    contar('rostos_detectados', len(caixas))
+    
+    # Todos os rostos da imagem passam pelo modelo em lote e são comparados
+    # com a galeria em uma única busca matricial
+    melhores = [None] * len(caixas)
+    if recortes:
+        try:
+            melhores = galeria.identificar(gerar_embeddings(recortes, batch_size), threshold)
+        except Exception as e:
+            print(f"Erro na identificação: {e}")
+
+    detalhes_identificacao = []
+    for caixa, melhor in zip(caixas, melhores):
+        detalhes_identificacao.append({
+            'bbox': caixa,
+            'identificado': melhor['id'] if melhor else "Desconhecido",
+            'distancia': melhor['distance'] if melhor else 0.0
+        })
+    return detalhes_identificacao
+
+
+@cronometrado('anotacao')
+def anotar_imagem(img, detalhes_identificacao, copiar=True):
+    """
+    Desenha caixas (verde = identificado, vermelho = desconhecido) e rótulos.
+    
+    Com copiar=False desenha na própria imagem, poupando uma cópia em
+    resolução original quando ela não será mais usada.
+    """
+    img_anotada = img.copy() if copiar else img
+    for det in detalhes_identificacao:
+        x1, y1, x2, y2 = det['bbox']
+        nome_identificado = det['identificado']
+        cor = (0, 0, 255) if nome_identificado == "Desconhecido" else (0, 255, 0)
+        
+        # Anotar imagem com bordas e texto mais largos
+        cv2.rectangle(img_anotada, (x1, y1), (x2, y2), cor, 8)
+        label = f"{nome_identificado}"
+        if nome_identificado != "Desconhecido":
+            label += f" ({1-det['distancia']:.2f})"
+            
+        cv2.putText(img_anotada, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 2.0, cor, 5)
+    return img_anotada
+
+
+def resumir_identificacao(nome_arquivo, detalhes_identificacao, path_saida=None):
+    """Monta o dicionário de resultado de uma imagem."""
+    return {
+        'arquivo': nome_arquivo,
+        'total_faces': len(detalhes_identificacao),
+        'identificados': sum(1 for d in detalhes_identificacao if d['identificado'] != "Desconhecido"),
+        'detalhes': detalhes_identificacao,
+        'path_saida': path_saida
+    }
+
+
+@cronometrado('imagem_individual')
+def processar_imagem_individual(img_path, db_path, output_path="resultado_anotado.jpg", threshold=0.6,
+                                batch_size=TAMANHO_LOTE_PADRAO, max_lado=MAX_LADO_DETECCAO,
+                                qualidade_jpeg=QUALIDADE_JPEG_PADRAO, max_lado_saida=None):
     """
     Processa uma única imagem, identifica rostos e gera imagem anotada.
     
     Args:
         img_path: Caminho da imagem de entrada
-        db_path: Caminho da base de dados processada
-        output_path: Caminho da imagem de saída
+        db_path: Caminho da base de dados processada (índice em db_path/indice_vgg-face.npz)
+        output_path: Caminho da imagem de saída (None = não anotar nem gravar)
         threshold: Limiar de distância para aceitação
+        batch_size: Máximo de rostos por chamada ao modelo de embeddings
+        max_lado: Maior lado da cópia reduzida usada na detecção (None = original)
+        qualidade_jpeg: Qualidade JPEG da imagem anotada
+        max_lado_saida: Maior lado da imagem anotada gravada (None = resolução original)
         
     Returns:
-        dict: Estatísticas do processamento
+        dict: Estatísticas do processamento. A imagem anotada é gravada em segundo
+        plano; use get_gravador().aguardar() antes de lê-la.
     """
     if not DEEPFACE_AVAILABLE:
         print("Erro: DeepFace não está instalado.")
         return None
     
     print(f"Processando {img_path}...")
-    img = cv2.imread(img_path)
+    img = carregar_imagem(img_path)
     if img is None:
         print(f"Erro ao ler {img_path}")
         return None
 
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    detector = get_detector()
+    galeria = get_galeria(db_path)
     
     try:
-        resultados_deteccao = detector.detect_faces(img_rgb)
+        detalhes_identificacao = identificar_rostos(img, galeria, threshold, batch_size, max_lado, img_path)
     except Exception as e:
         print(f"Erro na detecção: {e}")
         return None
 
-    img_anotada = img.copy()
-    total_faces = len(resultados_deteccao)
-    identificados = 0
-    detalhes_identificacao = []
+    # Salvar imagem anotada (a codificação JPEG acontece em segundo plano);
+    # a imagem lida não é mais usada, então é anotada sem cópia
+    if output_path:
+        get_gravador().gravar(output_path, anotar_imagem(img, detalhes_identificacao, copiar=False),
+                              qualidade_jpeg, max_lado_saida)
+    
+    resultado = resumir_identificacao(os.path.basename(img_path), detalhes_identificacao, output_path)
+    print(f"✓ {resultado['total_faces']} faces detectadas, {resultado['identificados']} identificadas")
+    return resultado
 
-    for i, resultado in enumerate(resultados_deteccao):
-        x, y, w, h = resultado['box']
-        x1, y1 = max(0, x), max(0, y)
-        x2, y2 = min(img.shape[1], x + w), min(img.shape[0], y + h)
-        
-        face_img = img[y1:y2, x1:x2]
-        
-        # Busca no DB
-        temp_path = f"temp_face_{time.time()}_{i}.jpg"
-        cv2.imwrite(temp_path, face_img)
-        
-        nome_identificado = "Desconhecido"
-        distancia = 0.0
-        cor = (0, 0, 255)  # Vermelho
-        
+
+def _colocar(fila, item, parar):
+    """Coloca item na fila, desistindo se parar for sinalizado enquanto ela está cheia."""
+    while not parar.is_set():
         try:
-            result = DeepFace.find(
-                img_path=temp_path,
-                db_path=db_path,
-                enforce_detection=False,
-                silent=True,
-                model_name="VGG-Face",
-                detector_backend="opencv"
-            )
-            
-            if isinstance(result, list) and len(result) > 0:
-                df = result[0]
-                if not df.empty:
-                    df_filtered = df[df['distance'] < threshold]
-                    if not df_filtered.empty:
-                        best_match = df_filtered.iloc[0]
-                        identity_file = os.path.basename(best_match['identity'])
-                        nome_identificado = extrair_id(identity_file)
-                        distancia = best_match['distance']
-                        cor = (0, 255, 0)  # Verde
-                        identificados += 1
-        except Exception as e:
-            print(f"Erro na identificação: {e}")
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-        
-        # Anotar imagem com bordas e texto mais largos
-        cv2.rectangle(img_anotada, (x1, y1), (x2, y2), cor, 8)
-        label = f"{nome_identificado}"
-        if nome_identificado != "Desconhecido":
-            label += f" ({1-distancia:.2f})"
-            
-        cv2.putText(img_anotada, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 2.0, cor, 5)
-        
-        detalhes_identificacao.append({
-            'bbox': (x1, y1, x2, y2),
-            'identificado': nome_identificado,
-            'distancia': distancia
-        })
+            fila.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
 
-    # Salvar imagem anotada
-    cv2.imwrite(output_path, img_anotada)
-    
-    print(f"✓ {total_faces} faces detectadas, {identificados} identificadas")
-    
-    return {
-        'arquivo': os.path.basename(img_path),
-        'total_faces': total_faces,
-        'identificados': identificados,
-        'detalhes': detalhes_identificacao,
-        'path_saida': output_path
-    }
+
+def _ler_imagens(caminhos, fila, parar):
+    """Produtor: decodifica as imagens em ordem e as coloca na fila, terminando com _FIM; para cedo se parar for sinalizado."""
+    try:
+        for indice, img_path in enumerate(caminhos):
+            if parar.is_set():
+                return
+            img, erro = None, None
+            if not os.path.exists(img_path):
+                erro = f"Imagem não encontrada: {img_path}"
+            else:
+                img = carregar_imagem(img_path)
+                if img is None:
+                    erro = f"Erro ao ler {img_path}"
+            if not _colocar(fila, (indice, img_path, img, erro), parar):
+                return
+    finally:
+        _colocar(fila, _FIM, parar)
 
 
-def processar_cenario_real(imagens_alvo, db_path, output_dir="data/resultados_cenario_real", threshold=0.6):
+def _gravar_anotadas(fila, resultados, qualidade_jpeg=QUALIDADE_JPEG_PADRAO, max_lado_saida=None):
+    """Consumidor: anota cada imagem identificada (sem cópia), enfileira sua gravação e guarda o resumo em resultados[indice]."""
+    gravador = get_gravador()
+    while True:
+        item = fila.get()
+        if item is _FIM:
+            return
+        indice, img_path, img, detalhes, output_path = item
+        if output_path:
+            try:
+                gravador.gravar(output_path, anotar_imagem(img, detalhes, copiar=False), qualidade_jpeg, max_lado_saida)
+            except Exception as e:
+                print(f"Erro ao gravar {output_path}: {e}")
+        resultado = resumir_identificacao(os.path.basename(img_path), detalhes, output_path)
+        resultados[indice] = resultado
+        print(f"✓ {resultado['arquivo']}: {resultado['total_faces']} faces detectadas, "
+              f"{resultado['identificados']} identificadas")
+
+
+@cronometrado('cenario_real')
+def processar_cenario_real(imagens_alvo, db_path, output_dir="data/resultados_cenario_real", threshold=0.6,
+                           batch_size=TAMANHO_LOTE_PADRAO, max_lado=MAX_LADO_DETECCAO,
+                           tamanho_fila=TAMANHO_FILA_PIPELINE, qualidade_jpeg=QUALIDADE_JPEG_PADRAO,
+                           max_lado_saida=None):
     """
     Processa múltiplas imagens de cenário real.
     
+    As etapas rodam em paralelo, ligadas por filas limitadas: uma thread lê as
+    imagens do disco, a thread atual detecta, gera embeddings e identifica, e
+    outra thread anota os resultados e os entrega ao gravador em segundo plano.
+    Assim a leitura da próxima imagem e a gravação da anterior acontecem
+    enquanto a atual está nos modelos.
+    
     Args:
         imagens_alvo: Lista de caminhos de imagens
         db_path: Caminho da base de dados
-        output_dir: Diretório de saída
+        output_dir: Diretório de saída (None = não anotar nem gravar)
         threshold: Limiar de distância
+        batch_size: Máximo de rostos por chamada ao modelo de embeddings
+        max_lado: Maior lado da cópia reduzida usada na detecção (None = original)
+        tamanho_fila: Imagens que podem aguardar entre duas etapas (limita a memória)
+        qualidade_jpeg: Qualidade JPEG das imagens anotadas
+        max_lado_saida: Maior lado das imagens anotadas gravadas (None = resolução original)
         
     Returns:
-        list: Lista de resultados
+        list: Lista de resultados, na ordem de imagens_alvo; as imagens já estão gravadas
     """
-    garantir_diretorio(output_dir)
+    if not DEEPFACE_AVAILABLE:
+        print("Erro: DeepFace não está instalado.")
+        return []
     
-    resultados = []
-    for img_path in imagens_alvo:
-        if os.path.exists(img_path):
-            nome_arquivo = os.path.basename(img_path)
-            output_path = os.path.join(output_dir, f"anotada_{nome_arquivo}")
+    if output_dir:
+        garantir_diretorio(output_dir)
+    galeria = get_galeria(db_path)
+    
+    lidas = queue.Queue(maxsize=tamanho_fila)
+    para_gravar = queue.Queue(maxsize=tamanho_fila)
+    resultados = {}
+    parar_leitura = threading.Event()
+    leitor = threading.Thread(target=_ler_imagens, args=(imagens_alvo, lidas, parar_leitura), daemon=True)
+    gravador = threading.Thread(target=_gravar_anotadas, daemon=True,
+                                args=(para_gravar, resultados, qualidade_jpeg, max_lado_saida))
+    leitor.start()
+    gravador.start()
+    
+    try:
+        while True:
+            item = lidas.get()
+            if item is _FIM:
+                break
+            indice, img_path, img, erro = item
+            if erro:
+                print(erro)
+                continue
+            
+            print(f"Processando {img_path}...")
+            try:
+                detalhes_identificacao = identificar_rostos(img, galeria, threshold, batch_size, max_lado, img_path)
+            except Exception as e:
+                print(f"Erro na detecção: {e}")
+                continue
             
-            res = processar_imagem_individual(img_path, db_path, output_path, threshold)
-            if res:
-                resultados.append(res)
-        else:
-            print(f"Imagem não encontrada: {img_path}")
+            # Sempre JPEG: o OpenCV não grava HEIC
+            nome_saida = f"anotada_{os.path.splitext(os.path.basename(img_path))[0]}.jpg"
+            output_path = os.path.join(output_dir, nome_saida) if output_dir else None
+            para_gravar.put((indice, img_path, img, detalhes_identificacao, output_path))
+    finally:
+        # Se a identificação foi interrompida, o leitor para antes da próxima
+        # imagem em vez de decodificar o resto do lote; as gravações pendentes
+        # são concluídas
+        parar_leitura.set()
+        while True:
+            try:
+                lidas.get_nowait()
+            except queue.Empty:
+                break
+        leitor.join()
+        para_gravar.put(_FIM)
+        gravador.join()
+        get_gravador().aguardar()
 
-    return resultados
+    return [resultados[i] for i in sorted(resultados)]
 
 
 def gerar_relatorio_cenario_real(resultados, output_file="RELATORIO_CENARIO_REAL.md"):
@@ -0,0 +1,166 @@
+"""
+Manifesto do processamento: o que já foi gerado em cada diretório de saída.
+
+Uma leitura do manifesto e uma listagem por diretório de método decidem quais
+imagens e métodos ainda faltam, sem um stat por arquivo de saída. Cada saída
+guarda o hash da imagem de origem e os parâmetros de detecção e normalização,
+então fotos substituídas com o mesmo nome ou configurações alteradas são refeitas.
+"""
+
+import os
+import json
+import tempfile
+from pathlib import Path
+
+from src.utils import hash_arquivo
+
+NOME_MANIFESTO = 'manifesto.json'
+
+
+def parametros_metodo(metodo, clip_limit, grade, deteccao=None):
+    """
+    Parâmetros que alteram a saída de um método de normalização.
+
+    Args:
+        deteccao: Configuração da detecção e da leitura que gerou o recorte
+            (ver preprocessamento.configuracao_deteccao)
+    """
+    parametros = {'clip_limit': float(clip_limit), 'grade': int(grade)} if metodo == 'clahe' else {}
+    if deteccao:
+        parametros['deteccao'] = dict(deteccao)
+    return parametros
+
+
+class ManifestoProcessamento:
+    """
+    Registro das origens (mtime, tamanho, hash) e das saídas geradas por método.
+
+    O hash de uma origem só é recalculado quando seu mtime ou tamanho mudam.
+    """
+
+    def __init__(self, dir_saida):
+        self.dir_saida = Path(dir_saida)
+        self.origens = {}
+        self.saidas = {}
+        self.existia = False
+        # {metodo: nomes dos arquivos no diretório do método}, listado uma vez sob demanda
+        self._arquivos = {}
+
+    @property
+    def caminho(self):
+        return self.dir_saida / NOME_MANIFESTO
+
+    @classmethod
+    def carregar(cls, dir_saida):
+        """Lê o manifesto do diretório de saída (vazio se ainda não existir ou estiver corrompido)."""
+        manifesto = cls(dir_saida)
+        try:
+            with open(manifesto.caminho) as f:
+                dados = json.load(f)
+            manifesto.origens = dados.get('origens', {})
+            manifesto.saidas = dados.get('saidas', {})
+            manifesto.existia = True
+        except (OSError, ValueError):
+            pass
+        return manifesto
+
+    def salvar(self):
+        """Grava o manifesto de forma atômica."""
+        self.dir_saida.mkdir(parents=True, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=self.dir_saida, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'origens': self.origens, 'saidas': self.saidas}, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+        self.existia = True
+
+    def atualizar_origens(self, caminhos):
+        """
+        Atualiza mtime, tamanho e hash das imagens de origem (um stat por arquivo).
+
+        `caminhos` deve ser a lista completa de origens: as que não aparecem
+        nela são esquecidas, junto com suas saídas.
+
+        Returns:
+            dict: {nome: hash do conteúdo}
+        """
+        anteriores = self.origens
+        self.origens = {}
+        for caminho in caminhos:
+            self.registrar_origem(caminho, anteriores.get(Path(caminho).name))
+        # Origens que sumiram levam junto as saídas registradas para elas
+        self.remover({nome for saidas in self.saidas.values() for nome in saidas} - self.origens.keys())
+        return {nome: dados['hash'] for nome, dados in self.origens.items()}
+
+    def registrar_origem(self, caminho, anterior=None):
+        """Registra uma imagem de origem, reaproveitando o hash se mtime e tamanho não mudaram."""
+        caminho = Path(caminho)
+        info = caminho.stat()
+        if anterior is None:
+            anterior = self.origens.get(caminho.name)
+        if anterior and anterior['mtime'] == info.st_mtime and anterior['tamanho'] == info.st_size:
+            self.origens[caminho.name] = anterior
+        else:
+            self.origens[caminho.name] = {
+                'mtime': info.st_mtime,
+                'tamanho': info.st_size,
+                'hash': hash_arquivo(caminho)
+            }
+        return self.origens[caminho.name]['hash']
+
+    def adotar_saidas_existentes(self, metodos, parametros_por_metodo):
+        """
+        Registra saídas geradas antes da existência do manifesto.
+
+        Usa uma listagem por diretório de método e assume que cada saída corresponde
+        à versão atual da origem.
+        """
+        for metodo in metodos:
+            dir_metodo = self.dir_saida / metodo
+            if not dir_metodo.is_dir():
+                continue
+            existentes = {nome for nome in os.listdir(dir_metodo) if nome.endswith('.jpg')}
+            for nome, dados in self.origens.items():
+                nome_saida = f"{Path(nome).stem}.jpg"
+                if nome_saida in existentes:
+                    self.registrar(nome, metodo, dir_metodo / nome_saida, dados['hash'], parametros_por_metodo[metodo])
+
+    def arquivos_metodo(self, metodo):
+        """Arquivos presentes no diretório do método (uma listagem por método e manifesto)."""
+        if metodo not in self._arquivos:
+            try:
+                self._arquivos[metodo] = set(os.listdir(self.dir_saida / metodo))
+            except OSError:
+                self._arquivos[metodo] = set()
+        return self._arquivos[metodo]
+
+    def pendentes(self, nome_origem, metodos, parametros_por_metodo):
+        """Métodos que faltam para a origem: sem saída, arquivo apagado, origem alterada ou parâmetros diferentes."""
+        hash_atual = self.origens.get(nome_origem, {}).get('hash')
+        faltam = []
+        for metodo in metodos:
+            saida = self.saidas.get(metodo, {}).get(nome_origem)
+            if (saida is None or saida['hash'] != hash_atual
+                    or saida.get('parametros', {}) != parametros_por_metodo[metodo]
+                    or Path(saida['saida']).name not in self.arquivos_metodo(metodo)):
+                faltam.append(metodo)
+        return faltam
+
+    def registrar(self, nome_origem, metodo, caminho_saida, hash_origem, parametros):
+        """Registra a saída gerada para uma origem e um método."""
+        if metodo in self._arquivos:
+            self._arquivos[metodo].add(Path(caminho_saida).name)
+        self.saidas.setdefault(metodo, {})[nome_origem] = {
+            'saida': str(Path(caminho_saida).relative_to(self.dir_saida)),
+            'hash': hash_origem,
+            'parametros': parametros
+        }
+
+    def remover(self, nomes_origem, metodos=None):
+        """Esquece as saídas (e origens) dos arquivos informados."""
+        nomes_origem = set(nomes_origem)
+        for metodo, saidas in self.saidas.items():
+            if metodos is None or metodo in metodos:
+                for nome in nomes_origem & saidas.keys():
+                    del saidas[nome]
+        for nome in nomes_origem:
+            self.origens.pop(nome, None)
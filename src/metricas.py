@@ -0,0 +1,127 @@
+"""
+Medição de tempo por etapa do pipeline.
+
+As etapas instrumentadas (decodificação, detecção, normalização, embeddings,
+busca, anotação, gravação...) acumulam suas durações no registro do processo.
+`pipeline.py --metrics arquivo.json` grava, ao final do comando, contagem,
+total, p50, p95 e máximo de cada etapa. Etapas podem ser aninhadas (ex.:
+`imagem_individual` inclui `deteccao`), então os totais não somam o tempo do comando.
+"""
+
+import json
+import time
+import functools
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+_duracoes = defaultdict(list)
+_contadores = defaultdict(int)
+_trava = threading.Lock()
+
+
+def registrar(etapa, segundos):
+    """Acrescenta uma duração (em segundos) à etapa."""
+    with _trava:
+        _duracoes[etapa].append(segundos)
+
+
+def contar(nome, quantidade=1):
+    """Incrementa um contador (ex.: rostos detectados, acertos do cache)."""
+    with _trava:
+        _contadores[nome] += quantidade
+
+
+@contextmanager
+def medir(etapa):
+    """Mede o tempo de parede do bloco `with` e o registra na etapa."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, time.perf_counter() - inicio)
+
+
+def cronometrado(etapa):
+    """Decorador que mede cada chamada da função como uma ocorrência da etapa."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def coletar(limpar=True):
+    """
+    Retorna as medições do processo (para enviá-las de um processo filho ao pai).
+
+    Returns:
+        dict: {'duracoes': {etapa: [segundos]}, 'contadores': {nome: valor}}
+    """
+    with _trava:
+        dados = {
+            'duracoes': {etapa: list(valores) for etapa, valores in _duracoes.items()},
+            'contadores': dict(_contadores)
+        }
+        if limpar:
+            _duracoes.clear()
+            _contadores.clear()
+    return dados
+
+
+def incorporar(dados):
+    """Soma ao registro as medições devolvidas por coletar() em outro processo."""
+    with _trava:
+        for etapa, valores in dados['duracoes'].items():
+            _duracoes[etapa].extend(valores)
+        for nome, valor in dados['contadores'].items():
+            _contadores[nome] += valor
+
+
+def estatisticas(segundos):
+    """Contagem, total, p50, p95 e máximo (em ms) de uma lista de durações em segundos."""
+    ms = np.asarray(segundos, dtype=np.float64) * 1000
+    return {
+        'contagem': len(ms),
+        'total_ms': round(float(ms.sum()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+
+
+def resumo():
+    """
+    Estatísticas de cada etapa, em milissegundos.
+
+    Returns:
+        dict: {'etapas': {etapa: {'contagem', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms'}}, 'contadores': {...}}
+    """
+    dados = coletar(limpar=False)
+    etapas = {etapa: estatisticas(valores) for etapa, valores in sorted(dados['duracoes'].items())}
+    return {'etapas': etapas, 'contadores': dict(sorted(dados['contadores'].items()))}
+
+
+def salvar_metricas(caminho, **informacoes):
+    """Grava o resumo em JSON, junto com informações do comando (ex.: comando='identificar')."""
+    dados = {**informacoes, **resumo()}
+    with open(caminho, 'w') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    return dados
+
+
+def imprimir_resumo(dados=None):
+    """Imprime uma tabela com as etapas medidas."""
+    dados = dados or resumo()
+    if not dados['etapas']:
+        return
+    print(f"\n{'Etapa':<24} {'N':>6} {'Total (ms)':>12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'Máx (ms)':>10}")
+    for etapa, e in dados['etapas'].items():
+        print(f"{etapa:<24} {e['contagem']:>6} {e['total_ms']:>12.1f} {e['p50_ms']:>10.2f} "
+              f"{e['p95_ms']:>10.2f} {e['max_ms']:>10.2f}")
+    for nome, valor in dados['contadores'].items():
+        print(f"{nome:<24} {valor:>6}")
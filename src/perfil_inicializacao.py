@@ -0,0 +1,58 @@
+"""
+Medição do tempo de importação de módulos na inicialização do pipeline.
+"""
+
+import re
+import subprocess
+import sys
+
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def resumir_importtime(linhas):
+    """
+    Agrega a saída de `python -X importtime`.
+
+    Returns:
+        list: Tuplas (modulo, proprio_ms, acumulado_ms) dos módulos importados
+        diretamente (nível superior), em ordem decrescente de tempo acumulado
+    """
+    modulos = []
+    for linha in linhas:
+        m = _LINHA_IMPORTTIME.match(linha)
+        if m is None or len(m.group(3)) > 1:
+            continue
+        modulos.append((m.group(4), int(m.group(1)) / 1000, int(m.group(2)) / 1000))
+    return sorted(modulos, key=lambda item: item[2], reverse=True)
+
+
+def executar_com_perfil(script, argumentos, limite=15):
+    """
+    Reexecuta o script com `-X importtime` e imprime o tempo de importação por módulo.
+
+    A saída padrão do comando é repassada normalmente; o relatório vai para stderr.
+
+    Returns:
+        int: Código de saída do comando
+    """
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', script, *argumentos],
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+    outras_linhas = []
+    linhas_importtime = []
+    for linha in processo.stderr.splitlines():
+        (linhas_importtime if linha.startswith('import time:') else outras_linhas).append(linha)
+    if outras_linhas:
+        print('\n'.join(outras_linhas), file=sys.stderr)
+
+    modulos = resumir_importtime(linhas_importtime)
+    total = sum(acumulado for _, _, acumulado in modulos)
+
+    print(f"\nTempo de importação por módulo (total: {total:.0f} ms)", file=sys.stderr)
+    print(f"{'Módulo':<40} {'Próprio (ms)':>14} {'Acumulado (ms)':>16}", file=sys.stderr)
+    for nome, proprio, acumulado in modulos[:limite]:
+        print(f"{nome:<40} {proprio:>14.1f} {acumulado:>16.1f}", file=sys.stderr)
+    return processo.returncode
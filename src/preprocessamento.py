@@ -2,24 +2,55 @@
 Módulo de preprocessamento de imagens para reconhecimento facial.
 """
 
+import io
 import os
+import threading
 import cv2
 import numpy as np
+from importlib.util import find_spec
+from src.cache_deteccao import get_cache_deteccoes
+from src.metricas import contar, cronometrado
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import warnings
 warnings.filterwarnings('ignore')
 
-from mtcnn.mtcnn import MTCNN
+# MTCNN (TensorFlow) e pillow-heif só são importados quando usados
+HEIF_SUPPORT = find_spec('pillow_heif') is not None and find_spec('PIL') is not None
+PIL_AVAILABLE = find_spec('PIL') is not None
 
-try:
-    from pillow_heif import register_heif_opener
-    from PIL import Image
-    register_heif_opener()
-    HEIF_SUPPORT = True
-except ImportError:
-    HEIF_SUPPORT = False
+# Marcas (ftyp) de arquivos HEIF/HEIC
+MARCAS_HEIF = (b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1')
+# Decodificação reduzida do OpenCV (escala da DCT em JPEG) por fator
+_FLAGS_REDUCAO = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+# OpenCV >= 4.10 decodifica direto em RGB
+_IMREAD_RGB = getattr(cv2, 'IMREAD_COLOR_RGB', None)
+# Lido do ambiente para valer também nos processos filhos (spawn)
+_VAR_MAX_LADO_LEITURA = 'RF_MAX_LADO_LEITURA'
 
+# Espaço de cor das imagens trocadas entre as etapas: MTCNN usa RGB,
+# OpenCV e DeepFace usam BGR e a normalização trabalha em cinza
+BGR, RGB, CINZA = 'BGR', 'RGB', 'CINZA'
+_CONVERSOES_COR = {
+    (BGR, RGB): cv2.COLOR_BGR2RGB, (RGB, BGR): cv2.COLOR_RGB2BGR,
+    (BGR, CINZA): cv2.COLOR_BGR2GRAY, (RGB, CINZA): cv2.COLOR_RGB2GRAY,
+    (CINZA, BGR): cv2.COLOR_GRAY2BGR, (CINZA, RGB): cv2.COLOR_GRAY2RGB,
+}
+
+
+TAMANHO_LOTE_DETECCAO = 8
+
+# A detecção roda em uma cópia reduzida (maior lado em pixels; None = resolução original)
+MAX_LADO_DETECCAO = 1024
+# min_face_size passado ao MTCNN, igual para todas as imagens. No mtcnn 1.x,
+# valores acima do padrão (20) deixam a pirâmide de escalas sem níveis e
+# nenhum rosto é encontrado.
+MIN_FACE_SIZE_MTCNN = 20
+
+# Parâmetros padrão do CLAHE: limite de contraste e grade de regiões (grade x grade)
+CLAHE_CLIP_PADRAO = 2.0
+CLAHE_GRADE_PADRAO = 8
 
 _detector = None
 
@@ -28,59 +59,446 @@ def get_detector():
     """Retorna uma instância compartilhada do detector MTCNN."""
     global _detector
     if _detector is None:
+        from mtcnn.mtcnn import MTCNN
         _detector = MTCNN()
     return _detector
 
 
-def alinhar_rosto_com_mtcnn(caminho_imagem):
-    """Detecta e recorta o rosto principal da imagem."""
+def converter_cor(img, de, para, dst=None):
+    """Converte img do espaço de cor `de` para `para`; devolve a própria imagem (sem cópia) se forem iguais."""
+    if de == para:
+        return img
+    return cv2.cvtColor(img, _CONVERSOES_COR[(de, para)], dst=dst)
+
+
+def configurar_leitura(max_lado=None):
+    """Define o maior lado mínimo das imagens decodificadas (None/0 = resolução original) para este processo e seus filhos."""
+    os.environ[_VAR_MAX_LADO_LEITURA] = str(int(max_lado or 0))
+
+
+def max_lado_leitura():
+    """Maior lado mínimo configurado para a leitura (None = resolução original)."""
+    return int(os.environ.get(_VAR_MAX_LADO_LEITURA, 0)) or None
+
+
+def fator_reducao(largura, altura, max_lado):
+    """Maior fator de redução suportado (1, 2, 4 ou 8) que mantém o maior lado >= max_lado."""
+    fator = 1
+    while max_lado and fator < 8 and max(largura, altura) // (fator * 2) >= max_lado:
+        fator *= 2
+    return fator
+
+
+def _formato_imagem(cabecalho, nome=''):
+    """Identifica o formato pela assinatura do arquivo ('jpeg', 'heif' ou None)."""
+    if cabecalho[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if cabecalho[4:8] == b'ftyp' and cabecalho[8:12] in MARCAS_HEIF:
+        return 'heif'
+    if nome.lower().endswith(('.heic', '.heif')):
+        return 'heif'
+    return None
+
+
+def _reduzir_por_fator(img, fator):
+    """Divide largura e altura por fator (INTER_AREA)."""
+    if fator == 1:
+        return img
+    altura, largura = img.shape[:2]
+    return cv2.resize(img, (largura // fator, altura // fator), interpolation=cv2.INTER_AREA)
+
+
+def _carregar_heif(fonte, rgb, max_lado):
+    """Decodifica HEIC direto na ordem de canais pedida, sem passar pelo PIL."""
+    import pillow_heif
+    arquivo = pillow_heif.open_heif(fonte, convert_hdr_to_8bit=True, bgr_mode=not rgb)
+    img = np.asarray(arquivo)
+    if img.shape[2] == 4:
+        img = img[..., :3]
+    # O libheif não decodifica em resolução reduzida
+    return np.ascontiguousarray(_reduzir_por_fator(img, fator_reducao(*arquivo.size, max_lado)))
+
+
+def _carregar_opencv(fonte, rgb, max_lado):
+    """Decodifica com o OpenCV; JPEGs são reduzidos já na decodificação (escala da DCT)."""
+    fator = 1
+    if max_lado and PIL_AVAILABLE:
+        from PIL import Image
+        try:
+            # Só lê o cabeçalho
+            with Image.open(fonte) as cabecalho:
+                fator = fator_reducao(*cabecalho.size, max_lado)
+        except Exception:
+            pass
+        if hasattr(fonte, 'seek'):
+            fonte.seek(0)
+
+    flags = _FLAGS_REDUCAO[fator]
+    if rgb and _IMREAD_RGB is not None:
+        flags = (flags & ~cv2.IMREAD_COLOR) | _IMREAD_RGB
+    if hasattr(fonte, 'getbuffer'):
+        img = cv2.imdecode(np.frombuffer(fonte.getbuffer(), dtype=np.uint8), flags)
+    else:
+        img = cv2.imread(fonte, flags)
+    if img is not None and rgb and _IMREAD_RGB is None:
+        img = converter_cor(img, BGR, RGB, dst=img)
+    return img
+
+
+def _carregar_pil(fonte, rgb, max_lado):
+    """Formatos que o OpenCV não lê; JPEGs usam o modo draft do PIL."""
+    from PIL import Image, ImageOps
+    if HEIF_SUPPORT:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+    with Image.open(fonte) as pil_img:
+        fator = fator_reducao(*pil_img.size, max_lado)
+        if fator > 1:
+            pil_img.draft('RGB', (pil_img.width // fator, pil_img.height // fator))
+        img = np.asarray(ImageOps.exif_transpose(pil_img).convert('RGB'))
+    # O draft só vale para JPEG; nos demais formatos reduz depois de decodificar
+    img = _reduzir_por_fator(img, fator_reducao(img.shape[1], img.shape[0], max_lado))
+    return img if rgb else converter_cor(img, RGB, BGR)
+
+
+@cronometrado('decodificacao')
+def carregar_imagem(origem, cor=BGR, max_lado=None):
+    """
+    Lê uma imagem do disco (ou do conteúdo do arquivo em bytes). Retorna None em caso de falha.
+    
+    O formato é identificado pela assinatura e extensão: HEIC vai direto ao
+    pillow-heif, JPEG e os demais ao OpenCV, e o PIL fica para o que o OpenCV
+    não lê. A imagem sai na ordem de canais pedida, sem conversão extra.
+    
+    Args:
+        origem: Caminho do arquivo ou seu conteúdo em bytes
+        cor: BGR (OpenCV, DeepFace) ou RGB (MTCNN)
+        max_lado: Decodifica em 1/2, 1/4 ou 1/8 da resolução enquanto o maior
+            lado continuar >= max_lado (None = --max-lado-leitura; 0 = original)
+    """
+    rgb = cor == RGB
+    if max_lado is None:
+        max_lado = max_lado_leitura()
+    
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        fonte, nome = io.BytesIO(origem), ''
+        cabecalho = fonte.getbuffer()[:16].tobytes()
+    else:
+        fonte = nome = str(origem)
+        try:
+            with open(fonte, 'rb') as f:
+                cabecalho = f.read(16)
+        except OSError:
+            return None
+    
     try:
-        img = cv2.imread(caminho_imagem)
-        
-        if img is None and HEIF_SUPPORT and caminho_imagem.lower().endswith('.heic'):
+        if _formato_imagem(cabecalho, nome) == 'heif':
+            return _carregar_heif(fonte, rgb, max_lado) if HEIF_SUPPORT else None
+        img = _carregar_opencv(fonte, rgb, max_lado)
+        if img is None and PIL_AVAILABLE:
+            if hasattr(fonte, 'seek'):
+                fonte.seek(0)
+            img = _carregar_pil(fonte, rgb, max_lado)
+        return img
+    except Exception:
+        return None
+
+
+def reduzir_para_deteccao(img, max_lado=MAX_LADO_DETECCAO):
+    """Reduz a imagem para que o maior lado não passe de max_lado. Retorna (imagem, escala)."""
+    maior_lado = max(img.shape[:2])
+    if not max_lado or maior_lado <= max_lado:
+        return img, 1.0
+    escala = max_lado / maior_lado
+    reduzida = cv2.resize(img, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    return reduzida, escala
+
+
+def reescalar_deteccoes(deteccoes, escala):
+    """Converte caixas e pontos faciais da escala de detecção para a resolução original."""
+    if escala == 1.0:
+        return deteccoes
+    for det in deteccoes:
+        det['box'] = [int(round(v / escala)) for v in det['box']]
+        if 'keypoints' in det:
+            det['keypoints'] = {
+                nome: [int(round(c / escala)) for c in ponto]
+                for nome, ponto in det['keypoints'].items()
+            }
+    return deteccoes
+
+
+def _detectar_mesmo_tamanho(detector, imagens):
+    """Uma chamada ao MTCNN para imagens RGB de mesmo tamanho; uma lista de detecções por imagem."""
+    if len(imagens) == 1:
+        return [detector.detect_faces(imagens[0], min_face_size=MIN_FACE_SIZE_MTCNN)]
+    try:
+        return detector.detect_faces(imagens, min_face_size=MIN_FACE_SIZE_MTCNN)
+    except Exception:
+        # Uma imagem problemática não deve derrubar o lote inteiro
+        deteccoes_lote = []
+        for img in imagens:
             try:
-                pil_img = Image.open(caminho_imagem)
-                img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+                deteccoes_lote.append(detector.detect_faces(img, min_face_size=MIN_FACE_SIZE_MTCNN))
             except Exception:
-                return None
+                deteccoes_lote.append([])
+        return deteccoes_lote
+
+
+@cronometrado('deteccao')
+def detectar_faces_em_lote(imagens, tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO, cor=RGB):
+    """
+    Detecta rostos em várias imagens, enviando várias imagens por chamada ao MTCNN.
+    
+    Cada imagem é reduzida para no máximo `max_lado` antes da detecção; as
+    caixas e pontos faciais retornados estão nas coordenadas originais.
+    Imagens BGR só são convertidas para RGB depois de reduzidas. O resultado
+    de cada imagem não depende das demais do lote.
+    
+    Args:
+        imagens: Lista de imagens (podem ter tamanhos diferentes)
+        tamanho_lote: Quantidade máxima de imagens por chamada ao detector
+        max_lado: Maior lado da cópia usada na detecção (None = resolução original)
+        cor: Espaço de cor das imagens (RGB ou BGR)
         
-        if img is None:
-            return None
-            
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        detector = get_detector()
-        resultados = detector.detect_faces(img)
+    Returns:
+        list: Uma lista de detecções (formato do MTCNN) por imagem, na mesma ordem
+    """
+    detector = get_detector()
+    resultados = []
+    for inicio in range(0, len(imagens), tamanho_lote):
+        reduzidas, escalas = zip(*(reduzir_para_deteccao(img, max_lado)
+                                   for img in imagens[inicio:inicio + tamanho_lote]))
+        reduzidas = [converter_cor(img, cor, RGB) for img in reduzidas]
+        # O MTCNN completa com bordas as imagens menores de um lote misto, o que
+        # desloca as caixas; só imagens do mesmo tamanho são detectadas juntas
+        grupos = {}
+        for i, img in enumerate(reduzidas):
+            grupos.setdefault(img.shape, []).append(i)
+        deteccoes_lote = [None] * len(reduzidas)
+        for indices in grupos.values():
+            for i, deteccoes in zip(indices, _detectar_mesmo_tamanho(detector, [reduzidas[i] for i in indices])):
+                deteccoes_lote[i] = deteccoes
         
-        if resultados:
-            x1, y1, largura, altura = resultados[0]['box']
-            x2, y2 = x1 + largura, y1 + altura
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(img.shape[1], x2), min(img.shape[0], y2)
-            rosto_recortado = img[y1:y2, x1:x2]
-            return cv2.cvtColor(rosto_recortado, cv2.COLOR_RGB2BGR)
-        else:
-            return None
-    except Exception:
+        for deteccoes, escala in zip(deteccoes_lote, escalas):
+            resultados.append(reescalar_deteccoes(deteccoes, escala))
+    return resultados
+
+
+def detectar_faces(img, max_lado=MAX_LADO_DETECCAO, cor=RGB):
+    """Detecta os rostos de uma imagem (ver detectar_faces_em_lote)."""
+    return detectar_faces_em_lote([img], 1, max_lado, cor)[0]
+
+
+def configuracao_deteccao(max_lado=MAX_LADO_DETECCAO):
+    """Configurações que alteram o resultado da detecção (chave do cache e parâmetros do manifesto)."""
+    configuracao = {'detector': 'mtcnn', 'max_lado': max_lado, 'min_face_size': MIN_FACE_SIZE_MTCNN}
+    # As caixas ficam nas coordenadas da imagem decodificada
+    if max_lado_leitura():
+        configuracao['max_lado_leitura'] = max_lado_leitura()
+    return configuracao
+
+
+def detectar_faces_em_arquivos(caminhos, imagens, tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                               cor=RGB):
+    """
+    Como detectar_faces_em_lote, mas consultando o cache de detecções pelo conteúdo de cada arquivo.
+    
+    Apenas as imagens ausentes do cache passam pelo MTCNN; o resultado delas é guardado.
+    
+    Args:
+        caminhos: Arquivos de origem de cada imagem
+        imagens: Imagens já carregadas, na mesma ordem de caminhos
+        cor: Espaço de cor das imagens (RGB ou BGR)
+        
+    Returns:
+        list: Uma lista de detecções por imagem, na mesma ordem
+    """
+    cache = get_cache_deteccoes()
+    if cache is None:
+        return detectar_faces_em_lote(imagens, tamanho_lote, max_lado, cor)
+    
+    configuracao = configuracao_deteccao(max_lado)
+    chaves = []
+    resultados = []
+    for caminho in caminhos:
+        try:
+            chave = cache.chave(str(caminho), configuracao)
+        except OSError:
+            chave = None
+        chaves.append(chave)
+        resultados.append(cache.obter(chave) if chave else None)
+    
+    faltantes = [i for i, deteccoes in enumerate(resultados) if deteccoes is None]
+    contar('cache_deteccao_acertos', len(resultados) - len(faltantes))
+    contar('cache_deteccao_faltas', len(faltantes))
+    if faltantes:
+        novas = detectar_faces_em_lote([imagens[i] for i in faltantes], tamanho_lote, max_lado, cor)
+        for i, deteccoes in zip(faltantes, novas):
+            resultados[i] = deteccoes
+            if chaves[i]:
+                try:
+                    cache.guardar(chaves[i], deteccoes)
+                except OSError:
+                    pass
+    return resultados
+
+
+def recortar_rosto_principal(img, deteccoes):
+    """Recorta o primeiro rosto detectado como uma visão de img, sem cópia (None se não houver rosto)."""
+    if not deteccoes:
         return None
+    x1, y1, largura, altura = deteccoes[0]['box']
+    x2, y2 = x1 + largura, y1 + altura
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(img.shape[1], x2), min(img.shape[0], y2)
+    return img[y1:y2, x1:x2]
+
+
+@cronometrado('alinhamento')
+def alinhar_rostos_em_lote(caminhos_imagens, tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                           cor=BGR):
+    """
+    Detecta e recorta o rosto principal de várias imagens.
+    
+    A detecção usa uma cópia reduzida (ou o cache de detecções), mas o recorte
+    sai da imagem em resolução original. Com cor=RGB, os recortes são visões
+    da imagem decodificada, sem conversão nem cópia.
+    Retorna um recorte no espaço de cor `cor` (ou None) por caminho.
+    """
+    imagens_rgb = [carregar_imagem(caminho, cor=RGB) for caminho in caminhos_imagens]
+    
+    validos = [(caminho, img) for caminho, img in zip(caminhos_imagens, imagens_rgb) if img is not None]
+    try:
+        deteccoes = iter(detectar_faces_em_arquivos(
+            [caminho for caminho, _ in validos], [img for _, img in validos], tamanho_lote, max_lado
+        ))
+    except Exception:
+        return [None] * len(imagens_rgb)
+    
+    rostos = []
+    for img in imagens_rgb:
+        if img is None:
+            rostos.append(None)
+            continue
+        try:
+            rosto = recortar_rosto_principal(img, next(deteccoes))
+            rostos.append(None if rosto is None else converter_cor(rosto, RGB, cor))
+        except Exception:
+            rostos.append(None)
+    return rostos
+
+
+def alinhar_rosto_com_mtcnn(caminho_imagem, max_lado=MAX_LADO_DETECCAO, cor=BGR):
+    """Detecta e recorta o rosto principal da imagem."""
+    return alinhar_rostos_em_lote([caminho_imagem], 1, max_lado, cor)[0]
+
+
+class NormalizadorIluminacao:
+    """
+    Normaliza a iluminação de recortes de rosto reaproveitando objetos e memória.
+    
+    Os objetos CLAHE são criados uma vez por (clip_limit, grade) e a conversão
+    para cinza usa um buffer reaproveitado entre chamadas; cada recorte é
+    convertido para cinza uma única vez, mesmo com vários métodos.
+    Não é seguro para uso simultâneo por várias threads; get_normalizador()
+    entrega uma instância por thread.
+    """
+    
+    def __init__(self, clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
+        self.clip_limit = clip_limit
+        self.grade = grade
+        self._clahes = {}
+        self._memoria = np.empty(0, dtype=np.uint8)
+    
+    def clahe(self, clip_limit=None, grade=None):
+        """Objeto CLAHE compartilhado para os parâmetros informados."""
+        chave = (float(clip_limit or self.clip_limit), int(grade or self.grade))
+        if chave not in self._clahes:
+            self._clahes[chave] = cv2.createCLAHE(clipLimit=chave[0], tileGridSize=(chave[1], chave[1]))
+        return self._clahes[chave]
+    
+    def _buffer(self, forma):
+        """Visão contígua do buffer interno com a forma pedida (cresce quando necessário)."""
+        tamanho = forma[0] * forma[1]
+        if self._memoria.size < tamanho:
+            self._memoria = np.empty(tamanho, dtype=np.uint8)
+        return self._memoria[:tamanho].reshape(forma)
+    
+    @cronometrado('normalizacao')
+    def normalizar_metodos(self, imagem_rosto, metodos, clip_limit=None, grade=None, cor=BGR, saida=BGR):
+        """
+        Aplica vários métodos a um recorte com uma única conversão para cinza.
+        
+        Args:
+            cor: Espaço de cor do recorte (BGR ou RGB)
+            saida: Espaço de cor das imagens normalizadas (BGR ou CINZA; em
+                CINZA não há a conversão de volta para três canais)
+        
+        Returns:
+            dict: {metodo: imagem normalizada}; métodos desconhecidos devolvem o
+                próprio recorte, apenas convertido para `saida`
+        """
+        cinza = converter_cor(imagem_rosto, cor, CINZA, dst=self._buffer(imagem_rosto.shape[:2]))
+        rascunho = np.empty_like(cinza)
+        
+        resultados = {}
+        for metodo in metodos:
+            # Em cinza o resultado é devolvido sem cópia, então cada método precisa do seu array
+            normalizada = np.empty_like(cinza) if saida == CINZA else rascunho
+            if metodo == "histogram":
+                cv2.equalizeHist(cinza, dst=normalizada)
+            elif metodo == "clahe":
+                self.clahe(clip_limit, grade).apply(cinza, dst=normalizada)
+            else:
+                resultados[metodo] = converter_cor(imagem_rosto, cor, saida)
+                continue
+            resultados[metodo] = converter_cor(normalizada, CINZA, saida)
+        return resultados
+    
+    def normalizar(self, imagem_rosto, metodo="clahe", clip_limit=None, grade=None, cor=BGR):
+        """Aplica um método de normalização a um recorte (BGR ou RGB) e devolve o resultado em BGR."""
+        return self.normalizar_metodos(imagem_rosto, [metodo], clip_limit, grade, cor)[metodo]
+    
+    def normalizar_lote(self, rostos, metodos_por_rosto, clip_limit=None, grade=None, cor=BGR, saida=BGR):
+        """
+        Normaliza uma lista de recortes em uma chamada.
+        
+        Args:
+            rostos: Recortes no espaço de cor `cor` (None é mantido como None)
+            metodos_por_rosto: Lista de métodos de cada recorte
+            
+        Returns:
+            list: Um dicionário {metodo: imagem} (ou None) por recorte
+        """
+        return [
+            None if rosto is None else self.normalizar_metodos(rosto, metodos, clip_limit, grade, cor, saida)
+            for rosto, metodos in zip(rostos, metodos_por_rosto)
+        ]
+
+
+# Um normalizador por thread: o buffer e os objetos CLAHE não podem ser compartilhados
+_normalizadores = threading.local()
+
+
+def get_normalizador():
+    """Retorna o normalizador de iluminação da thread atual (criado no primeiro uso)."""
+    normalizador = getattr(_normalizadores, 'normalizador', None)
+    if normalizador is None:
+        normalizador = _normalizadores.normalizador = NormalizadorIluminacao()
+    return normalizador
 
 
-def normalizar_iluminacao(imagem_rosto, method="clahe"):
-    """Aplica normalização de iluminação (CLAHE ou Histogram)."""
-    if method == "histogram":
-        img_gray = cv2.cvtColor(imagem_rosto, cv2.COLOR_BGR2GRAY)
-        img_norm = cv2.equalizeHist(img_gray)
-        return cv2.cvtColor(img_norm, cv2.COLOR_GRAY2BGR)
-    elif method == "clahe":
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        img_gray = cv2.cvtColor(imagem_rosto, cv2.COLOR_BGR2GRAY)
-        img_norm = clahe.apply(img_gray)
-        return cv2.cvtColor(img_norm, cv2.COLOR_GRAY2BGR)
-    return imagem_rosto
+def normalizar_iluminacao(imagem_rosto, method="clahe", clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO, cor=BGR):
+    """Aplica normalização de iluminação (CLAHE ou Histogram); o resultado sai em BGR."""
+    return get_normalizador().normalizar(imagem_rosto, method, clip_limit, grade, cor)
 
 
-def preprocessamento_base(caminho_imagem, metodo_normalizacao="clahe"):
+def preprocessamento_base(caminho_imagem, metodo_normalizacao="clahe", max_lado=MAX_LADO_DETECCAO,
+                          clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
     """Pipeline: detecta rosto e normaliza iluminação."""
-    rosto_alinhado = alinhar_rosto_com_mtcnn(caminho_imagem)
+    # O recorte fica em RGB (visão da imagem lida) e vai direto para cinza
+    rosto_alinhado = alinhar_rosto_com_mtcnn(caminho_imagem, max_lado, cor=RGB)
     if rosto_alinhado is not None:
-        return normalizar_iluminacao(rosto_alinhado, method=metodo_normalizacao)
+        return normalizar_iluminacao(rosto_alinhado, metodo_normalizacao, clip_limit, grade, cor=RGB)
     return None
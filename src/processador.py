@@ -3,13 +3,28 @@ Módulo para processamento em lote de imagens.
 """
 
 import os
-import cv2
+import shutil
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from src.preprocessamento import preprocessamento_base
+from src.preprocessamento import (CLAHE_CLIP_PADRAO, CLAHE_GRADE_PADRAO, MAX_LADO_DETECCAO, TAMANHO_LOTE_DETECCAO,
+                                  configuracao_deteccao, get_detector, preprocessamento_base)
+from src.galeria import extrair_id
+from src.manifesto import ManifestoProcessamento, parametros_metodo
+from src.metricas import coletar, cronometrado, incorporar
+from src.gravacao import get_gravador
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
 
+def _incorporar_metricas(lotes):
+    """Repassa os resultados de cada lote, somando as métricas do filho às do processo atual."""
+    for resultados, medicoes in lotes:
+        incorporar(medicoes)
+        yield resultados
+
+
 class ProcessadorImagens:
     """Processa imagens em lote aplicando métodos de normalização."""
     
@@ -21,39 +36,110 @@ class ProcessadorImagens:
     def listar_imagens(self):
         """Lista todas as imagens válidas no diretório."""
         imagens = []
-        for arquivo in self.dir_entrada.iterdir():
-            if arquivo.is_file() and arquivo.suffix in self.extensoes_validas:
-                imagens.append(arquivo)
+        # scandir usa o tipo informado pela listagem, sem um stat por arquivo
+        with os.scandir(self.dir_entrada) as entradas:
+            for entrada in entradas:
+                arquivo = Path(entrada.path)
+                if entrada.is_file() and arquivo.suffix in self.extensoes_validas:
+                    imagens.append(arquivo)
         return sorted(imagens)
     
-    def processar_imagem(self, caminho_imagem, metodo):
+    def processar_imagem(self, caminho_imagem, metodo, clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
         """Processa uma única imagem."""
-        return preprocessamento_base(str(caminho_imagem), metodo_normalizacao=metodo)
+        return preprocessamento_base(str(caminho_imagem), metodo, clip_limit=clip_limit, grade=grade)
+    
+    def caminho_saida(self, nome_original, metodo):
+        """Caminho da imagem processada de uma origem em um método."""
+        return self.dir_saida / metodo / f"{Path(nome_original).stem}.jpg"
     
     def salvar_imagem(self, imagem, nome_original, metodo):
-        """Salva a imagem processada."""
-        dir_metodo = self.dir_saida / metodo
-        dir_metodo.mkdir(parents=True, exist_ok=True)
-        nome_base = Path(nome_original).stem
-        nome_saida = f"{nome_base}.jpg"
-        caminho_saida = dir_metodo / nome_saida
-        cv2.imwrite(str(caminho_saida), imagem)
-        return caminho_saida
+        """
+        Enfileira a gravação da imagem processada no gravador em segundo plano.
+        
+        A imagem não deve ser modificada depois. Retorna um Future que resolve
+        para o caminho salvo (use .result() antes de depender do arquivo).
+        """
+        caminho_saida = self.caminho_saida(nome_original, metodo)
+        caminho_saida.parent.mkdir(parents=True, exist_ok=True)
+        return get_gravador().gravar(caminho_saida, imagem)
     
     def ja_processada(self, nome_arquivo, metodo):
-        """Verifica se uma imagem já foi processada."""
-        nome_base = Path(nome_arquivo).stem
-        nome_saida = f"{nome_base}.jpg"
-        caminho_saida = self.dir_saida / metodo / nome_saida
-        return caminho_saida.exists()
+        """Verifica se uma imagem já foi processada (apenas pelo nome; ver ManifestoProcessamento)."""
+        return self.caminho_saida(nome_arquivo, metodo).exists()
+    
+    def processar_lote_pendente(self, caminhos_imagens, metodos_por_imagem, tamanho_lote=TAMANHO_LOTE_DETECCAO,
+                                max_lado=MAX_LADO_DETECCAO, clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
+        """
+        Detecta os rostos de várias imagens em lote e salva os métodos pendentes de cada uma.
+        
+        Retorna:
+        Lista com, para cada imagem, None se nenhum rosto for detectado ou
+        True se todos os métodos foram salvos. As gravações correm em segundo
+        plano, mas o lote só termina depois que todas chegam ao disco.
+        """
+        from src.preprocessamento import CINZA, RGB, alinhar_rostos_em_lote, get_normalizador
+        
+        # Recortes em RGB (visões das imagens lidas) vão direto para cinza, e as
+        # saídas são gravadas em cinza, sem voltar para três canais
+        rostos = alinhar_rostos_em_lote([str(c) for c in caminhos_imagens], tamanho_lote, max_lado, cor=RGB)
+        
+        # Todos os métodos de todos os rostos do lote em uma chamada ao normalizador
+        try:
+            normalizados = get_normalizador().normalizar_lote(
+                rostos, metodos_por_imagem, clip_limit, grade, cor=RGB, saida=CINZA
+            )
+        except Exception:
+            normalizados = [None if r is None else {} for r in rostos]
+        
+        gravacoes = []
+        resultados = []
+        for caminho_imagem, metodos, imagens in zip(caminhos_imagens, metodos_por_imagem, normalizados):
+            if imagens is None:
+                resultados.append(None)
+                continue
+            
+            sucesso = True
+            for metodo in metodos:
+                try:
+                    gravacoes.append((len(resultados), self.salvar_imagem(imagens[metodo], caminho_imagem.name, metodo)))
+                except Exception:
+                    sucesso = False
+            resultados.append(sucesso)
+        
+        # O manifesto só pode registrar saídas que de fato foram gravadas
+        for indice, gravacao in gravacoes:
+            if gravacao.exception() is not None:
+                resultados[indice] = False
+        return resultados
+    
+    def _processar_lote_no_filho(self, *argumentos):
+        """Executa processar_lote_pendente em um processo filho e devolve também as métricas dele."""
+        coletar()
+        resultados = self.processar_lote_pendente(*argumentos)
+        return resultados, coletar()
     
-    def processar_todas(self, metodos=['clahe', 'histogram'], skip_existing=True):
+    def processar_pendente(self, caminho_imagem, metodos):
+        """Processa uma única imagem pendente (ver processar_lote_pendente)."""
+        return self.processar_lote_pendente([caminho_imagem], [metodos])[0]
+    
+    @cronometrado('processar_todas')
+    def processar_todas(self, metodos=['clahe', 'histogram'], skip_existing=True, workers=1,
+                        tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                        clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
         """
         Processa todas as imagens do diretório de entrada com os métodos especificados.
         
         Argumentos:
         metodos (list): Lista de métodos a serem aplicados.
-        skip_existing (bool): Se True, pula imagens já processadas.
+        skip_existing (bool): Se True, pula imagens já processadas. A decisão vem do
+            manifesto do diretório de saída: uma imagem é refeita se a origem mudou
+            (hash) ou se os parâmetros do método são outros.
+        workers (int): Número de processos; com mais de um, as imagens são
+            distribuídas entre processos, cada um com seu próprio detector MTCNN.
+        tamanho_lote (int): Imagens enviadas por chamada ao detector MTCNN.
+        max_lado (int): Maior lado da cópia reduzida usada na detecção (None = original).
+        clip_limit (float): Limite de contraste do CLAHE.
+        grade (int): Regiões por lado da grade do CLAHE.
         
         Retorna:
         Dicionário com estatísticas do processamento.
@@ -70,49 +156,159 @@ class ProcessadorImagens:
             'falhas': 0,
         }
         
-        # Cache para armazenar o rosto detectado e evitar redetecção
-        from src.preprocessamento import alinhar_rosto_com_mtcnn, normalizar_iluminacao
+        manifesto = ManifestoProcessamento.carregar(self.dir_saida)
+        hashes = manifesto.atualizar_origens(imagens)
+        parametros = {m: parametros_metodo(m, clip_limit, grade, configuracao_deteccao(max_lado)) for m in metodos}
+        if not manifesto.existia:
+            manifesto.adotar_saidas_existentes(metodos, parametros)
         
-        for idx, caminho_imagem in enumerate(imagens, 1):
-            print(f"[{idx}/{total_imagens}] {caminho_imagem.name}", end=" ")
-            
-            # Verifica se já foi processada em todos os métodos
+        # Métodos que ainda faltam para cada imagem (vazio = já processada em todos)
+        pendentes = []
+        for caminho_imagem in imagens:
             if skip_existing:
-                todos_processados = all(self.ja_processada(caminho_imagem.name, metodo) for metodo in metodos)
-                if todos_processados:
+                pendentes.append(manifesto.pendentes(caminho_imagem.name, metodos, parametros))
+            else:
+                pendentes.append(list(metodos))
+        
+        # Agrupa as imagens pendentes em lotes para a detecção
+        tarefas = [(c, m) for c, m in zip(imagens, pendentes) if m]
+        lotes = [tarefas[i:i + tamanho_lote] for i in range(0, len(tarefas), tamanho_lote)]
+        argumentos = ([[c for c, _ in lote] for lote in lotes],
+                      [[m for _, m in lote] for lote in lotes],
+                      [tamanho_lote] * len(lotes),
+                      [max_lado] * len(lotes),
+                      [clip_limit] * len(lotes),
+                      [grade] * len(lotes))
+        
+        executor = None
+        if workers > 1 and len(lotes) > 1:
+            # spawn: o TensorFlow já carregado no processo pai não é seguro para fork
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=get_detector
+            )
+            # As medições de cada filho voltam junto com o lote e são somadas às do pai
+            resultados_lotes = _incorporar_metricas(executor.map(self._processar_lote_no_filho, *argumentos))
+        else:
+            resultados_lotes = map(self.processar_lote_pendente, *argumentos)
+        resultados = itertools.chain.from_iterable(resultados_lotes)
+        
+        try:
+            # executor.map devolve os resultados na ordem de entrada, então o
+            # progresso continua sendo impresso na ordem das imagens
+            for idx, (caminho_imagem, metodos_pendentes) in enumerate(zip(imagens, pendentes), 1):
+                print(f"[{idx}/{total_imagens}] {caminho_imagem.name}", end=" ", flush=True)
+                
+                if not metodos_pendentes:
                     print("✓ (já processada)")
                     estatisticas['puladas'] += 1
                     continue
-            
-            # Detecta o rosto uma vez apenas
-            rosto_alinhado = alinhar_rosto_com_mtcnn(str(caminho_imagem))
-            
-            if rosto_alinhado is None:
-                print("✗ (sem rosto)")
-                estatisticas['falhas'] += 1
-                continue
-            
-            # Aplica cada método de normalização no rosto já detectado
-            sucesso = True
-            for metodo in metodos:
-                if skip_existing and self.ja_processada(caminho_imagem.name, metodo):
+                
+                sucesso = next(resultados)
+                
+                if sucesso is None:
+                    print("✗ (sem rosto)")
+                    estatisticas['falhas'] += 1
                     continue
                 
-                try:
-                    imagem_processada = normalizar_iluminacao(rosto_alinhado, method=metodo)
-                    self.salvar_imagem(imagem_processada, caminho_imagem.name, metodo)
-                except Exception:
-                    sucesso = False
-            
-            if sucesso:
-                print("✓")
-                estatisticas['processadas'] += 1
+                if sucesso:
+                    print("✓")
+                    estatisticas['processadas'] += 1
+                    for metodo in metodos_pendentes:
+                        manifesto.registrar(caminho_imagem.name, metodo, self.caminho_saida(caminho_imagem.name, metodo),
+                                            hashes[caminho_imagem.name], parametros[metodo])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            manifesto.salvar()
         
         print(f"\nConcluído: {estatisticas['processadas']} processadas, {estatisticas['puladas']} puladas, {estatisticas['falhas']} falhas")
         return estatisticas
+    
+    def proximo_nome(self, id_aluno):
+        """Retorna o próximo nome livre no padrão <id>-<n> para o aluno."""
+        usados = {p.stem for p in self.dir_entrada.glob(f"{id_aluno}-*")}
+        usados.update(p.stem for p in self.dir_saida.glob(f"*/{id_aluno}-*"))
+        n = 1
+        while f"{id_aluno}-{n}" in usados:
+            n += 1
+        return f"{id_aluno}-{n}"
+    
+    def matricular(self, caminho_foto, id_aluno, metodos=['clahe', 'histogram'],
+                   clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
+        """
+        Cadastra uma nova foto de aluno no dataset e nas galerias processadas.
+        
+        A foto original é copiada para o diretório de entrada como <id>-<n>
+        e o rosto normalizado é salvo em cada método.
+        
+        Retorna:
+        Dicionário {metodo: caminho salvo}, vazio se nenhum rosto for detectado.
+        """
+        from src.preprocessamento import CINZA, RGB, alinhar_rosto_com_mtcnn, get_normalizador
+        
+        rosto_alinhado = alinhar_rosto_com_mtcnn(str(caminho_foto), cor=RGB)
+        if rosto_alinhado is None:
+            return {}
+        
+        nome = self.proximo_nome(id_aluno) + Path(caminho_foto).suffix
+        self.dir_entrada.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(caminho_foto, self.dir_entrada / nome)
+        
+        normalizados = get_normalizador().normalizar_metodos(rosto_alinhado, metodos, clip_limit, grade,
+                                                             cor=RGB, saida=CINZA)
+        # Os métodos são codificados em paralelo; o manifesto só registra o que já está no disco
+        gravacoes = {metodo: self.salvar_imagem(normalizados[metodo], nome, metodo) for metodo in metodos}
+        salvos = {metodo: gravacao.result() for metodo, gravacao in gravacoes.items()}
+        
+        # Sem manifesto, o próximo processamento adota as saídas existentes
+        manifesto = ManifestoProcessamento.carregar(self.dir_saida)
+        if manifesto.existia:
+            hash_origem = manifesto.registrar_origem(self.dir_entrada / nome)
+            deteccao = configuracao_deteccao()
+            for metodo, caminho in salvos.items():
+                manifesto.registrar(nome, metodo, caminho, hash_origem, parametros_metodo(metodo, clip_limit, grade, deteccao))
+            manifesto.salvar()
+        return salvos
+    
+    def desmatricular(self, id_aluno, metodos=['clahe', 'histogram']):
+        """
+        Remove todas as fotos de um aluno do dataset e das galerias processadas.
+        
+        Retorna:
+        Dicionário {metodo: lista de nomes removidos da galeria}.
+        """
+        for arquivo in self.dir_entrada.glob(f"{id_aluno}*"):
+            if arquivo.suffix in self.extensoes_validas and extrair_id(arquivo.name) == id_aluno:
+                arquivo.unlink()
+        
+        removidos = {}
+        manifesto = ManifestoProcessamento.carregar(self.dir_saida)
+        for metodo in metodos:
+            removidos[metodo] = []
+            dir_metodo = self.dir_saida / metodo
+            if not dir_metodo.is_dir():
+                continue
+            for arquivo in dir_metodo.glob(f"{id_aluno}*"):
+                if arquivo.suffix.lower() == '.jpg' and extrair_id(arquivo.name) == id_aluno:
+                    arquivo.unlink()
+                    removidos[metodo].append(arquivo.name)
+        
+        if manifesto.existia:
+            origens = [nome for nome in manifesto.origens if extrair_id(nome) == id_aluno]
+            for saidas in manifesto.saidas.values():
+                origens.extend(nome for nome in saidas if extrair_id(nome) == id_aluno)
+            manifesto.remover(origens)
+            manifesto.salvar()
+        return removidos
 
 
-def processar_dataset(dir_entrada='data/images', dir_saida='data/imagens_processadas', skip_existing=True):
+def processar_dataset(dir_entrada='data/images', dir_saida='data/imagens_processadas', skip_existing=True, workers=1,
+                      tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                      clip_limit=CLAHE_CLIP_PADRAO, grade=CLAHE_GRADE_PADRAO):
     """Processa todo o dataset."""
     processador = ProcessadorImagens(dir_entrada, dir_saida)
-    return processador.processar_todas(skip_existing=skip_existing)
+    return processador.processar_todas(skip_existing=skip_existing, workers=workers,
+                                       tamanho_lote=tamanho_lote, max_lado=max_lado,
+                                       clip_limit=clip_limit, grade=grade)
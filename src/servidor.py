@@ -0,0 +1,140 @@
+"""
+Serviço HTTP local de reconhecimento facial com modelos mantidos em memória.
+"""
+
+import json
+import threading
+import cv2
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.preprocessamento import MAX_LADO_DETECCAO, carregar_imagem, get_detector
+from src.galeria import TAMANHO_LOTE_PADRAO, carregar_modelo, get_galeria
+from src.identificacao import anotar_imagem, identificar_rostos, resumir_identificacao
+
+TAMANHO_MAXIMO_UPLOAD = 25 * 1024 * 1024
+ESPERA_MAXIMA_FILA = 30.0
+
+
+class ServicoReconhecimento:
+    """Mantém detector, modelo e galeria carregados e atende uma imagem por chamada."""
+
+    def __init__(self, db_path, threshold=0.6, batch_size=TAMANHO_LOTE_PADRAO,
+                 max_lado=MAX_LADO_DETECCAO, max_concorrentes=2):
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_lado = max_lado
+        self.vagas = threading.BoundedSemaphore(max_concorrentes)
+
+        print("Carregando detector, modelo e galeria...")
+        get_detector()
+        carregar_modelo()
+        self.galeria = get_galeria(db_path)
+        print(f"✓ Pronto: {len(self.galeria)} rostos na galeria")
+
+    def processar(self, conteudo, nome_arquivo="upload", anotar=False):
+        """
+        Identifica os rostos de uma imagem codificada (JPEG, PNG, HEIC...).
+
+        Returns:
+            tuple: (resultado, jpeg_anotado ou None); resultado é None se a imagem for inválida
+        """
+        img = carregar_imagem(conteudo)
+        if img is None:
+            return None, None
+
+        detalhes = identificar_rostos(img, self.galeria, self.threshold, self.batch_size, self.max_lado)
+        resultado = resumir_identificacao(nome_arquivo, detalhes)
+
+        jpeg = None
+        if anotar:
+            ok, buffer = cv2.imencode('.jpg', anotar_imagem(img, detalhes, copiar=False))
+            jpeg = buffer.tobytes() if ok else None
+        return resultado, jpeg
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Rotas:
+        GET  /saude                      -> estado do serviço
+        POST /identificar[?anotada=1]    -> corpo = bytes da imagem
+    """
+
+    servico = None
+
+    def _responder_json(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/saude':
+            self._responder_json(404, {'erro': 'rota não encontrada'})
+            return
+        self._responder_json(200, {'status': 'ok', 'rostos_galeria': len(self.servico.galeria)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/identificar':
+            self._responder_json(404, {'erro': 'rota não encontrada'})
+            return
+
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho <= 0:
+            self._responder_json(400, {'erro': 'envie os bytes da imagem no corpo da requisição'})
+            return
+        if tamanho > TAMANHO_MAXIMO_UPLOAD:
+            self._responder_json(413, {'erro': 'imagem muito grande'})
+            return
+        conteudo = self.rfile.read(tamanho)
+
+        parametros = parse_qs(url.query)
+        anotar = parametros.get('anotada', ['0'])[0] in ('1', 'true', 'sim')
+        nome_arquivo = parametros.get('arquivo', ['upload'])[0]
+
+        # Limita quantas imagens são processadas ao mesmo tempo
+        if not self.servico.vagas.acquire(timeout=ESPERA_MAXIMA_FILA):
+            self._responder_json(503, {'erro': 'serviço ocupado, tente novamente'})
+            return
+        try:
+            resultado, jpeg = self.servico.processar(conteudo, nome_arquivo, anotar)
+        except Exception as e:
+            self._responder_json(500, {'erro': str(e)})
+            return
+        finally:
+            self.servico.vagas.release()
+
+        if resultado is None:
+            self._responder_json(400, {'erro': 'não foi possível decodificar a imagem'})
+            return
+
+        if not anotar:
+            self._responder_json(200, resultado)
+            return
+        if jpeg is None:
+            self._responder_json(500, {'erro': 'falha ao codificar a imagem anotada'})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(jpeg)))
+        self.send_header('X-Resultado', json.dumps(resultado))
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+
+def servir(db_path, host='127.0.0.1', porta=8000, threshold=0.6, batch_size=TAMANHO_LOTE_PADRAO,
+           max_lado=MAX_LADO_DETECCAO, max_concorrentes=2):
+    """Sobe o serviço HTTP e atende requisições até ser interrompido (Ctrl+C)."""
+    _Handler.servico = ServicoReconhecimento(db_path, threshold, batch_size, max_lado, max_concorrentes)
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    print(f"Servindo em http://{host}:{porta} (POST /identificar, GET /saude)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,97 @@
+"""
+Galeria de templates: um ou mais centróides normalizados por aluno.
+
+Em vez de comparar cada consulta com todas as fotos cadastradas, compara-se
+com os templates de cada aluno; o custo da busca passa a crescer com o número
+de alunos, não com o de fotos.
+"""
+
+import numpy as np
+
+from src.ann import kmeans_esferico
+from src.galeria import GaleriaEmbeddings, get_galeria, normalizar_l2, registrar_galeria
+
+CENTROIDES_POR_ALUNO_PADRAO = 1
+
+
+def centroides_identidade(vetores, n_centroides=CENTROIDES_POR_ALUNO_PADRAO):
+    """
+    Centróides normalizados das fotos de um aluno.
+
+    Com n_centroides > 1, as fotos são agrupadas por k-means esférico (ex.: com
+    e sem óculos), e cada grupo vira um template.
+
+    Returns:
+        tuple: (centroides (c, d), fotos por centróide)
+    """
+    vetores = np.asarray(vetores, dtype=np.float32)
+    if n_centroides <= 1 or len(vetores) <= 1:
+        return normalizar_l2(vetores.mean(axis=0, keepdims=True)), np.array([len(vetores)])
+
+    centroides = kmeans_esferico(vetores, min(n_centroides, len(vetores)))
+    grupos = (vetores @ centroides.T).argmax(axis=1)
+    contagem = np.bincount(grupos, minlength=len(centroides))
+    # Centróides sem nenhuma foto atribuída não representam o aluno
+    usados = contagem > 0
+    somas = np.zeros((len(centroides), vetores.shape[1]), dtype=np.float32)
+    np.add.at(somas, grupos, vetores)
+    return normalizar_l2(somas[usados]), contagem[usados]
+
+
+class GaleriaTemplates(GaleriaEmbeddings):
+    """
+    Galeria com uma linha por template, com a mesma interface de busca.
+
+    `arquivos` identifica cada template (ex.: Habo1 ou Habo1#2) e
+    `fotos_por_template` guarda quantas fotos foram agregadas em cada um.
+    """
+
+    def __init__(self, embeddings, identidades, arquivos, fotos_por_template):
+        super().__init__(embeddings, identidades, arquivos)
+        self.fotos_por_template = np.asarray(fotos_por_template, dtype=np.int64)
+
+    @property
+    def n_alunos(self):
+        return len(np.unique(self.identidades))
+
+    @classmethod
+    def construir(cls, galeria, centroides_por_aluno=CENTROIDES_POR_ALUNO_PADRAO):
+        """Agrega as linhas ativas da galeria de fotos em templates por aluno."""
+        linhas = galeria.linhas_ativas()
+        if not len(linhas):
+            return cls(np.empty((0, 0), dtype=np.float32), [], [], [])
+        ids_unicos, grupo = np.unique(galeria.identidades[linhas], return_inverse=True)
+
+        if centroides_por_aluno <= 1:
+            # Média em uma passada pelas fatias, sem carregar a galeria inteira
+            grupo_linha = np.full(galeria.n_linhas, -1, dtype=np.int64)
+            grupo_linha[linhas] = grupo
+            somas = np.zeros((len(ids_unicos), galeria.dimensao), dtype=np.float32)
+            for inicio, fatia in galeria.blocos():
+                grupos_fatia = grupo_linha[inicio:inicio + len(fatia)]
+                validos = grupos_fatia >= 0
+                np.add.at(somas, grupos_fatia[validos], np.asarray(fatia, dtype=np.float32)[validos])
+            return cls(normalizar_l2(somas), ids_unicos, ids_unicos, np.bincount(grupo))
+
+        ordem = np.argsort(grupo, kind='stable')
+        inicios = np.searchsorted(grupo[ordem], np.arange(len(ids_unicos) + 1))
+        vetores, identidades, arquivos, contagens = [], [], [], []
+        for i, identidade in enumerate(ids_unicos):
+            centroides, contagem = centroides_identidade(
+                galeria.embeddings[linhas[ordem[inicios[i]:inicios[i + 1]]]], centroides_por_aluno
+            )
+            vetores.append(centroides)
+            identidades.extend([identidade] * len(centroides))
+            arquivos.extend([identidade] if len(centroides) == 1 else
+                            [f"{identidade}#{j + 1}" for j in range(len(centroides))])
+            contagens.extend(contagem)
+        return cls(np.concatenate(vetores), identidades, arquivos, contagens)
+
+
+def ativar_templates(db_path, centroides_por_aluno=CENTROIDES_POR_ALUNO_PADRAO):
+    """Faz identificar/servir compararem as consultas com os templates de db_path."""
+    galeria = get_galeria(db_path)
+    templates = GaleriaTemplates.construir(galeria, centroides_por_aluno)
+    registrar_galeria(db_path, templates)
+    print(f"Templates: {len(templates)} vetores para {templates.n_alunos} alunos ({len(galeria)} fotos)")
+    return templates
@@ -3,169 +3,154 @@ Módulo de testes de acurácia do sistema de reconhecimento facial.
 """
 
 import os
-import cv2
 import time
 from pathlib import Path
-from src.preprocessamento import get_detector
+from src.preprocessamento import BGR, MAX_LADO_DETECCAO, TAMANHO_LOTE_DETECCAO, carregar_imagem, detectar_faces_em_arquivos
+from src.galeria import (DEEPFACE_AVAILABLE, EXTENSOES_VALIDAS, TAMANHO_LOTE_PADRAO, ConjuntoGalerias,
+                         extrair_id, gerar_embedding, gerar_embeddings, get_galeria)
 
 # Suprime warnings do DeepFace
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-try:
-    from deepface import DeepFace
-    DEEPFACE_AVAILABLE = True
-except ImportError:
-    DEEPFACE_AVAILABLE = False
+if not DEEPFACE_AVAILABLE:
     print("Aviso: DeepFace não está instalado. Testes de acurácia não disponíveis.")
 
 
-EXTENSOES_VALIDAS = {'.jpg', '.jpeg', '.png', '.heic', '.HEIC'}
-
-
-def extrair_id(nome_arquivo):
-    """Extrai o ID da pessoa a partir do nome do arquivo (ex: Habo1-1.jpg -> Habo1)."""
-    base = os.path.basename(nome_arquivo)
-    nome_sem_ext = os.path.splitext(base)[0]
-    return nome_sem_ext.split('-')[0]
-
-
 def buscar_rosto_silencioso(face_img, db_path, threshold=0.6):
-    """Busca um rosto no banco de dados sem imprimir no console."""
+    """Busca um rosto no índice da galeria sem imprimir no console."""
     if not DEEPFACE_AVAILABLE:
         return []
     
-    temp_path = f"temp_face_{time.time()}.jpg"
-    cv2.imwrite(temp_path, face_img)
-    
     try:
-        result = DeepFace.find(
-            img_path=temp_path,
-            db_path=db_path,
-            enforce_detection=False,
-            silent=True,
-            model_name="VGG-Face",
-            detector_backend="opencv"
-        )
-        
-        matches = []
-        if isinstance(result, list) and len(result) > 0:
-            df = result[0]
-            if not df.empty:
-                df_filtered = df[df['distance'] < threshold]
-                for _, row in df_filtered.iterrows():
-                    identity_file = os.path.basename(row['identity'])
-                    identity_id = extrair_id(identity_file)
-                    matches.append({
-                        'file': identity_file,
-                        'id': identity_id,
-                        'distance': row['distance']
-                    })
-        
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        return matches
-    
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        return get_galeria(db_path).correspondencias(gerar_embedding(face_img), threshold)
+    except Exception:
         return []
 
 
-def executar_testes_acuracia(data_dir='data/images', db_clahe='data/imagens_processadas/clahe', 
-                              db_histogram='data/imagens_processadas/histogram', threshold=0.6):
+def listar_imagens_teste(data_dir):
+    """Lista, em ordem, as imagens de teste de um diretório."""
+    return sorted(
+        os.path.join(data_dir, f) for f in os.listdir(data_dir)
+        if os.path.splitext(f)[1] in EXTENSOES_VALIDAS
+    )
+
+
+def extrair_rostos_teste(data_dir, tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO):
     """
-    Executa bateria de testes de acurácia.
+    Detecta o maior rosto de cada imagem de teste, lendo e detectando em lotes.
     
     Retorna:
-        tuple: (resultados_clahe, resultados_histogram)
+        list: Tuplas (caminho, recorte BGR) das imagens em que um rosto foi encontrado
     """
-    print("Iniciando bateria de testes...")
-    
-    imagens_teste = []
-    for f in os.listdir(data_dir):
-        if os.path.splitext(f)[1] in EXTENSOES_VALIDAS:
-            imagens_teste.append(os.path.join(data_dir, f))
-    
-    imagens_teste.sort()
-    
-    resultados_clahe = []
-    resultados_histogram = []
-    
-    detector = get_detector()
+    imagens_teste = listar_imagens_teste(data_dir)
     
     total = len(imagens_teste)
     print(f"Total de imagens para teste: {total}\n")
     
-    for i, img_path in enumerate(imagens_teste):
-        print(f"Processando {i+1}/{total}: {os.path.basename(img_path)}")
+    rostos = []
+    for inicio in range(0, total, tamanho_lote):
+        caminhos = imagens_teste[inicio:inicio + tamanho_lote]
+        imagens = [carregar_imagem(img_path) for img_path in caminhos]
+        validos = [(c, img) for c, img in zip(caminhos, imagens) if img is not None]
+        # Detecção em RGB só nas cópias reduzidas; os recortes ficam em BGR para o DeepFace
+        deteccoes_lote = iter(detectar_faces_em_arquivos(
+            [c for c, _ in validos], [img for _, img in validos], tamanho_lote, max_lado, BGR
+        ))
         
-        # Carregar imagem
-        img = cv2.imread(img_path)
-        if img is None:
-            print(f"  Erro ao ler {img_path}")
-            continue
+        for i, (img_path, img) in enumerate(zip(caminhos, imagens), inicio):
+            print(f"Processando {i+1}/{total}: {os.path.basename(img_path)}")
             
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Detectar rosto
-        deteccoes = detector.detect_faces(img_rgb)
-        
-        if not deteccoes:
-            print("  Nenhum rosto detectado.")
-            continue
+            if img is None:
+                print(f"  Erro ao ler {img_path}")
+                continue
             
-        # Pega o maior rosto (assume que é o alvo)
-        maior_area = 0
-        melhor_rosto = None
-        
-        for det in deteccoes:
-            x, y, w, h = det['box']
-            area = w * h
-            if area > maior_area:
-                maior_area = area
-                x1, y1 = max(0, x), max(0, y)
-                x2, y2 = min(img.shape[1], x + w), min(img.shape[0], y + h)
-                melhor_rosto = img[y1:y2, x1:x2]
-        
-        if melhor_rosto is None:
-            continue
+            deteccoes = next(deteccoes_lote)
             
-        id_real = extrair_id(img_path)
-        
-        # Teste CLAHE
-        matches_clahe = buscar_rosto_silencioso(melhor_rosto, db_clahe, threshold)
-        top_match_clahe = matches_clahe[0] if matches_clahe else None
-        acerto_clahe = False
-        if top_match_clahe:
-            if top_match_clahe['id'] == id_real:
-                acerto_clahe = True
-        
-        resultados_clahe.append({
-            'arquivo': os.path.basename(img_path),
-            'id_real': id_real,
-            'identificado': top_match_clahe['id'] if top_match_clahe else "Nenhum",
-            'distancia': top_match_clahe['distance'] if top_match_clahe else None,
-            'acerto': acerto_clahe
-        })
-        
-        # Teste Histogram
-        matches_hist = buscar_rosto_silencioso(melhor_rosto, db_histogram, threshold)
-        top_match_hist = matches_hist[0] if matches_hist else None
-        acerto_hist = False
-        if top_match_hist:
-            if top_match_hist['id'] == id_real:
-                acerto_hist = True
+            if not deteccoes:
+                print("  Nenhum rosto detectado.")
+                continue
                 
-        resultados_histogram.append({
-            'arquivo': os.path.basename(img_path),
-            'id_real': id_real,
-            'identificado': top_match_hist['id'] if top_match_hist else "Nenhum",
-            'distancia': top_match_hist['distance'] if top_match_hist else None,
-            'acerto': acerto_hist
-        })
+            # Pega o maior rosto (assume que é o alvo)
+            maior_area = 0
+            melhor_rosto = None
+            
+            for det in deteccoes:
+                x, y, w, h = det['box']
+                area = w * h
+                if area > maior_area:
+                    maior_area = area
+                    x1, y1 = max(0, x), max(0, y)
+                    x2, y2 = min(img.shape[1], x + w), min(img.shape[0], y + h)
+                    melhor_rosto = img[y1:y2, x1:x2]
+            
+            if melhor_rosto is not None:
+                # Cópia do recorte: uma visão manteria a foto inteira em memória até os embeddings
+                rostos.append((img_path, melhor_rosto.copy()))
+    return rostos
+
+
+def avaliar_galerias(data_dir, bases, threshold=0.6, tamanho_lote=TAMANHO_LOTE_DETECCAO,
+                     max_lado=MAX_LADO_DETECCAO, batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Avalia qualquer número de galerias com uma única passada de detecção e embeddings.
+    
+    Cada rosto de teste é detectado e passa pelo modelo uma só vez; os embeddings
+    são comparados com cada galeria percorrendo seus vetores em fatias.
+    
+    Args:
+        data_dir: Diretório com imagens de teste
+        bases: Dicionário {nome: caminho da galeria}
+        
+    Retorna:
+        dict: {nome: lista de resultados por imagem}
+    """
+    rostos = extrair_rostos_teste(data_dir, tamanho_lote, max_lado)
+    resultados = {nome: [] for nome in bases}
+    if not rostos:
+        return resultados
+    
+    conjunto = ConjuntoGalerias({nome: get_galeria(db_path) for nome, db_path in bases.items()})
+    print(f"\nGerando embeddings de {len(rostos)} rostos...")
+    embeddings = gerar_embeddings([rosto for _, rosto in rostos], batch_size)
+    melhores = conjunto.identificar(embeddings, threshold)
+    
+    for nome in bases:
+        for (img_path, _), top_match in zip(rostos, melhores[nome]):
+            id_real = extrair_id(img_path)
+            resultados[nome].append({
+                'arquivo': os.path.basename(img_path),
+                'id_real': id_real,
+                'identificado': top_match['id'] if top_match else "Nenhum",
+                'distancia': top_match['distance'] if top_match else None,
+                'acerto': bool(top_match) and top_match['id'] == id_real
+            })
+    return resultados
+
+
+def executar_testes_acuracia(data_dir='data/images', db_clahe='data/imagens_processadas/clahe', 
+                              db_histogram='data/imagens_processadas/histogram', threshold=0.6,
+                              tamanho_lote=TAMANHO_LOTE_DETECCAO, max_lado=MAX_LADO_DETECCAO,
+                              batch_size=TAMANHO_LOTE_PADRAO):
+    """
+    Executa bateria de testes de acurácia.
+    
+    As imagens são lidas e enviadas ao detector MTCNN em lotes de `tamanho_lote`,
+    detectando em cópias com maior lado `max_lado` e recortando da imagem original.
+    Cada rosto é embutido uma única vez e comparado com as duas galerias (ver avaliar_galerias).
+    
+    Retorna:
+        tuple: (resultados_clahe, resultados_histogram)
+    """
+    print("Iniciando bateria de testes...")
+    
+    resultados = avaliar_galerias(
+        data_dir,
+        {'clahe': db_clahe, 'histogram': db_histogram},
+        threshold, tamanho_lote, max_lado, batch_size
+    )
 
     print("\n✓ Testes concluídos")
-    return resultados_clahe, resultados_histogram
+    return resultados['clahe'], resultados['histogram']
 
 
 def gerar_relatorio_markdown(res_clahe, res_hist, output_file="RELATORIO_TESTES.md"):
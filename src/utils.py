@@ -0,0 +1,14 @@
+"""
+Funções utilitárias compartilhadas entre os módulos.
+"""
+
+import hashlib
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o hash SHA-1 do conteúdo de um arquivo."""
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
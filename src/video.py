@@ -0,0 +1,196 @@
+"""
+Módulo de chamada contínua a partir de câmera ou arquivo de vídeo.
+"""
+
+import json
+import time
+import cv2
+import numpy as np
+
+from src.preprocessamento import BGR, MAX_LADO_DETECCAO, detectar_faces
+from src.galeria import TAMANHO_LOTE_PADRAO, gerar_embeddings, get_galeria
+
+
+def calcular_iou(caixas_a, caixas_b):
+    """Matriz de IoU entre dois conjuntos de caixas (x1, y1, x2, y2)."""
+    a = np.asarray(caixas_a, dtype=np.float32).reshape(-1, 4)[:, None, :]
+    b = np.asarray(caixas_b, dtype=np.float32).reshape(-1, 4)[None, :, :]
+    largura = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    altura = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersecao = largura * altura
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersecao / np.maximum(area_a + area_b - intersecao, 1e-6)
+
+
+class RastreadorRostos:
+    """
+    Mantém trilhas de rostos entre detecções associando caixas por IoU.
+
+    Uma trilha já identificada não volta ao modelo de embeddings; trilhas
+    desconhecidas são reavaliadas no máximo a cada `intervalo_reavaliacao` quadros.
+    """
+
+    def __init__(self, iou_minimo=0.3, max_ausencia=30, intervalo_reavaliacao=15):
+        self.iou_minimo = iou_minimo
+        self.max_ausencia = max_ausencia
+        self.intervalo_reavaliacao = intervalo_reavaliacao
+        self.trilhas = []
+        self._proximo_id = 0
+
+    def associar(self, caixas, quadro):
+        """
+        Associa as caixas detectadas às trilhas existentes e cria trilhas para as novas.
+
+        Returns:
+            list: Trilhas (dicionários) que precisam passar pelo modelo neste quadro
+        """
+        livres = list(range(len(self.trilhas)))
+        pendentes = []
+        novas = []
+
+        if self.trilhas and caixas:
+            iou = calcular_iou(caixas, [t['bbox'] for t in self.trilhas])
+            # Associação gulosa pela maior sobreposição
+            for i in np.argsort(-iou.max(axis=1)):
+                if not livres:
+                    break
+                j = max(livres, key=lambda k: iou[i, k])
+                if iou[i, j] < self.iou_minimo:
+                    continue
+                livres.remove(j)
+                trilha = self.trilhas[j]
+                trilha['bbox'] = caixas[i]
+                trilha['ultimo_quadro'] = quadro
+                if trilha['identificado'] is None and quadro - trilha['avaliada_em'] >= self.intervalo_reavaliacao:
+                    pendentes.append(trilha)
+                caixas = caixas[:i] + [None] + caixas[i + 1:]
+
+        for caixa in caixas:
+            if caixa is None:
+                continue
+            trilha = {
+                'trilha': self._proximo_id,
+                'bbox': caixa,
+                'identificado': None,
+                'distancia': None,
+                'ultimo_quadro': quadro,
+                'avaliada_em': quadro
+            }
+            self._proximo_id += 1
+            novas.append(trilha)
+            pendentes.append(trilha)
+
+        # Descarta trilhas que sumiram por muitos quadros
+        self.trilhas = [t for t in self.trilhas if quadro - t['ultimo_quadro'] <= self.max_ausencia] + novas
+        return pendentes
+
+
+def abrir_fonte(fonte):
+    """Abre um arquivo de vídeo ou câmera (índice numérico ou URL de stream)."""
+    if isinstance(fonte, str) and fonte.isdigit():
+        fonte = int(fonte)
+    captura = cv2.VideoCapture(fonte)
+    ao_vivo = isinstance(fonte, int) or str(fonte).startswith(('rtsp://', 'http://', 'https://'))
+    return captura, ao_vivo
+
+
+def processar_video(fonte, db_path, threshold=0.6, detectar_a_cada=5, batch_size=TAMANHO_LOTE_PADRAO,
+                    max_lado=MAX_LADO_DETECCAO, arquivo_eventos=None, max_quadros=None):
+    """
+    Faz a chamada a partir de um vídeo, emitindo um evento na primeira vez que cada aluno é reconhecido.
+
+    Args:
+        fonte: Caminho do vídeo, índice da câmera ou URL de stream
+        db_path: Caminho da base de dados
+        threshold: Limiar de distância
+        detectar_a_cada: Detecta rostos a cada N quadros; os demais nem são decodificados
+        batch_size: Máximo de rostos por chamada ao modelo de embeddings
+        max_lado: Maior lado da cópia reduzida usada na detecção (None = original)
+        arquivo_eventos: Arquivo JSON Lines onde os eventos são gravados à medida que ocorrem
+        max_quadros: Encerra após N quadros (None = até o fim do vídeo)
+
+    Returns:
+        dict: Presenças {id: evento da primeira identificação}
+    """
+    if detectar_a_cada < 1:
+        raise ValueError(f"detectar_a_cada deve ser pelo menos 1: {detectar_a_cada}")
+
+    captura, ao_vivo = abrir_fonte(fonte)
+    if not captura.isOpened():
+        print(f"Erro ao abrir a fonte de vídeo: {fonte}")
+        return None
+
+    galeria = get_galeria(db_path)
+    fps = captura.get(cv2.CAP_PROP_FPS) or 30.0
+    rastreador = RastreadorRostos(max_ausencia=detectar_a_cada * 6, intervalo_reavaliacao=detectar_a_cada * 3)
+    presencas = {}
+    saida_eventos = open(arquivo_eventos, 'a') if arquivo_eventos else None
+    inicio = time.time()
+    quadro = 0
+
+    try:
+        while max_quadros is None or quadro < max_quadros:
+            # Quadros sem detecção são apenas avançados, sem decodificar
+            if quadro % detectar_a_cada:
+                if not captura.grab():
+                    break
+                quadro += 1
+                continue
+
+            ok, img = captura.read()
+            if not ok:
+                break
+            inicio_quadro = time.time()
+
+            caixas = []
+            for det in detectar_faces(img, max_lado, BGR):
+                x, y, w, h = det['box']
+                caixas.append((max(0, x), max(0, y), min(img.shape[1], x + w), min(img.shape[0], y + h)))
+
+            pendentes = rastreador.associar(caixas, quadro)
+            if pendentes:
+                recortes = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in (t['bbox'] for t in pendentes)]
+                melhores = galeria.identificar(gerar_embeddings(recortes, batch_size), threshold)
+                for trilha, melhor in zip(pendentes, melhores):
+                    trilha['avaliada_em'] = quadro
+                    if melhor is None:
+                        continue
+                    trilha['identificado'] = melhor['id']
+                    trilha['distancia'] = melhor['distance']
+
+                    if melhor['id'] not in presencas:
+                        evento = {
+                            'tipo': 'presenca',
+                            'id': melhor['id'],
+                            'distancia': melhor['distance'],
+                            'quadro': quadro,
+                            'tempo_video': round(quadro / fps, 2),
+                            'tempo_decorrido': round(time.time() - inicio, 2),
+                            'bbox': list(trilha['bbox'])
+                        }
+                        presencas[melhor['id']] = evento
+                        print(f"✓ [{evento['tempo_video']:.1f}s] {melhor['id']} presente ({1-melhor['distance']:.2f})")
+                        if saida_eventos:
+                            saida_eventos.write(json.dumps(evento, ensure_ascii=False) + "\n")
+                            saida_eventos.flush()
+
+            quadro += 1
+
+            # Em fontes ao vivo, descarta os quadros acumulados enquanto este era
+            # processado, para que a latência não cresça indefinidamente
+            if ao_vivo:
+                atrasados = int((time.time() - inicio_quadro) * fps)
+                for _ in range(atrasados):
+                    if not captura.grab():
+                        break
+                    quadro += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        captura.release()
+        if saida_eventos:
+            saida_eventos.close()
+
+    print(f"\nQuadros lidos: {quadro} | Presenças registradas: {len(presencas)}")
+    return presencas
@@ -21,13 +21,10 @@ def extrair_id(nome_arquivo):
 
 def buscar_rosto_silencioso(face_img, db_path, threshold=0.6):
     """Busca um rosto no banco de dados sem imprimir no console."""
-    temp_path = f"temp_face_{time.time()}.jpg"
-    cv2.imwrite(temp_path, face_img)
-    
     try:
         # DeepFace.find pode gerar output, tentamos silenciar
         result = DeepFace.find(
-            img_path=temp_path,
+            img_path=face_img,
             db_path=db_path,
             enforce_detection=False,
             silent=True,
@@ -49,13 +46,9 @@ def buscar_rosto_silencioso(face_img, db_path, threshold=0.6):
                         'distance': row['distance']
                     })
         
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         return matches
     
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    except Exception:
         return []
 
 def executar_testes():
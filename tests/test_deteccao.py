@@ -0,0 +1,42 @@
+"""
+Regressão da detecção em imagens pequenas (MTCNN 1.x com min_face_size > 20 não detecta nada).
+"""
+
+from pathlib import Path
+
+import cv2
+import pytest
+
+pytest.importorskip('mtcnn')
+
+from src.preprocessamento import BGR, detectar_faces, detectar_faces_em_lote  # noqa: E402
+
+IMAGEM_TURMA = Path(__file__).resolve().parent.parent / 'im1.jpg'
+
+
+@pytest.fixture(scope='module')
+def turma_pequena():
+    img = cv2.imread(str(IMAGEM_TURMA))
+    if img is None:
+        pytest.skip(f"Imagem de teste ausente: {IMAGEM_TURMA}")
+    escala = 800 / max(img.shape[:2])
+    return cv2.resize(img, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+
+def test_detecta_rostos_em_imagem_menor_que_1024(turma_pequena):
+    assert max(turma_pequena.shape[:2]) < 1024
+    assert len(detectar_faces(turma_pequena, cor=BGR)) > 0
+
+
+def test_deteccao_nao_depende_do_lote(turma_pequena):
+    grande = cv2.resize(turma_pequena, None, fx=4, fy=4, interpolation=cv2.INTER_CUBIC)
+    sozinha = detectar_faces(turma_pequena, cor=BGR)
+    em_lote = detectar_faces_em_lote([turma_pequena, grande], cor=BGR)[0]
+    assert [d['box'] for d in sozinha] == [d['box'] for d in em_lote]
+
+
+def test_lote_de_mesmo_tamanho_igual_a_imagens_isoladas(turma_pequena):
+    espelhada = cv2.flip(turma_pequena, 1)
+    em_lote = detectar_faces_em_lote([turma_pequena, espelhada], cor=BGR)
+    isoladas = [detectar_faces(img, cor=BGR) for img in (turma_pequena, espelhada)]
+    assert [[d['box'] for d in r] for r in em_lote] == [[d['box'] for d in r] for r in isoladas]
@@ -0,0 +1,80 @@
+"""
+Persistência do índice da galeria (vetores mapeados em memória).
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from src import galeria as modulo_galeria
+from src.galeria import GaleriaEmbeddings
+
+
+def _vetores(n, d=8, semente=0):
+    return np.random.default_rng(semente).standard_normal((n, d)).astype(np.float32)
+
+
+def _mapeia(galeria, caminho_vetores):
+    alvo = caminho_vetores.resolve()
+    return any(isinstance(b, np.memmap) and b.filename and Path(b.filename).resolve() == alvo
+               for b in galeria._blocos)
+
+
+def test_arquivo_de_vetores_nao_esta_mapeado_ao_ser_reescrito(tmp_path, monkeypatch):
+    caminho = tmp_path / 'indice.npz'
+    caminho_vetores = GaleriaEmbeddings.caminho_vetores(caminho)
+    vetores = _vetores(10)
+    galeria = GaleriaEmbeddings(vetores, [f"a{i}" for i in range(10)], [f"a{i}.jpg" for i in range(10)])
+    galeria.salvar(caminho)
+    assert _mapeia(galeria, caminho_vetores)
+
+    reescritas = []
+    os_replace = modulo_galeria.os.replace
+    abrir = open
+
+    def substituir(origem, destino):
+        reescritas.append(_mapeia(galeria, caminho_vetores))
+        os_replace(origem, destino)
+
+    def abrir_arquivo(arquivo, modo='r', *args, **kwargs):
+        if 'r+' in modo:
+            reescritas.append(_mapeia(galeria, caminho_vetores))
+        return abrir(arquivo, modo, *args, **kwargs)
+
+    monkeypatch.setattr(modulo_galeria.os, 'replace', substituir)
+    monkeypatch.setattr('builtins.open', abrir_arquivo)
+
+    # Anexa linhas novas ao mesmo arquivo
+    novos = _vetores(2, semente=1)
+    galeria._blocos.append(novos)
+    galeria.identidades = np.concatenate([galeria.identidades, ['b0', 'b1']])
+    galeria.arquivos = np.concatenate([galeria.arquivos, ['b0.jpg', 'b1.jpg']])
+    galeria.mtimes = np.concatenate([galeria.mtimes, [0.0, 0.0]])
+    galeria.hashes = np.concatenate([galeria.hashes, ['', '']])
+    galeria.ativos = np.concatenate([galeria.ativos, [True, True]])
+    galeria.salvar(caminho)
+
+    # Remove a maioria das linhas, forçando a compactação do arquivo
+    galeria.remover_arquivos([f"a{i}.jpg" for i in range(10)])
+    galeria.salvar(caminho)
+
+    monkeypatch.undo()
+    assert reescritas and not any(reescritas)
+    recarregada = GaleriaEmbeddings.carregar(caminho)
+    assert list(recarregada.arquivos) == ['b0.jpg', 'b1.jpg']
+    np.testing.assert_array_equal(np.asarray(recarregada.embeddings), novos)
+
+
+def test_conjunto_de_galerias_igual_a_cada_galeria_isolada():
+    a = GaleriaEmbeddings(modulo_galeria.normalizar_l2(_vetores(30)), [f"a{i}" for i in range(30)],
+                          [f"a{i}.jpg" for i in range(30)])
+    b = GaleriaEmbeddings(modulo_galeria.normalizar_l2(_vetores(5, semente=1)), [f"b{i}" for i in range(5)],
+                          [f"b{i}.jpg" for i in range(5)])
+    a.remover_arquivos(['a0.jpg'])
+    consultas = modulo_galeria.normalizar_l2(_vetores(4, semente=2))
+
+    resultados = modulo_galeria.ConjuntoGalerias({'a': a, 'b': b, 'vazia': GaleriaEmbeddings.vazia()}).identificar(
+        consultas, threshold=2.0)
+    assert resultados['a'] == a.identificar(consultas, threshold=2.0)
+    assert resultados['b'] == b.identificar(consultas, threshold=2.0)
+    assert resultados['vazia'] == [None] * 4
@@ -0,0 +1,36 @@
+"""
+Interrupção do pipeline de processar_cenario_real.
+"""
+
+import numpy as np
+import pytest
+
+from src import identificacao
+
+
+def test_leitor_para_quando_a_identificacao_e_interrompida(tmp_path, monkeypatch):
+    caminhos = []
+    for i in range(50):
+        caminho = tmp_path / f"img{i}.jpg"
+        caminho.write_bytes(b'')
+        caminhos.append(str(caminho))
+
+    lidas = []
+
+    def carregar(caminho):
+        lidas.append(caminho)
+        return np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def identificar(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(identificacao, 'DEEPFACE_AVAILABLE', True)
+    monkeypatch.setattr(identificacao, 'get_galeria', lambda db_path: None)
+    monkeypatch.setattr(identificacao, 'carregar_imagem', carregar)
+    monkeypatch.setattr(identificacao, 'identificar_rostos', identificar)
+
+    with pytest.raises(KeyboardInterrupt):
+        identificacao.processar_cenario_real(caminhos, 'db', output_dir=None, tamanho_fila=2)
+
+    # A primeira imagem, as que couberam na fila e a que estava sendo lida
+    assert len(lidas) <= 2 + 2
@@ -0,0 +1,53 @@
+"""
+Manifesto do processamento: origens apagadas e saídas ausentes.
+"""
+
+from src.manifesto import ManifestoProcessamento, parametros_metodo
+
+
+def _processar(manifesto, origens, dir_saida, parametros):
+    """Simula uma execução de processar_todas: refaz e registra o que estiver pendente."""
+    hashes = manifesto.atualizar_origens(origens)
+    refeitas = []
+    for origem in origens:
+        if manifesto.pendentes(origem.name, ['clahe'], {'clahe': parametros}):
+            saida = dir_saida / 'clahe' / f"{origem.stem}.jpg"
+            saida.parent.mkdir(parents=True, exist_ok=True)
+            saida.write_bytes(b'jpg')
+            manifesto.registrar(origem.name, 'clahe', saida, hashes[origem.name], parametros)
+            refeitas.append(origem.name)
+    manifesto.salvar()
+    return refeitas
+
+
+def test_origem_apagada_remove_suas_saidas_do_manifesto(tmp_path):
+    dir_entrada, dir_saida = tmp_path / 'entrada', tmp_path / 'saida'
+    dir_entrada.mkdir()
+    origens = []
+    for nome in ('1-1.jpg', '1-2.jpg', '2-1.jpg'):
+        (dir_entrada / nome).write_bytes(nome.encode())
+        origens.append(dir_entrada / nome)
+    parametros = parametros_metodo('clahe', 2.0, 8, {'detector': 'mtcnn', 'max_lado': 1024})
+
+    assert _processar(ManifestoProcessamento.carregar(dir_saida), origens, dir_saida, parametros) == \
+        ['1-1.jpg', '1-2.jpg', '2-1.jpg']
+
+    origens[1].unlink()
+    restantes = [origens[0], origens[2]]
+    assert _processar(ManifestoProcessamento.carregar(dir_saida), restantes, dir_saida, parametros) == []
+
+    manifesto = ManifestoProcessamento.carregar(dir_saida)
+    assert set(manifesto.origens) == {'1-1.jpg', '2-1.jpg'}
+    assert set(manifesto.saidas['clahe']) == {'1-1.jpg', '2-1.jpg'}
+
+
+def test_saida_apagada_volta_a_ficar_pendente(tmp_path):
+    dir_entrada, dir_saida = tmp_path / 'entrada', tmp_path / 'saida'
+    dir_entrada.mkdir()
+    origem = dir_entrada / '1-1.jpg'
+    origem.write_bytes(b'foto')
+    parametros = parametros_metodo('clahe', 2.0, 8)
+
+    _processar(ManifestoProcessamento.carregar(dir_saida), [origem], dir_saida, parametros)
+    (dir_saida / 'clahe' / '1-1.jpg').unlink()
+    assert _processar(ManifestoProcessamento.carregar(dir_saida), [origem], dir_saida, parametros) == ['1-1.jpg']
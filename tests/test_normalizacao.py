@@ -0,0 +1,24 @@
+"""
+Contrato de saída do NormalizadorIluminacao.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.preprocessamento import CINZA, RGB, NormalizadorIluminacao, get_normalizador
+
+
+def test_saida_em_cinza_vale_para_todos_os_metodos():
+    rosto = np.random.default_rng(0).integers(0, 256, (40, 32, 3), dtype=np.uint8)
+    resultados = NormalizadorIluminacao().normalizar_metodos(rosto, ['clahe', 'histogram', 'desconhecido'],
+                                                             cor=RGB, saida=CINZA)
+    for metodo, imagem in resultados.items():
+        assert imagem.shape == (40, 32), metodo
+
+
+def test_cada_thread_tem_seu_normalizador():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        outra = executor.submit(get_normalizador).result()
+    assert get_normalizador() is get_normalizador()
+    assert outra is not get_normalizador()